@@ -0,0 +1,64 @@
+"""
+Micro benchmark of batched validation: Validator.validate_item called for every item
+against Validator.validate_batch that tests whole field columns at once.
+
+usage:
+    python benchmarks/bench_batch.py --items 100000 --comments 5 --batch-size 500
+"""
+import argparse
+from time import perf_counter
+
+from scrapy.settings import Settings
+
+from scrapytest import default_settings
+from scrapytest.spec import ItemSpec
+from scrapytest.tests import Match, MoreThan, LessThan, Required, Len
+from scrapytest.validate import Validator
+
+from bench_coverage import PostItem, CommentItem, generate_items
+
+
+class PostSpec(ItemSpec):
+    item_cls = PostItem
+    title_test = Match('.{5,}'), Len.less_than(100)
+    points_test = MoreThan(0), LessThan(10_000_000)
+    author_test = Match('.{3}')
+    comments_test = Required()
+
+
+class CommentSpec(ItemSpec):
+    item_cls = CommentItem
+    text_test = Match('.{1,}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100_000, help='amount of generated post items')
+    parser.add_argument('--comments', type=int, default=5, help='amount of nested comment items per post')
+    parser.add_argument('--batch-size', type=int, default=500, help='amount of items validated at once')
+    args = parser.parse_args()
+
+    settings = Settings()
+    settings.setmodule(default_settings)
+    validator = Validator([PostSpec(), CommentSpec()], settings)
+    items = list(generate_items(args.items, args.comments))
+
+    start = perf_counter()
+    single_messages = [validator.validate_item(item) for item in items]
+    single = perf_counter() - start
+
+    start = perf_counter()
+    batch_messages = []
+    for i in range(0, len(items), args.batch_size):
+        batch_messages.extend(validator.validate_batch(items[i:i + args.batch_size]))
+    batch = perf_counter() - start
+    assert single_messages == batch_messages, 'validation results differ'
+
+    print(f'{args.items} items with {args.comments} nested items each, batches of {args.batch_size}')
+    print(f'validate_item:  {single * 1e6 / args.items:.2f}us per item')
+    print(f'validate_batch: {batch * 1e6 / args.items:.2f}us per item')
+    print(f'speedup:        {single / batch:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark field coverage counting: legacy count_fields + join_counter_dicts
+against incremental CoverageCounter.
+
+usage:
+    python benchmarks/bench_coverage.py --items 1000000 --comments 5
+"""
+import argparse
+from collections import Counter, defaultdict
+from time import perf_counter
+
+from scrapy import Item, Field
+
+from scrapytest.utils import is_empty, join_counter_dicts
+from scrapytest.validate import CoverageCounter
+
+
+class CommentItem(Item):
+    text = Field()
+    author = Field()
+
+
+class PostItem(Item):
+    title = Field()
+    url = Field()
+    author = Field()
+    points = Field()
+    comments = Field()
+
+
+def generate_items(amount, comments):
+    for i in range(amount):
+        yield PostItem(
+            title=f'title {i}',
+            url=f'http://example.com/{i}' if i % 10 else '',
+            author='bob',
+            points=i,
+            comments=[CommentItem(text=f'comment {j}', author='' if j % 3 else 'alice') for j in range(comments)],
+        )
+
+
+def legacy_count_fields(items, empty_is_missing=True, count_key='_self'):
+    """Validator.count_fields implementation prior to CoverageCounter"""
+    all_counter = defaultdict(Counter)
+
+    def _field_is_missing(value):
+        if not empty_is_missing:
+            return False
+        return is_empty(value)
+
+    def _count_item(item):
+        counter = defaultdict(Counter)
+        for value in item.values():
+            if isinstance(value, Item):
+                counter = join_counter_dicts(counter, _count_item(value))
+                continue
+            if isinstance(value, list):
+                for v in value:
+                    if isinstance(v, Item):
+                        counter = join_counter_dicts(counter, _count_item(v))
+        counter[type(item)][count_key] += 1
+        for key in type(item).fields.keys():
+            if key in item and not _field_is_missing(item[key]):
+                counter[type(item)][key] += 1
+            else:
+                counter[type(item)][key] = 0
+        return counter
+
+    for item in items:
+        for item_cls, count in _count_item(item).items():
+            all_counter[item_cls] += count
+            for k, v in count.items():
+                if v == 0 and k not in all_counter[item_cls]:
+                    all_counter[item_cls][k] = 0
+    return all_counter
+
+
+def accumulator_count_fields(items):
+    coverage = CoverageCounter()
+    for item in items:
+        coverage.add(item)
+    return coverage.as_counters()
+
+
+def bench(func, amount, comments):
+    items = generate_items(amount, comments)
+    start = perf_counter()
+    result = func(items)
+    return perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=1_000_000, help='amount of generated post items')
+    parser.add_argument('--comments', type=int, default=5, help='amount of nested comment items per post')
+    args = parser.parse_args()
+
+    # item generation is included in both timings, measure it separately
+    generation, _ = bench(lambda items: sum(1 for _ in items), args.items, args.comments)
+    legacy, legacy_result = bench(legacy_count_fields, args.items, args.comments)
+    accumulator, accumulator_result = bench(accumulator_count_fields, args.items, args.comments)
+    assert dict(legacy_result) == dict(accumulator_result), 'counting results differ'
+
+    print(f'{args.items} items with {args.comments} nested items each')
+    print(f'item generation:       {generation:.2f}s')
+    print(f'count_fields (legacy): {legacy - generation:.2f}s')
+    print(f'CoverageCounter:       {accumulator - generation:.2f}s')
+    print(f'speedup:               {(legacy - generation) / (accumulator - generation):.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Micro benchmark of per-item validation cost: legacy Validator.validate_item
+(spec.tests lookup and Compose call for every field) against compiled ItemPlan.
+
+usage:
+    python benchmarks/bench_plan.py --items 100000 --comments 5
+"""
+import argparse
+from time import perf_counter
+
+from scrapy import Item
+from scrapy.settings import Settings
+
+from scrapytest import default_settings
+from scrapytest.spec import ItemSpec
+from scrapytest.tests import Match, Type, MoreThan, Required
+from scrapytest.utils import is_empty
+from scrapytest.validate import Validator
+
+from bench_coverage import PostItem, CommentItem, generate_items
+
+
+class PostSpec(ItemSpec):
+    item_cls = PostItem
+    title_test = Match('.{5,}')
+    points_test = Type(int), MoreThan(0)
+    author_test = Type(str), Match('.{3}')
+    comments_test = Type(list), Required()
+
+    def url_test(self, value: str):
+        if not value.startswith('http'):
+            return f'Invalid url: {value}'
+        return ''
+
+
+class CommentSpec(ItemSpec):
+    item_cls = CommentItem
+    text_test = Type(str), Match('.{1,}')
+
+
+def legacy_validate_item(validator, item):
+    """Validator.validate_item implementation prior to ItemPlan"""
+    messages = []
+    try:
+        spec = validator.item_specs[type(item)]
+    except KeyError:
+        return [f'Missing specification for {type(item)}']
+    for key, value in item.items():
+        if validator.empty_is_missing and is_empty(value):
+            continue
+        if isinstance(value, Item):
+            messages.extend(legacy_validate_item(validator, value))
+            continue
+        if isinstance(value, list):
+            for v in value:
+                if isinstance(v, Item):
+                    messages.extend(legacy_validate_item(validator, v))
+        test_func = spec.tests.get(key, spec.default_test)
+        for msg in test_func(value):
+            if not msg:
+                continue
+            messages.append(f'{type(item).__name__}.{key}: {msg}')
+    return messages
+
+
+def bench(func, items):
+    start = perf_counter()
+    messages = [func(item) for item in items]
+    return perf_counter() - start, messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100_000, help='amount of generated post items')
+    parser.add_argument('--comments', type=int, default=5, help='amount of nested comment items per post')
+    args = parser.parse_args()
+
+    settings = Settings()
+    settings.setmodule(default_settings)
+    validator = Validator([PostSpec(), CommentSpec()], settings)
+    items = list(generate_items(args.items, args.comments))
+
+    legacy, legacy_messages = bench(lambda item: legacy_validate_item(validator, item), items)
+    compiled, compiled_messages = bench(validator.validate_item, items)
+    assert legacy_messages == compiled_messages, 'validation results differ'
+
+    print(f'{args.items} items with {args.comments} nested items each')
+    print(f'legacy validate_item: {legacy * 1e6 / args.items:.2f}us per item')
+    print(f'ItemPlan:             {compiled * 1e6 / args.items:.2f}us per item')
+    print(f'speedup:              {legacy / compiled:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
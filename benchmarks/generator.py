@@ -0,0 +1,104 @@
+"""
+Synthetic items, specs and stats for the benchmark suite, see suite.py.
+Item classes are generated for the amount of extra fields, posts have comments
+nested `depth` levels deep (comments of comments have replies) and `failure_rate`
+fraction of tested values fail their tests.
+"""
+import random
+
+from scrapy import Item, Field, Spider
+
+from scrapytest.spec import ItemSpec, StatsSpec
+from scrapytest.tests import Match, MoreThan, LessThan, Type, Len
+
+
+class BenchSpider(Spider):
+    name = 'bench'
+
+
+def make_item_classes(fields: int):
+    """(PostItem, CommentItem) classes, posts have `fields` extra fields"""
+    post_fields = {f'field{i}': Field() for i in range(fields)}
+    post_cls = type('PostItem', (Item,), {'title': Field(), 'points': Field(), 'comments': Field(), **post_fields})
+    comment_cls = type('CommentItem', (Item,), {'text': Field(), 'replies': Field()})
+    return post_cls, comment_cls
+
+
+def make_specs(post_cls, comment_cls):
+    """ItemSpec classes of generated item classes and StatsSpec of BenchSpider"""
+    extra_tests = {f'{field}_test': Match('^value') for field in post_cls.fields if field.startswith('field')}
+    post_spec = type('PostSpec', (ItemSpec,), {
+        'item_cls': post_cls,
+        'title_test': (Match('.{5,}'), Len.less_than(100)),
+        'points_test': (Type(int), MoreThan(0)),
+        'comments_test': Type(list),
+        'title_cov': 100,
+        **extra_tests,
+    })
+    comment_spec = type('CommentSpec', (ItemSpec,), {
+        'item_cls': comment_cls,
+        'text_test': Match('.{2,}'),
+        'replies_test': Type(list),
+    })
+    stats_spec = type('BenchStats', (StatsSpec,), {
+        'spider_cls': BenchSpider,
+        'validate': {
+            'log_count/ERROR$': LessThan(1),
+            'item_scraped_count': MoreThan(0),
+            'finish_reason': Match('finished'),
+            'downloader/response_status_count/5\\d\\d': LessThan(10),
+            'custom/stat/\\d+': MoreThan(0),
+        },
+        'required': ['item_scraped_count', 'downloader/response_count'],
+    })
+    return post_spec, comment_spec, stats_spec
+
+
+def _comments(comment_cls, depth, width, failure_rate, rand):
+    if depth <= 0:
+        return []
+    return [
+        comment_cls(
+            text='x' if rand.random() < failure_rate else f'comment {j}',
+            replies=_comments(comment_cls, depth - 1, width, failure_rate, rand),
+        )
+        for j in range(width)
+    ]
+
+
+def generate_items(post_cls, comment_cls, amount, depth=1, width=3, failure_rate=0.1, seed=0):
+    """
+    Generate post items
+    :param depth: levels of nested comments, 0 for posts without comments
+    :param width: comments on every level
+    :param failure_rate: probability of every tested value to fail
+    """
+    rand = random.Random(seed)
+    extra_fields = [field for field in post_cls.fields if field.startswith('field')]
+    for i in range(amount):
+        post = post_cls(
+            title='bad' if rand.random() < failure_rate else f'title {i}',
+            points=0 if rand.random() < failure_rate else i + 1,
+            comments=_comments(comment_cls, depth, width, failure_rate, rand),
+        )
+        for field in extra_fields:
+            post[field] = 'broken' if rand.random() < failure_rate else f'value {i}'
+        yield post
+
+
+def generate_stats(keys, failure_rate=0.1, seed=0) -> dict:
+    """crawl stats with `keys` keys"""
+    rand = random.Random(seed)
+    stats = {
+        'log_count/ERROR': 0,
+        'item_scraped_count': 1000,
+        'finish_reason': 'finished',
+        'downloader/response_count': 1000,
+    }
+    for code in (200, 301, 404, 500, 503):
+        stats[f'downloader/response_status_count/{code}'] = rand.randint(0, 20)
+    i = 0
+    while len(stats) < keys:
+        stats[f'custom/stat/{i}'] = 0 if rand.random() < failure_rate else rand.randint(1, 1000)
+        i += 1
+    return stats
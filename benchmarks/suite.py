@@ -0,0 +1,168 @@
+"""
+Benchmark suite of the validation engine. Runs offline on synthetic items and stats
+(see generator.py) without crawling. Every case varies a single parameter of the base
+configuration: item count, nesting depth, field count, failure rate or stat key count.
+Timings are the best of `--repeat` runs, every run gets a fresh Validator so memoized
+and cached tester results of previous runs don't turn validation into cache lookups.
+
+usage:
+    python benchmarks/suite.py --save results.json
+    python benchmarks/suite.py --baseline results.json --tolerance 0.25
+    python benchmarks/suite.py --quick --only validate_items
+
+With --baseline every timing is compared to the baseline's and the suite exits with
+code 1 when any of them is slower by more than the tolerance.
+"""
+import argparse
+import json
+import sys
+from collections import Counter
+from time import perf_counter
+
+from scrapy.settings import Settings
+
+from scrapytest import default_settings
+from scrapytest.cli import validate_spider
+from scrapytest.utils import collapse_buffer
+from scrapytest.validate import Validator, ItemStream
+
+from generator import BenchSpider, make_item_classes, make_specs, generate_items, generate_stats
+
+BASE = {'items': 5000, 'depth': 1, 'fields': 5, 'failure_rate': 0.1, 'stat_keys': 200}
+VARIATIONS = {
+    'items': [1000, 20_000],
+    'depth': [0, 2],
+    'fields': [20],
+    'failure_rate': [0.0, 0.5],
+    'stat_keys': [2000],
+}
+ITEM_PARAMS = ('items', 'depth', 'fields', 'failure_rate')
+STATS_PARAMS = ('stat_keys', 'failure_rate')
+
+
+def configurations(quick=False):
+    """base configuration followed by configurations that vary a single parameter"""
+    base = dict(BASE)
+    if quick:
+        base['items'] //= 10
+    yield base
+    if quick:
+        return
+    for param, values in VARIATIONS.items():
+        for value in values:
+            yield {**base, param: value}
+
+
+def timeit(func, repeat, setup=None):
+    """best time of repeat calls and result of the last one, func is called with a fresh result of untimed setup"""
+    best, result = None, None
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = perf_counter()
+        result = func(arg)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def case_name(bench, config, params):
+    return f'{bench}[' + ','.join(f'{param}={config[param]}' for param in params) + ']'
+
+
+def run_config(config, repeat, only=None) -> dict:
+    settings = Settings()
+    settings.setmodule(default_settings)
+    post_cls, comment_cls = make_item_classes(config['fields'])
+    post_spec, comment_spec, stats_spec = make_specs(post_cls, comment_cls)
+    items = list(generate_items(post_cls, comment_cls, config['items'], depth=config['depth'],
+                                failure_rate=config['failure_rate']))
+    stats = generate_stats(config['stat_keys'], failure_rate=config['failure_rate'])
+
+    def new_validator():
+        return Validator([post_spec(), comment_spec(), stats_spec()], settings)
+
+    validator = new_validator()
+    messages = [validator.format_message(msg) for msg in validator.validate_items(items)]
+
+    def spider_path(validator):
+        stream = ItemStream(validator, spider=BenchSpider.name, batch_size=validator.batch_size)
+        for item in items:
+            stream.feed(item)
+        return validate_spider(BenchSpider, stream, stats)
+
+    benches = {
+        'validate_items': (ITEM_PARAMS, lambda v: list(v.validate_items(items))),
+        'validate_batch': (ITEM_PARAMS, lambda v: v.validate_batch(items)),
+        'count_fields': (ITEM_PARAMS, lambda v: v.count_fields(items)),
+        'validate_coverage': (ITEM_PARAMS, lambda v: v.validate_coverage(items)),
+        'collapse_buffer': (ITEM_PARAMS, lambda v: collapse_buffer(messages)),
+        'validate_stats': (STATS_PARAMS, lambda v: v.validate_stats(BenchSpider, stats)),
+        'validate_spider': (ITEM_PARAMS + ('stat_keys',), spider_path),
+    }
+    results = {}
+    for bench, (params, func) in benches.items():
+        if only and bench not in only:
+            continue
+        seconds, _ = timeit(func, repeat, setup=new_validator)
+        results[case_name(bench, config, params)] = {
+            'bench': bench,
+            'params': {param: config[param] for param in params},
+            'seconds': seconds,
+        }
+    return results
+
+
+def run_suite(repeat=3, quick=False, only=None) -> dict:
+    results = {}
+    for config in configurations(quick):
+        for name, result in run_config(config, repeat, only).items():
+            # configurations that don't vary bench's params repeat the same case
+            if name not in results:
+                results[name] = result
+                print(f'{result["seconds"] * 1000:>10.2f} ms  {name}', file=sys.stderr)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """names of cases slower than baseline by more than tolerance"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['seconds'] / baseline[name]['seconds']
+        status = 'REGRESSION' if ratio > 1 + tolerance else 'ok'
+        print(f'{ratio:>6.2f}x  {status:<10}  {name}')
+        if status != 'ok':
+            regressions.append(name)
+    missing = Counter(name in results for name in baseline)[False]
+    if missing:
+        print(f'{missing} baseline cases were not run')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help='amount of runs of every case, best one is taken')
+    parser.add_argument('--quick', action='store_true', help='run only base configuration with fewer items')
+    parser.add_argument('--only', nargs='+', help='run only these benchmarks, e.g. validate_items validate_stats')
+    parser.add_argument('--save', help='save results as JSON baseline to this file')
+    parser.add_argument('--baseline', help='compare results to JSON baseline saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown relative to baseline, 0.25 is 25%% slower')
+    args = parser.parse_args()
+
+    results = run_suite(repeat=args.repeat, quick=args.quick, only=args.only)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} cases regressed by more than {args.tolerance:.0%}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
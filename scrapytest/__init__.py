@@ -1 +1,15 @@
-from scrapytest.spec import ItemSpec, StatsSpec
\ No newline at end of file
+import sys
+
+# specs import scrapy, so they are only imported once they are used (PEP 562)
+_LAZY = {'ItemSpec': 'scrapytest.spec', 'StatsSpec': 'scrapytest.spec'}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        from importlib import import_module
+        return getattr(import_module(_LAZY[name]), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+if sys.version_info < (3, 7):
+    from scrapytest.spec import ItemSpec, StatsSpec
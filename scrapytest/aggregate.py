@@ -0,0 +1,153 @@
+from random import Random
+from typing import Callable, Iterator, Tuple
+
+from scrapytest.tests import Failure, get_tester_name
+
+"""
+Bounded aggregation of item failures.
+Failures are grouped by (spider, item class, field, tester) and every group keeps:
+* exact failure count
+* most frequent failures - Space-Saving heavy hitters sketch with fixed amount of counters
+* random examples of failures - fixed size reservoir sample
+so memory stays constant no matter how many failures crawl produces.
+"""
+
+
+class FailureGroup:
+    """Failures of a single (spider, item class, field, tester) group"""
+
+    def __init__(self, key, top_size=10, examples_size=3, random=None):
+        self.key = key
+        self.count = 0
+        self.top_size = top_size
+        self.examples_size = examples_size
+        # failure: [count, overestimation]
+        self.top = {}
+        self.examples = []
+        self.random = random or Random(0)
+
+    def add(self, failure):
+        self.count += 1
+        self._count(failure, 1)
+        # reservoir sample of examples
+        if len(self.examples) < self.examples_size:
+            self.examples.append(failure)
+        else:
+            i = self.random.randrange(self.count)
+            if i < self.examples_size:
+                self.examples[i] = failure
+
+    def _count(self, failure, count, error=0):
+        """update heavy hitters"""
+        try:
+            counter = self.top[failure]
+            counter[0] += count
+            counter[1] += error
+        except KeyError:
+            if len(self.top) < self.top_size:
+                self.top[failure] = [count, error]
+            else:
+                # replace least frequent failure and inherit it's count as overestimation
+                least = min(self.top, key=lambda f: self.top[f][0])
+                least_count = self.top.pop(least)[0]
+                self.top[failure] = [least_count + count, least_count + error]
+
+    def merge(self, other: 'FailureGroup'):
+        self.count += other.count
+        for failure, (count, error) in other.top.items():
+            self._count(failure, count, error)
+        # examples are merged only to fill up the reservoir
+        for failure in other.examples[:self.examples_size - len(self.examples)]:
+            self.examples.append(failure)
+
+    @property
+    def untracked(self) -> int:
+        """amount of failures that are not counted exactly by heavy hitters"""
+        return self.count - sum(count - error for count, error in self.top.values())
+
+
+class FailureAggregator:
+    """
+    Groups failures by (spider, item class, field, tester), see FailureGroup.
+    :param top_size: amount of most frequent failures tracked per group
+    :param examples_size: amount of random failure examples kept per group
+    """
+
+    def __init__(self, top_size=10, examples_size=3, seed=0):
+        self.top_size = top_size
+        self.examples_size = examples_size
+        self.groups = {}
+        self.random = Random(seed)
+        self._tester_names = {}
+
+    def __len__(self):
+        return sum(group.count for group in self.groups.values())
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # identities are meaningless in other processes
+        state['_tester_names'] = {}
+        return state
+
+    def _tester_name(self, tester) -> str:
+        if isinstance(tester, str):
+            return tester
+        # testers live as long as their specs so names are cached by identity
+        try:
+            return self._tester_names[id(tester)]
+        except KeyError:
+            name = self._tester_names[id(tester)] = get_tester_name(tester)
+            return name
+
+    def _get_group(self, key) -> FailureGroup:
+        try:
+            return self.groups[key]
+        except KeyError:
+            group = self.groups[key] = FailureGroup(key, self.top_size, self.examples_size, self.random)
+            return group
+
+    def add(self, failure, spider=None):
+        """add Failure record or message string"""
+        if isinstance(failure, Failure):
+            key = spider, failure.item_cls, failure.field, self._tester_name(failure.tester)
+        else:
+            key = spider, None, None, None
+        self._get_group(key).add(failure)
+
+    def merge(self, other: 'FailureAggregator') -> 'FailureAggregator':
+        for key, group in other.groups.items():
+            self._get_group(key).merge(group)
+        return self
+
+    def report(self, spider=None, format: Callable = str) -> Iterator[Tuple[str, int]]:
+        """
+        Generate (message, count) pairs of spider's failures in order they were first encountered.
+        Heavy hitters with overestimated counts are reported with their guaranteed count as `[at least xN]`,
+        unless overestimation exceeds it. Those and failures that were evicted from heavy hitters
+        are summarized with a few random examples.
+        """
+        for key, group in self.groups.items():
+            if key[0] != spider:
+                continue
+            untracked = group.count
+            # different failures can format the same, e.g. when values are truncated
+            counts, approximate = {}, set()
+            for failure, (count, error) in group.top.items():
+                guaranteed = count - error
+                if error > guaranteed:
+                    continue
+                untracked -= guaranteed
+                msg = format(failure)
+                counts[msg] = counts.get(msg, 0) + guaranteed
+                if error:
+                    approximate.add(msg)
+            for msg, count in counts.items():
+                if msg in approximate:
+                    yield f'{msg} [at least x{count}]', 1
+                else:
+                    yield msg, count
+            if untracked:
+                _, item_cls, field, tester = key
+                prefix = f'{item_cls.__name__}.{field}: {tester}' if item_cls else 'other'
+                examples = ''.join(f'\n    e.g. {format(failure)}' for failure in group.examples)
+                yield f'{prefix} failed {untracked} more times{examples}', 1
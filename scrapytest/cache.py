@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import sqlite3
+from datetime import date, datetime, time
+from decimal import Decimal
+from types import CodeType, FunctionType, MethodType
+from typing import List, Optional
+
+from scrapy import Item
+
+from scrapytest.profile import ProfiledTester
+from scrapytest.spec import ItemPlan
+from scrapytest.tests import Memoize
+
+"""
+Persistent cache of item validation results.
+Results are stored in SQLite database under a key made of stable content hash
+of the item (nested items included) and fingerprints of compiled validation
+plans of every item class in it, so changing a spec only invalidates results
+of items that contain it's item class. Database is bounded to `max_size`
+entries with least recently used entries evicted first.
+Items with values that have no exact canonical form (anything but builtin
+scalars, containers, items, dates and decimals) are never cached.
+Fingerprints cover testers, their attributes, code, defaults and closures but
+not module globals that testers refer to: clear the cache after changing them.
+"""
+
+
+def describe(obj, _seen=None):
+    """
+    Stable, picklable description of tester or any other object in spec,
+    two objects with the same description test values the same way
+    """
+    if _seen is None:
+        _seen = set()
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return obj
+    if isinstance(obj, type):
+        return f'{obj.__module__}.{obj.__qualname__}'
+    if isinstance(obj, re.Pattern):
+        return 're', obj.pattern, obj.flags
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        items = [describe(o, _seen) for o in obj]
+        return type(obj).__name__, sorted(items, key=repr) if isinstance(obj, (set, frozenset)) else items
+    if isinstance(obj, dict):
+        return 'dict', sorted(((repr(k), describe(v, _seen)) for k, v in obj.items()), key=repr)
+    # guard against reference cycles
+    if id(obj) in _seen:
+        return 'cycle'
+    _seen.add(id(obj))
+    if isinstance(obj, (Memoize, ProfiledTester)):
+        return describe(obj.tester, _seen)
+    if isinstance(obj, MethodType):
+        return 'method', describe(obj.__self__, _seen), obj.__func__.__name__
+    if isinstance(obj, FunctionType):
+        closure = [cell.cell_contents for cell in obj.__closure__ or ()]
+        return ('function', obj.__module__, obj.__qualname__, describe(obj.__code__, _seen),
+                describe(obj.__defaults__, _seen), describe(closure, _seen))
+    if isinstance(obj, CodeType):
+        return 'code', obj.co_code, describe(obj.co_consts, _seen), obj.co_names
+    state = getattr(obj, '__dict__', None)
+    if state is None and hasattr(obj, '__slots__'):
+        state = {k: getattr(obj, k, None) for k in obj.__slots__}
+    if state is None:
+        return repr(obj)
+    return describe(type(obj), _seen), describe(state, _seen)
+
+
+def plan_fingerprint(plan: ItemPlan, *extra) -> str:
+    """hash of validation plan's testers, extra values (e.g. settings) are included too"""
+    fields = sorted((name, describe(field.testers)) for name, field in plan.fields.items())
+    description = (plan.name, fields, describe(plan.default.testers), describe(extra))
+    return hashlib.blake2b(repr(description).encode('utf8'), digest_size=16).hexdigest()
+
+
+class NotCanonical(Exception):
+    """value has no exact canonical form, items with such values are not cached"""
+
+
+# exact types only: subclasses may test differently, e.g. Type(OrderedDict)
+_SCALARS = {str: 'str', int: 'int', float: 'float', bool: 'bool', type(None): 'none'}
+
+
+def _canonical(value, item_classes: set):
+    """JSON serializable form of value where every node is tagged with it's type"""
+    cls = type(value)
+    tag = _SCALARS.get(cls)
+    if tag is not None:
+        # floats are serialized by repr, so they round trip exactly
+        return [tag, value]
+    if isinstance(value, Item):
+        item_classes.add(cls)
+        fields = sorted([k, _canonical(v, item_classes)] for k, v in value.items())
+        return ['item', f'{cls.__module__}.{cls.__qualname__}', fields]
+    if cls is list or cls is tuple:
+        return [cls.__name__, [_canonical(v, item_classes) for v in value]]
+    if cls is dict:
+        pairs = [[_canonical(k, item_classes), _canonical(v, item_classes)] for k, v in value.items()]
+        return ['dict', sorted(pairs, key=json.dumps)]
+    if cls is set or cls is frozenset:
+        return [cls.__name__, sorted((_canonical(v, item_classes) for v in value), key=json.dumps)]
+    if cls is bytes:
+        return ['bytes', value.hex()]
+    if cls in (datetime, date, time):
+        return [cls.__name__, value.isoformat()]
+    if cls is Decimal:
+        return ['decimal', str(value)]
+    raise NotCanonical(cls)
+
+
+def content_hash(item: Item):
+    """
+    Stable hash of item's content, values of different types never hash the same
+    :returns: (hex digest, set of item classes found in item), digest is None when item
+              has values without exact canonical form (e.g. custom objects) and can't be cached
+    """
+    item_classes = set()
+    try:
+        data = json.dumps(_canonical(item, item_classes))
+    except NotCanonical:
+        return None, item_classes
+    return hashlib.blake2b(data.encode('utf8'), digest_size=16).hexdigest(), item_classes
+
+
+class ValidationCache:
+    """
+    SQLite backed LRU cache of item validation messages.
+    Writes and recency updates are buffered and committed every `commit_every` operations.
+    :param path: database file, parent directories are created
+    :param max_size: maximum amount of cached items, least recently used are evicted on commit
+    """
+
+    def __init__(self, path: str, max_size=1_000_000, commit_every=1000):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_size = max_size
+        self.commit_every = commit_every
+        # several validation workers can share the same database
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, messages BLOB, used INTEGER)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+        self.db.commit()
+        self.clock = self.db.execute('SELECT COALESCE(MAX(used), 0) FROM results').fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self._writes = {}
+        self._used = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, key: str) -> Optional[List]:
+        """cached messages of key, None if key is not cached"""
+        self.clock += 1
+        try:
+            data = self._writes[key][0]
+        except KeyError:
+            row = self.db.execute('SELECT messages FROM results WHERE key = ?', (key,)).fetchone()
+            data = row[0] if row else None
+        messages = self._load(data) if data is not None else None
+        if messages is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used[key] = self.clock
+        self._maybe_commit()
+        return messages
+
+    def set(self, key: str, messages: List):
+        try:
+            data = pickle.dumps(messages)
+        except Exception:
+            # messages with unpicklable values are not cached
+            return
+        self.clock += 1
+        self._writes[key] = (data, self.clock)
+        self._maybe_commit()
+
+    def _load(self, data):
+        try:
+            return pickle.loads(data)
+        except Exception:
+            # classes of cached failures could have been moved or removed since
+            return None
+
+    def _maybe_commit(self):
+        if len(self._writes) + len(self._used) >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        with self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO results (key, messages, used) VALUES (?, ?, ?)',
+                ((key, data, used) for key, (data, used) in self._writes.items()),
+            )
+            self.db.executemany('UPDATE results SET used = ? WHERE key = ?',
+                                ((used, key) for key, used in self._used.items()))
+            self._writes, self._used = {}, {}
+            self.evict()
+
+    def evict(self):
+        """remove least recently used entries above max_size"""
+        size = self.db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        if size > self.max_size:
+            self.db.execute('DELETE FROM results WHERE key IN '
+                            '(SELECT key FROM results ORDER BY used LIMIT ?)', (size - self.max_size,))
+
+    def __len__(self):
+        self.commit()
+        return self.db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self):
+        if self.db is None:
+            return
+        self.commit()
+        self.db.close()
+        self.db = None
@@ -1,28 +1,24 @@
-import json
+import os
+import sqlite3
 from collections import Counter
+from datetime import datetime
+from functools import partial
 from time import time
+from typing import Dict, List
 
 import click
-from scrapy import Item
-from scrapy.utils.project import get_project_settings
 
-from scrapytest.notifiers import SlackNotifier
-from scrapytest.utils import get_spiders_from_settings, get_test_settings, collapse_buffer, get_test_config
+from scrapytest.profile import Profiler, get_profiler, profiled
+from scrapytest.registry import DiscoveryIndex, closest_config, get_registry
+from scrapytest.utils import get_spiders_from_settings, collapse_counter, get_test_config, \
+    get_items_from_settings, get_budget_settings, close_spider
 
-from scrapytest.validate import Validator
-from scrapytest.runner import run_spiders
-
-
-def serialize_items(dct):
-    if isinstance(dct, Item):
-        return dict(dct)
-    return dct
+# modules that import scrapy and twisted are imported by the functions that use them,
+# so that `--list` and argument errors don't wait for them
 
 
 def get_spider_cls(name):
-    for spider in get_spiders_from_settings():
-        if spider.name == name:
-            return spider
+    return get_registry().get_spider(name)
 
 
 EXIT_CALLBACKS = {
@@ -30,6 +26,12 @@ EXIT_CALLBACKS = {
     1: [],
     'all': [],
 }
+# (notifier name, kwargs) sent concurrently on exit after callbacks, see setup_notifiers
+EXIT_NOTIFIERS = {
+    0: [],
+    1: [],
+    'all': [],
+}
 
 
 def exit_msg(code, msg):
@@ -42,12 +44,28 @@ def exit_msg(code, msg):
         else:
             kwargs = {}
         cb(code, msg, **kwargs)
+    send_notifications(code, msg)
     exit(code)
 
 
-def notify_slack(code, msg, config, context=None):
+def send_notifications(code, msg):
+    """send notifications of exit code concurrently, failed notifications are reported but don't change the code"""
+    notifications = EXIT_NOTIFIERS.get(code, []) + EXIT_NOTIFIERS['all']
+    if not notifications:
+        return
+    from scrapytest.notifiers import Dispatcher
+    dispatcher = Dispatcher.from_config(notifications[0][1]['config'])
+    failures = dispatcher.dispatch([
+        (name, NOTIFIERS[name], {'code': code, 'msg': msg, **kwargs}) for name, kwargs in notifications
+    ])
+    for name, error in failures:
+        click.echo(f'ERROR: {name} notification failed: {error}', err=True)
+
+
+def notify_slack(code, msg, config, context=None, timeout=10.0):
+    from scrapytest.notifiers import SlackNotifier
     click.echo(f"sending slack msg to {config['slack_channel']}")
-    SlackNotifier.from_config(config).notify(code, msg, context)
+    SlackNotifier.from_config(config).notify(code, msg, context, timeout=timeout)
 
 
 NOTIFIERS = {
@@ -55,21 +73,136 @@ NOTIFIERS = {
 }
 
 
-@click.command()
+def is_spider_name(name) -> bool:
+    """whether test module has a spider of this name, answered from the discovery index when it's fresh"""
+    index = DiscoveryIndex.load()
+    if index is not None:
+        return name in index.spider_names()
+    if not closest_config():
+        return False
+    try:
+        return get_registry().get_spider(name) is not None
+    except Exception:
+        # broken test modules are reported by the command itself
+        return False
+
+
+class DefaultGroup(click.Group):
+    """
+    Command group that runs `default` command when invoked without sub command.
+    Spiders keep precedence over sub commands of the same name, so `scrapy-test history`
+    tests spider "history" when there is one.
+    """
+
+    def __init__(self, *args, default=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default = default
+
+    def parse_args(self, ctx, args):
+        if args != ['--help'] and (not args or args[0] not in self.commands):
+            args = [self.default] + list(args)
+        elif args[0] != self.default and is_spider_name(args[0]):
+            click.echo(f'WARNING: spider "{args[0]}" shadows `{args[0]}` command, '
+                       f'rename the spider to use the command', err=True)
+            args = [self.default] + list(args)
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=DefaultGroup, default='run')
+def main():  # pragma: no cover
+    """run scrapy-test tests, `run` command is used when no command is given"""
+
+
+def report_profile(code, msg, profiler, path):
+    """print top offenders of profiler after the report and save all of it's entries to path"""
+    for line in profiler.format():
+        click.echo(line, err=True)
+    profiler.save(path)
+    click.echo(f'profile saved to {path}', err=True)
+
+
+def merge_profiles(reports) -> Profiler:
+    """profile of this process merged with profiles that workers sent with their reports"""
+    profiler = Profiler()
+    if get_profiler() is not None:
+        profiler.merge(get_profiler())
+    for report in reports:
+        if report.get('profile') is not None:
+            profiler.merge(report.pop('profile'))
+    return profiler
+
+
+def notify_options(func):
+    """decorate command with notification options"""
+    options = [
+        click.option('--notify-on-error', default='',
+                     help=f'send notification on failure, choice from: {list(NOTIFIERS)}'),
+        click.option('--notify-on-all', default='',
+                     help=f'send notification on failure or success, choice from: {list(NOTIFIERS)}'),
+        click.option('--notify-on-success', default='',
+                     help=f'send notification on success, choice from: {list(NOTIFIERS)}'),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+def setup_notifiers(config, context, notify_on_error='', notify_on_all='', notify_on_success=''):
+    to_notify = {
+        0: [n.strip() for n in notify_on_success.split(',') if n.strip()],
+        1: [n.strip() for n in notify_on_error.split(',') if n.strip()],
+        'all': [n.strip() for n in notify_on_all.split(',') if n.strip()],
+    }
+    unknown = [n for notifiers in to_notify.values() for n in notifiers if n not in NOTIFIERS]
+    if unknown:
+        exit_msg(1, f'ERROR: unknown notifiers {unknown}, choice from: {list(NOTIFIERS)}')
+    for code, notifiers in to_notify.items():
+        for notifier in notifiers:
+            kwargs = dict(config=config, context=context)
+            EXIT_NOTIFIERS[code].append((notifier, kwargs))
+
+
+@main.command()
 @click.argument('spider-name', required=False)
-@click.option('--cache', is_flag=True, help='enable HTTPCACHE_ENABLED setting for this run')
+@click.option('--cache', is_flag=True,
+              help='enable HTTPCACHE_ENABLED and VALIDATION_CACHE_ENABLED settings for this run')
 @click.option('--list', 'list_spiders', is_flag=True, help='list spiders with tests')
-@click.option('--save', help='save spider results to a file', type=click.File('w'))  # todo support
-@click.option('--notify-on-error', help=f'send notification on failure, choice from: {list(NOTIFIERS)}', default='')
-@click.option('--notify-on-all', help=f'send notification on failure or success, choice from: {list(NOTIFIERS)}', default='')
-@click.option('--notify-on-success', help=f'send notification on success, choice from: {list(NOTIFIERS)}', default='')
+@click.option('--record', is_flag=True, help='record every downloaded response to spider\'s fixture archive')
+@click.option('--replay', is_flag=True, help='serve responses from recorded fixtures only, without network access')
+@click.option('--save', help='stream scraped items to JSON Lines file, compressed for .gz and .zst extensions',
+              type=click.Path(dir_okay=False, writable=True))
+@notify_options
 @click.option('-c', '--set-config', 'added_config', help='set config value', multiple=True)
 @click.option('-s', '--set-setting', 'added_settings', help='set settings value', multiple=True)
-def main(spider_name, cache, list_spiders, save, notify_on_error, notify_on_all, notify_on_success, added_config,
-         added_settings):  # pragma: no cover
+@click.option('--workers', help='amount of processes to crawl spiders in, every spider gets its own process',
+              type=click.IntRange(min=1), default=1)
+@click.option('--validation-workers', help='amount of processes to validate items in',
+              type=click.IntRange(min=1), default=1)
+@click.option('--profile', help='profile every tester and save the profile as JSON to this file',
+              type=click.Path(dir_okay=False, writable=True))
+@click.option('--history', 'record_runs', is_flag=True,
+              help='record this run in run history and run performance tests (HISTORY_ENABLED setting)')
+def run(spider_name, cache, list_spiders, record, replay, save, notify_on_error, notify_on_all, notify_on_success,
+        added_config, added_settings, workers, validation_workers, profile, record_runs):  # pragma: no cover
     """run scrapy-test tests and output messages and appropriate exit code (1 for failed, 0 for passed)"""
+    # discovery index answers --list and unknown spider names without importing the test module
+    index = DiscoveryIndex.load()
+    if index is not None and index.spiders:
+        if list_spiders:
+            for name, spider in index.spiders:
+                print(f'{name} @ {spider}')
+            exit(0)
+        if spider_name and spider_name not in index.spider_names():
+            exit_msg(1, f'ERROR: spider {spider_name} not found')
+
     # get spiders
     spiders = get_spiders_from_settings()
+    config_path = closest_config()
+    if index is None and config_path:
+        try:
+            DiscoveryIndex.from_registry(get_registry(), config_path).save()
+        except OSError:
+            pass
     if not spiders:
         exit_msg(1, 'ERROR: no spiders found')
     if list_spiders:
@@ -87,38 +220,169 @@ def main(spider_name, cache, list_spiders, save, notify_on_error, notify_on_all,
     # setup notifiers
     added_config = {k.split('=', 1)[0]: k.split('=', 1)[1] for k in added_config}
     config = {**get_test_config(), **added_config}
-    to_notify = {
-        0: [n.strip() for n in notify_on_success.split(',') if n.strip()],
-        1: [n.strip() for n in notify_on_error.split(',') if n.strip()],
-        'all': [n.strip() for n in notify_on_all.split(',') if n.strip()],
-    }
-    for code, notifiers in to_notify.items():
-        for notifier in notifiers:
-            kwargs = dict(config=config, context=', '.join(spider_names))
-            EXIT_CALLBACKS[code].append((NOTIFIERS[notifier], kwargs))
+    setup_notifiers(config, ', '.join(spider_names), notify_on_error, notify_on_all, notify_on_success)
 
     # run tests
     start = time()
-    messages = []
+    added_settings = {k.split('=', 1)[0]: k.split('=', 1)[1] for k in added_settings}
+    if workers > 1 and validation_workers > 1:
+        exit_msg(1, 'ERROR: --workers and --validation-workers cannot be used together')
+    if record and replay:
+        exit_msg(1, 'ERROR: --record and --replay cannot be used together')
+    if profile and validation_workers > 1:
+        exit_msg(1, 'ERROR: --profile and --validation-workers cannot be used together')
+    if profile:
+        added_settings['VALIDATION_PROFILE'] = True
+    if record:
+        added_settings['FIXTURES_RECORD'] = True
+    if replay:
+        added_settings['FIXTURES_REPLAY'] = True
+    if record_runs:
+        added_settings['HISTORY_ENABLED'] = True
+    if save:
+        # items are appended to the feed while spiders run
+        open(save, 'wb').close()
+    from scrapytest.feed import FeedWriter
+    from scrapytest.parallel import ParallelValidator
+    from scrapytest.pool import run_spiders_in_pool
+    settings = build_settings(config, added_settings, cache)
+    if workers > 1:
+        reports = run_spiders_in_pool([s.name for s in spiders], workers, config=config,
+                                      added_settings=added_settings, cache=cache, save=save)
+    elif validation_workers > 1:
+        settings_factory = partial(build_settings, config, added_settings, cache)
+        with ParallelValidator(settings_factory, validation_workers) as parallel:
+            reports = crawl_spiders(spiders, settings, parallel=parallel, save=save)
+    else:
+        reports = crawl_spiders(spiders, settings, save=save)
+    # reports from workers arrive in order of completion
+    reports = {report['spider']: report for report in reports}
+    if settings.getbool('HISTORY_ENABLED'):
+        record_history(spiders, reports, settings, start)
+    if profile:
+        EXIT_CALLBACKS['all'].append((report_profile, {'profiler': merge_profiles(reports.values()), 'path': profile}))
+
+    # worker pool writes the stats trailer itself
+    if save and workers == 1:
+        with FeedWriter(save, append=True) as feed:
+            feed.write_stats({spider.name: reports[spider.name]['stats'] for spider in spiders})
+    exit_report(spiders, reports, start)
 
+
+@main.command('validate-feed')
+@click.argument('feed', type=click.Path(exists=True, dir_okay=False))
+@click.argument('spider-name', required=False)
+@notify_options
+@click.option('-c', '--set-config', 'added_config', help='set config value', multiple=True)
+@click.option('-s', '--set-setting', 'added_settings', help='set settings value', multiple=True)
+@click.option('--validation-workers', help='amount of processes to validate items in',
+              type=click.IntRange(min=1), default=1)
+@click.option('--batch-size', help='amount of feed records validated at once', type=click.IntRange(min=1),
+              default=500)
+@click.option('--cache', is_flag=True, help='enable VALIDATION_CACHE_ENABLED setting for this run')
+@click.option('--profile', help='profile every tester and save the profile as JSON to this file',
+              type=click.Path(dir_okay=False, writable=True))
+def validate_feed(feed, spider_name, notify_on_error, notify_on_all, notify_on_success, added_config,
+                  added_settings, validation_workers, batch_size, cache, profile):  # pragma: no cover
+    """
+    validate items and stats of JSON Lines feed (see --save) without crawling,
+    spider name is required for feeds that don't tag records with spiders
+    """
+    added_config = {k.split('=', 1)[0]: k.split('=', 1)[1] for k in added_config}
+    config = {**get_test_config(), **added_config}
     added_settings = {k.split('=', 1)[0]: k.split('=', 1)[1] for k in added_settings}
-    settings = get_project_settings()
-    test_settings = get_test_settings(config)
-    settings.update(test_settings, priority=40)
-    settings.update(added_settings, priority=50)
-    if cache:
-        settings['HTTPCACHE_ENABLED'] = True
-    results, stats = run_spiders(spiders, settings=settings)
-    failures = Counter()
+    if profile and validation_workers > 1:
+        exit_msg(1, 'ERROR: --profile and --validation-workers cannot be used together')
+    if profile:
+        added_settings['VALIDATION_PROFILE'] = True
+    from scrapytest.exceptions import FeedError
+    from scrapytest.feed import read_feed
+    from scrapytest.parallel import ParallelValidator
+    settings_factory = partial(build_settings, config, added_settings, cache)
+    settings = settings_factory()
+    spiders = get_spiders_from_settings(settings)
+    if not spiders:
+        exit_msg(1, 'ERROR: no spiders found')
+    if spider_name:
+        spiders = [s for s in spiders if s.name == spider_name]
+        if not spiders:
+            exit_msg(1, f'ERROR: spider {spider_name} not found')
+    setup_notifiers(config, feed, notify_on_error, notify_on_all, notify_on_success)
+
+    start = time()
+    records = read_feed(feed)
+    try:
+        if validation_workers > 1:
+            with ParallelValidator(settings_factory, validation_workers, batch_size=batch_size) as parallel:
+                reports = validate_records(records, spiders, settings, parallel=parallel)
+        else:
+            reports = validate_records(records, spiders, settings, batch_size=batch_size)
+    except FeedError as e:
+        exit_msg(1, f'ERROR: {e}')
+    if profile:
+        EXIT_CALLBACKS['all'].append((report_profile, {'profiler': merge_profiles([]), 'path': profile}))
+    exit_report([s for s in spiders if s.name in reports], reports, start)
+
+
+@main.command()
+@click.argument('spider-name', required=False)
+@click.option('--clear', is_flag=True, help='remove fixture archives')
+def fixtures(spider_name, clear):  # pragma: no cover
+    """list recorded fixture archives of test spiders (see run --record)"""
+    from scrapytest.fixtures import FixtureStore, fixture_path
+    settings = build_settings(get_test_config())
+    spiders = get_spiders_from_settings(settings)
+    if spider_name:
+        spiders = [s for s in spiders if s.name == spider_name]
+        if not spiders:
+            exit_msg(1, f'ERROR: spider {spider_name} not found')
     for spider in spiders:
-        buffer, failed = validate_spider(spider, results[spider.name], stats[spider.name])
-        failures.update(failed)
-        messages.extend(buffer)
-    messages = collapse_buffer(messages)
+        path = fixture_path(settings, spider.name)
+        if not os.path.exists(path):
+            click.echo(f'{spider.name}: no fixtures')
+            continue
+        if clear:
+            os.remove(path)
+            click.echo(f'{spider.name}: removed {path}')
+            continue
+        with FixtureStore(path) as store:
+            click.echo(f'{spider.name}: {len(store)} responses, {os.path.getsize(path) / 1024:.1f} KiB @ {path}')
 
-    if save:
-        save.write(json.dumps(results, indent=2, default=serialize_items))
-        save.close()
+
+@main.command()
+@click.argument('spider-name', required=False)
+@click.option('--limit', help='amount of most recent spider runs to show', type=click.IntRange(min=1), default=20)
+def history(spider_name, limit):  # pragma: no cover
+    """show metrics of recent test runs recorded in run history (see HISTORY_* settings)"""
+    from scrapy.utils.project import data_path
+    from scrapytest.history import RunHistory
+    settings = build_settings(get_test_config())
+    path = data_path(settings['HISTORY_PATH'])
+    if not os.path.exists(path):
+        exit_msg(1, f'ERROR: no run history at {path}')
+    with RunHistory(path) as store:
+        runs = store.recent(spider_name, limit=limit)
+    click.echo(f'{"run":>5} {"started":<19} {"mode":<6} {"elapsed s":>9} {"items/s":>8} {"requests/s":>10} '
+               f'{"MiB":>7} {"failures":>8}  spider')
+    for run in runs:
+        started = datetime.fromtimestamp(run['started']).strftime('%Y-%m-%d %H:%M:%S')
+        failures = sum(v for k, v in run.items() if k.endswith('_failures'))
+        memory = (run.get('peak_memory') or 0) / 2 ** 20
+        reason = '' if run['finish_reason'] == 'finished' else f' ({run["finish_reason"]})'
+        click.echo(f'{run["run_id"]:>5} {started:<19} {run["mode"]:<6} {run["elapsed"] or 0:>9.2f} '
+                   f'{run["items_per_second"] or 0:>8.2f} {run["requests_per_second"] or 0:>10.2f} '
+                   f'{memory:>7.1f} {failures:>8}  {run["spider"]}{reason}')
+
+
+def exit_report(spiders, reports, start):  # pragma: no cover
+    """merge spider reports in order of spiders and exit with their messages"""
+    messages = Counter()
+    failures = Counter()
+    for spider in spiders:
+        report = reports[spider.name]
+        failures.update(report['failed'])
+        messages.update(report['messages'])
+    messages = collapse_counter(messages)
     exit_code = 0
     if any(failures.values()):
         exit_code = 1
@@ -127,29 +391,246 @@ def main(spider_name, cache, list_spiders, save, notify_on_error, notify_on_all,
     exit_msg(exit_code, '\n'.join(messages))
 
 
-def validate_spider(spider_cls, results, stats):  # pragma: no cover
-    buffer = []
+def build_settings(config, added_settings=None, cache=False):  # pragma: no cover
+    """build crawl settings from project settings, test module and cli overrides"""
+    from scrapy.utils.project import get_project_settings
+    from scrapytest.fixtures import configure_fixtures
+    from scrapytest.latency import configure_latency_stats
+    from scrapytest.live import configure_live_stats
+    from scrapytest.utils import get_test_settings
+    settings = get_project_settings()
+    test_settings = get_test_settings(config)
+    settings.update(test_settings, priority=40)
+    settings.update(get_budget_settings(config), priority=45)
+    settings.update(added_settings or {}, priority=50)
+    if cache:
+        settings['HTTPCACHE_ENABLED'] = True
+        settings['VALIDATION_CACHE_ENABLED'] = True
+    configure_fixtures(settings)
+    configure_live_stats(settings)
+    configure_latency_stats(settings)
+    return settings
+
+
+def crawl_spiders(spiders, settings, keep_items=False, parallel=None, save=None,
+                  feed=None) -> List[dict]:  # pragma: no cover
+    """
+    Crawl spiders in current process while validating their items as they are scraped
+    :param parallel: optional ParallelValidator to validate items with
+    :param save: path of feed to append scraped items to, see scrapytest.feed
+    :param feed: already open FeedWriter to write scraped items to instead of `save`
+    :returns: report dictionary for every spider, see validate_spider
+    """
+    from scrapytest.feed import FeedWriter
+    from scrapytest.history import crawl_metrics, peak_memory
+    from scrapytest.runner import run_spiders
+    from scrapytest.validate import Validator, ItemStream, FailureBudget
+    validator = parallel.validator if parallel else Validator.from_settings(settings)
+    budgets = {spider.name: FailureBudget.from_settings(validator, settings, spider) for spider in spiders}
+    streams = {}
+    for spider in spiders:
+        batch_size = parallel.batch_size if parallel else validator.batch_size
+        if budgets[spider.name]:
+            # budgets are checked as batches are validated
+            batch_size = min(batch_size, settings.getint('FAILURE_BUDGET_BATCH_SIZE'))
+        if parallel:
+            streams[spider.name] = parallel.stream(keep_items=keep_items, spider=spider.name, batch_size=batch_size)
+        else:
+            streams[spider.name] = ItemStream(validator, keep_items=keep_items, spider=spider.name,
+                                              batch_size=batch_size)
+    aborted = {}
 
-    def echo(text):
-        buffer.append(text)
+    def validate_item(item, spider):
+        stream = streams[spider.name]
+        stream.feed(item)
+        if feed:
+            feed.write_item(spider.name, item)
+        budget = budgets[spider.name]
+        if budget is None or spider.name in aborted:
+            return
+        budget.add(item)
+        over_budget = budget.check(stream)
+        if over_budget:
+            reason, msg = over_budget
+            aborted[spider.name] = f'{spider.__class__.__name__}: closed with {reason}: {msg}'
+            close_spider(spider.crawler, reason)
 
-    validator = Validator.from_settings()
+    own_feed = save and not feed
+    if own_feed:
+        feed = FeedWriter(save, append=True)
+    try:
+        _, stats = run_spiders(spiders, settings=settings, item_callback=validate_item, keep_results=False)
+    finally:
+        if own_feed:
+            feed.close()
+    reports = []
+    for spider in spiders:
+        stream = streams[spider.name]
+        messages, failed = validate_spider(spider, stream, stats[spider.name], aborted.get(spider.name))
+        reports.append({
+            'spider': spider.name,
+            'messages': messages,
+            'failed': failed,
+            'stats': stats[spider.name],
+            'items': stream.items,
+            'metrics': crawl_metrics(stats[spider.name], failed, extra_stats=settings.getlist('HISTORY_STATS'),
+                                     memory=peak_memory()),
+        })
+    if not parallel:
+        close_validator(validator)
+    return reports
 
-    failed_count = 0
-    for msg in validator.validate_items(results):
-        echo(msg)
-        failed_count += 1
+
+def history_mode(settings) -> str:
+    """replayed and cached crawls perform differently, so each has it's own history"""
+    if settings.getbool('FIXTURES_REPLAY'):
+        return 'replay'
+    if settings.getbool('HTTPCACHE_ENABLED'):
+        return 'cache'
+    return 'live'
+
+
+def record_history(spiders, reports, settings, start):  # pragma: no cover
+    """
+    Validate metrics of crawled spiders with their PerformanceSpecs against run history
+    and record them, failed performance tests are added to spider reports
+    """
+    mode = history_mode(settings)
+    window = settings.getint('HISTORY_WINDOW')
+    try:
+        _record_history(spiders, reports, settings, start, mode, window)
+    except (sqlite3.Error, OSError) as e:
+        # test report is more important than it's history
+        click.echo(f'ERROR: run history could not be recorded: {e}', err=True)
+
+
+def _record_history(spiders, reports, settings, start, mode, window):  # pragma: no cover
+    from scrapy.utils.project import data_path
+    from scrapytest.history import RunHistory, validate_performance
+    from scrapytest.live import get_stats_specs
+    from scrapytest.spec import PerformanceSpec
+    with RunHistory(data_path(settings['HISTORY_PATH'])) as history:
+        run_id = history.add_run(start, mode=mode)
+        for spider in spiders:
+            report = reports[spider.name]
+            specs = get_stats_specs(settings, spider, spec_cls=PerformanceSpec)
+            messages = validate_performance(history, spider.name, report['metrics'], specs, mode=mode, window=window)
+            for msg in messages:
+                report['messages'][msg] += 1
+            if messages:
+                report['messages'].pop(f"{f' {spider.__name__} all tests have passed!':=^80} ", None)
+                report['messages'][f"{f' {spider.__name__} failed {len(messages)} performance tests ':=^80}"] += 1
+            report['failed']['performance'] = len(messages)
+            finish_reason = (report['stats'] or {}).get('finish_reason', 'finished')
+            history.add_spider_run(run_id, spider.name, report['metrics'], mode=mode, finish_reason=finish_reason)
+
+
+def validate_records(records, spiders, settings, parallel=None,
+                     batch_size=None) -> Dict[str, dict]:  # pragma: no cover
+    """
+    Validate feed records (see scrapytest.feed) without crawling.
+    Records that are not tagged with a spider, like in scrapy's own feed exports, belong to the only spider given.
+    :param parallel: optional ParallelValidator to validate items with
+    :param batch_size: amount of items validated at once without parallel, VALIDATION_BATCH_SIZE by default
+    :returns: report dictionary (see crawl_spiders) for every spider that has items or stats in the feed
+    """
+    from scrapytest.exceptions import FeedError
+    from scrapytest.feed import ItemBuilder
+    from scrapytest.validate import Validator, ItemStream
+    validator = parallel.validator if parallel else Validator.from_settings(settings)
+    batch_size = batch_size or validator.batch_size
+    builder = ItemBuilder([*validator.item_specs, *get_items_from_settings(settings)], validator.item_plans)
+    spiders = {spider.name: spider for spider in spiders}
+    streams = {}
+    stats = {}
+    for record in records:
+        if set(record) == {'stats'}:
+            stats.update(record['stats'])
+            continue
+        name = record.get('spider') if 'item' in record else None
+        if name is None:
+            if len(spiders) > 1:
+                raise FeedError('feed records are not tagged with spiders, spider name is required')
+            name = next(iter(spiders))
+        if name not in spiders:
+            continue
+        try:
+            stream = streams[name]
+        except KeyError:
+            if parallel:
+                stream = streams[name] = parallel.stream(spider=name)
+            else:
+                stream = streams[name] = ItemStream(validator, spider=name, batch_size=batch_size)
+        stream.feed(builder.build(record))
+
+    reports = {}
+    for name, spider in spiders.items():
+        if name not in streams and name not in stats:
+            continue
+        stream = streams.get(name) or ItemStream(validator, spider=name)
+        messages, failed = validate_spider(spider, stream, stats.get(name))
+        reports[name] = {
+            'spider': name,
+            'messages': messages,
+            'failed': failed,
+            'stats': stats.get(name),
+            'items': None,
+        }
+    if not parallel:
+        close_validator(validator)
+    return reports
+
+
+def close_validator(validator):  # pragma: no cover
+    validator.close()
+    if validator.cache is not None:
+        cache = validator.cache
+        click.echo(f'validation cache: {cache.hits} hits, {cache.misses} misses', err=True)
+    for memoized in validator.memoized.values():
+        if memoized.hits or memoized.misses or memoized.unhashable:
+            click.echo(f'tester cache: {memoized}: {memoized.hits} hits, {memoized.misses} misses, '
+                       f'{memoized.unhashable} unhashable', err=True)
+
+
+@profiled('validate_spider')
+def validate_spider(spider_cls, stream, stats, aborted=None):  # pragma: no cover
+    """
+    Finish validation of spider's item stream and validate it's stats, stats validation is skipped for None
+    :param aborted: message of spider that was closed for being over it's failure budget
+    :returns: counter of messages and dictionary of failure counts
+    """
+    buffer = Counter()
+
+    def echo(text, count=1):
+        buffer[text] += count
+
+    stream.close()
+    validator = stream.validator
+
+    if stream.sampler is not None:
+        echo(f'{spider_cls.__name__}: validated a sample of {stream.validated} out of {stream.sampler.total} items')
+
+    failed_count = stream.failed
+    for msg, count in stream.report():
+        echo(msg, count)
 
     failed_stats_count = 0
-    for msg in validator.validate_stats(spider_cls, stats):
-        echo(msg)
-        failed_stats_count += 1
+    if stats is None:
+        # feeds without stats trailer
+        echo(f'{spider_cls.__name__}: no stats to validate')
+    else:
+        for msg in validator.validate_stats(spider_cls, stats):
+            echo(msg)
+            failed_stats_count += 1
 
     failed_coverage_count = 0
-    for msg in validator.validate_coverage(results):
+    for msg in stream.validate_coverage():
         echo(msg)
         failed_coverage_count += 1
 
+    if aborted:
+        echo(aborted)
+
     # if failed_count or failed_stats_count or failed_coverage_count:
     if failed_count:
         echo(f"{f' {spider_cls.__name__} failed {failed_count} field tests ':=^80}")
@@ -157,6 +638,9 @@ def validate_spider(spider_cls, results, stats):  # pragma: no cover
         echo(f"{f' {spider_cls.__name__} failed {failed_stats_count} stat tests ':=^80}")
     if failed_coverage_count:
         echo(f"{f' {spider_cls.__name__} failed {failed_coverage_count} field coverage tests':=^80} ")
-    if not any([failed_coverage_count, failed_stats_count, failed_count]):
+    if aborted:
+        echo(f"{f' {spider_cls.__name__} was closed early ':=^80}")
+    elif not any([failed_coverage_count, failed_stats_count, failed_count]):
         echo(f"{f' {spider_cls.__name__} all tests have passed!':=^80} ")
-    return buffer, {'item': failed_count, 'stat': failed_stats_count, 'coverage': failed_coverage_count}
+    return buffer, {'item': failed_count, 'stat': failed_stats_count, 'coverage': failed_coverage_count,
+                    'budget': int(bool(aborted))}
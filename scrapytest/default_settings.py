@@ -8,3 +8,91 @@ SKIP_STATS_WITHOUT_SPEC = False
 # empty value is bool(value) == False,
 # non-iterable values cannot be empty (e.g. bool, integers, floats etc.)
 EMPTY_IS_MISSING = True
+
+# Failed values longer than this are truncated in reported messages, 0 disables truncation
+MAX_VALUE_LENGTH = 200
+
+# Item failures are grouped by spider, item class, field and tester. Every group
+# counts this many most frequent failures exactly and keeps this many random examples
+# of the rest, so memory doesn't grow with the amount of failures
+FAILURE_TOP_SIZE = 10
+FAILURE_EXAMPLES_SIZE = 3
+
+# Items are validated in batches of this size: values of every field are collected into
+# columns that testers with batch protocol test at once, see scrapytest.tests.run_batch
+VALIDATION_BATCH_SIZE = 500
+
+# Sampling mode for huge crawls, see scrapytest.sampling: only a random VALIDATION_SAMPLE_RATE
+# fraction of items is validated, or with VALIDATION_SAMPLE_SIZE a fixed size uniform sample
+# of every item class. Coverage of samples is estimated with COVERAGE_CONFIDENCE level
+# confidence intervals and fails only when the interval lies below expected coverage
+VALIDATION_SAMPLE_RATE = 1.0
+VALIDATION_SAMPLE_SIZE = 0
+VALIDATION_SAMPLE_SEED = None
+COVERAGE_CONFIDENCE = 0.95
+
+# Average amount of seconds ValidationPipeline can spend validating every scraped item of
+# production crawls, items are skipped while validation is over budget. 0 disables the budget
+VALIDATION_TIME_BUDGET = 0
+
+# Record call counts, wall time and failures of every tester, see scrapytest.profile and --profile
+VALIDATION_PROFILE = False
+
+# Results of pure testers (see scrapytest.tests.Memoize) are cached for this many
+# distinct values per tester, 0 disables the caching
+TESTER_CACHE_SIZE = 10_000
+
+# Validation results of items are cached on disk under a key of item's content and
+# it's item spec, so re-runs only validate items or item classes that changed.
+# Enabled by `--cache` flag as well, relative paths are placed in project's .scrapy directory
+VALIDATION_CACHE_ENABLED = False
+VALIDATION_CACHE_PATH = 'scrapytest/validation.db'
+# maximum amount of cached items, least recently used ones are evicted
+VALIDATION_CACHE_SIZE = 1_000_000
+
+# Recorded fixtures, see scrapytest.fixtures and --record, --replay flags.
+# Every spider gets it's own archive in this directory, relative paths are placed
+# in project's .scrapy directory
+FIXTURES_DIR = 'scrapytest/fixtures'
+FIXTURES_RECORD = False
+FIXTURES_REPLAY = False
+
+# Fail-fast limits checked while spiders crawl, see scrapytest.validate.FailureBudget.
+# Spider with more item failures than it's budget is closed with `failure_budget` reason,
+# None disables the budget. Budgets of spiders by name in FAILURE_BUDGETS and `failure_budget`
+# attributes of StatsSpec take precedence, scrapy.cfg [test] section can set all of them too
+FAILURE_BUDGET = None
+FAILURE_BUDGETS = {}
+# Close spider with `coverage_unreachable` reason as soon as any field's coverage can no longer
+# reach it's ItemSpec floor. Only 100% floors can become unreachable unless the amount of items
+# is bounded by CLOSESPIDER_ITEMCOUNT
+COVERAGE_FAIL_FAST = False
+# Spiders with failure budgets validate their items in batches of at most this size
+# so budgets are checked without much delay
+FAILURE_BUDGET_BATCH_SIZE = 20
+
+# Live stats validation during crawls, see scrapytest.live: every LIVE_STATS_INTERVAL seconds
+# stats that changed are checked with `live` patterns of StatsSpec, 0 disables it.
+# LIVE_STATS_ACTION is one of 'warn' (log failures), 'notify' (send failures to
+# LIVE_STATS_NOTIFIERS, e.g. ['slack']) and 'close' (close spider with `live_stats_failure` reason)
+LIVE_STATS_INTERVAL = 0
+LIVE_STATS_ACTION = 'warn'
+LIVE_STATS_NOTIFIERS = []
+
+# Run history, see scrapytest.history: metrics of every crawled spider (elapsed time, throughput,
+# response bytes, peak memory, failure counts) are recorded in this SQLite database and
+# PerformanceSpecs compare them to the median of the last HISTORY_WINDOW recorded runs.
+# Relative paths are placed in project's .scrapy directory. Enabled for a single run with --history
+HISTORY_ENABLED = False
+HISTORY_PATH = 'scrapytest/history.db'
+HISTORY_WINDOW = 10
+# numeric stats recorded as metrics under their own names as well, e.g. ['downloader/exception_count']
+HISTORY_STATS = []
+
+# Latency histograms, see scrapytest.latency: download latency of every response and processing
+# time of every spider callback are recorded in histograms with LATENCY_STATS_PRECISION relative
+# error and exported to stats, e.g. `latency/download` histogram for PercentileBelow and MeanBelow
+# testers and `latency/download/p95` summary stats for every percentile of LATENCY_STATS_PERCENTILES
+LATENCY_STATS_ENABLED = False
+LATENCY_STATS_PRECISION = 0.02
+LATENCY_STATS_PERCENTILES = [50, 90, 95, 99]
@@ -1,2 +1,18 @@
 class ConfigError(Exception):
     pass
+
+
+class FeedError(Exception):
+    pass
+
+
+class MissingFixtureError(Exception):
+    pass
+
+
+class NotificationError(Exception):
+    """notification was not delivered, retryable errors are worth sending again"""
+
+    def __init__(self, msg, retryable=False):
+        super().__init__(msg)
+        self.retryable = retryable
@@ -0,0 +1,251 @@
+import gzip
+import json
+import mmap
+import os
+import shutil
+from datetime import date, datetime, timedelta
+from typing import IO, Dict, Iterator, List, Optional, Type
+
+from scrapy import Item, Field
+from scrapy.item import ItemMeta
+
+try:
+    import zstandard
+
+    HAS_ZSTANDARD = True
+except ImportError:
+    HAS_ZSTANDARD = False
+
+"""
+Streaming of scraped items to JSON Lines feed files.
+Every item is written as soon as it's scraped as a single record:
+{"spider": "myspider", "item_cls": "PostItem", "item": {...}}
+and crawl stats of all spiders are written as the last, trailer, record:
+{"stats": {"myspider": {...}}}
+Feeds are compressed by file extension: `.gz` for gzip, `.zst` for zstandard.
+"""
+
+COMPRESSIONS = {
+    '.gz': 'gzip',
+    '.gzip': 'gzip',
+    '.zst': 'zstd',
+    '.zstd': 'zstd',
+}
+
+
+def serialize(obj):
+    """json default for values found in items and stats"""
+    if isinstance(obj, Item):
+        return dict(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def get_compression(path: str) -> str:
+    """compression name from path's extension, None for plain text"""
+    _, ext = os.path.splitext(path)
+    return COMPRESSIONS.get(ext.lower())
+
+
+def open_feed(path: str, mode='rb', compression='infer') -> IO[bytes]:
+    """
+    Open binary feed file stream that (de)compresses data on the fly
+    :param mode: one of rb, wb or ab
+    :param compression: gzip, zstd, None or 'infer' to pick it by path's extension
+    """
+    if compression == 'infer':
+        compression = get_compression(path)
+    if compression == 'gzip':
+        return gzip.open(path, mode)
+    if compression == 'zstd':
+        if not HAS_ZSTANDARD:
+            raise ImportError('zstandard is required for .zst feeds: pip install zstandard')
+        file = open(path, mode)
+        if 'r' in mode:
+            return zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True, closefd=True)
+        return zstandard.ZstdCompressor().stream_writer(file, closefd=True)
+    if compression:
+        raise ValueError(f'unknown compression {compression!r}')
+    return open(path, mode)
+
+
+class FeedWriter:
+    """
+    Writes item records to JSON Lines feed as they arrive.
+    Encoded records are buffered and flushed to the file in chunks of `chunk_size` bytes,
+    so only a single chunk of the feed is ever held in memory.
+    """
+
+    def __init__(self, path: str, compression='infer', chunk_size=1024 * 1024, append=False):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.file = open_feed(path, 'ab' if append else 'wb', compression)
+        self.buffer = []
+        self.buffered = 0
+        self.written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_record(self, record: dict):
+        line = json.dumps(record, default=serialize).encode('utf8') + b'\n'
+        self.buffer.append(line)
+        self.buffered += len(line)
+        if self.buffered >= self.chunk_size:
+            self.flush()
+
+    def write_item(self, spider: str, item):
+        self.write_record({'spider': spider, 'item_cls': type(item).__name__, 'item': item})
+        self.written += 1
+
+    def write_stats(self, stats: dict):
+        """write stats of every spider as trailer record"""
+        self.write_record({'stats': stats})
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(b''.join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def append_feed(path: str, part_path: str, chunk_size=1024 * 1024):
+    """
+    Append raw contents of feed part to feed and remove the part.
+    Feeds have to use the same compression, both gzip members and zstd frames
+    can be concatenated as they are.
+    """
+    with open(path, 'ab') as file, open(part_path, 'rb') as part:
+        shutil.copyfileobj(part, file, chunk_size)
+    os.remove(part_path)
+
+
+def read_feed(path: str, compression='infer') -> Iterator[dict]:
+    """
+    Generate records of JSON Lines feed.
+    Uncompressed feeds are memory mapped, compressed ones are decompressed as a stream.
+    """
+    if compression == 'infer':
+        compression = get_compression(path)
+    if not compression:
+        yield from _read_mmap(path)
+        return
+    with open_feed(path, 'rb', compression) as file:
+        # zstd reader is not line iterable
+        lines = _iter_lines(file) if compression == 'zstd' else file
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _read_mmap(path):
+    # empty files cannot be mapped
+    if not os.path.getsize(path):
+        return
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for line in iter(mapped.readline, b''):
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_lines(file, chunk_size=1024 * 1024):
+    rest = b''
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        yield from lines
+    if rest:
+        yield rest
+
+
+class ItemBuilder:
+    """
+    Rebuilds Items from feed records.
+    Item class of record is looked up by record's `item_cls` name, nested dictionaries
+    and records of plain feeds (e.g. scrapy's own jsonlines exports) are matched to the
+    known item class with the least fields that still has all of dictionary's keys.
+    Nested dictionaries are only rebuilt in fields that can hold items according to
+    `item_plans` (see ItemSpec.compile), other dictionaries are kept as they are.
+    Records of unknown item classes get a dynamic Item class of the same name, fields that
+    known item classes don't have anymore are skipped.
+    """
+
+    def __init__(self, item_classes: List[Type[Item]], item_plans: Optional[Dict] = None):
+        """
+        :param item_plans: {item class: ItemPlan} of validated item classes, when given nested
+                           dictionaries of item classes without a plan are not rebuilt
+        """
+        self.item_classes = list(item_classes)
+        self.item_plans = item_plans
+        self.by_name = {item_cls.__name__: item_cls for item_cls in self.item_classes}
+        self._by_keys = {}
+        self._dynamic = set()
+
+    def build(self, record: dict) -> Item:
+        """build item from feed record"""
+        data = record['item'] if 'item' in record else record
+        name = record.get('item_cls') if 'item' in record else None
+        item_cls = self.get_cls(name) if name else self.match(data)
+        return self._build(item_cls or self.get_cls('Item'), data)
+
+    def get_cls(self, name: str) -> Type[Item]:
+        """item class by name, unknown names get a dynamic Item class"""
+        try:
+            return self.by_name[name]
+        except KeyError:
+            item_cls = self.by_name[name] = ItemMeta(name, (Item,), {})
+            self._dynamic.add(item_cls)
+            return item_cls
+
+    def match(self, data: dict):
+        """find item class for dictionary by it's keys, None if no item class fits"""
+        keys = frozenset(data)
+        try:
+            return self._by_keys[keys]
+        except KeyError:
+            # empty dictionaries fit every item class
+            candidates = [item_cls for item_cls in self.item_classes if keys and keys <= item_cls.fields.keys()]
+            item_cls = self._by_keys[keys] = min(candidates, key=lambda cls: len(cls.fields), default=None)
+            return item_cls
+
+    def _build(self, item_cls, data: dict) -> Item:
+        item = item_cls()
+        fields = item_cls.fields
+        for key, value in data.items():
+            if key not in fields:
+                if item_cls not in self._dynamic:
+                    continue
+                # fields of dynamic item classes are discovered as they come
+                fields[key] = Field()
+            item[key] = self._build_value(value) if self._can_hold_items(item_cls, key) else value
+        return item
+
+    def _can_hold_items(self, item_cls, key) -> bool:
+        if self.item_plans is None:
+            return True
+        plan = self.item_plans.get(item_cls)
+        return plan is not None and plan.get(key).nested
+
+    def _build_value(self, value):
+        if isinstance(value, dict):
+            item_cls = self.match(value)
+            return self._build(item_cls, value) if item_cls else value
+        if isinstance(value, list):
+            return [self._build_value(v) for v in value]
+        return value
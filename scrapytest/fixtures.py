@@ -0,0 +1,193 @@
+import json
+import os
+import sqlite3
+import zlib
+from time import time
+from typing import Optional
+
+from scrapy import signals
+from scrapy.http import Headers, Request, Response
+from scrapy.responsetypes import responsetypes
+from scrapy.settings import Settings
+from scrapy.utils.project import data_path
+from twisted.internet import defer
+
+from scrapytest.exceptions import MissingFixtureError
+from scrapytest.utils import close_spider
+
+"""
+Recorded fixtures for offline test crawls.
+With FIXTURES_RECORD setting every response test spider downloads is stored in the
+spider's fixture archive: single SQLite file with zlib compressed bodies indexed by
+request fingerprint. With FIXTURES_REPLAY setting responses are served by
+FixtureDownloadHandler straight from the archive without touching the network,
+requests without fixture fail with MissingFixtureError.
+"""
+
+
+def fixture_path(settings: Settings, spider_name: str) -> str:
+    return os.path.join(data_path(settings['FIXTURES_DIR']), f'{spider_name}.db')
+
+
+def configure_fixtures(settings: Settings):
+    """adjust crawl settings for recording or replaying fixtures, see FIXTURES_RECORD and FIXTURES_REPLAY"""
+    if settings.getbool('FIXTURES_RECORD'):
+        # closest to the downloader so raw responses are recorded before they are decoded or redirected
+        middleware = 'scrapytest.fixtures.FixtureRecorderMiddleware'
+        middlewares = {**settings.getdict('DOWNLOADER_MIDDLEWARES'), middleware: 950}
+        settings.set('DOWNLOADER_MIDDLEWARES', middlewares, priority='cmdline')
+    if settings.getbool('FIXTURES_REPLAY'):
+        handler = 'scrapytest.fixtures.FixtureDownloadHandler'
+        handlers = {**settings.getdict('DOWNLOAD_HANDLERS'), 'http': handler, 'https': handler}
+        settings.set('DOWNLOAD_HANDLERS', handlers, priority='cmdline')
+        # nothing to be polite to, crawl at full concurrency
+        settings.set('CONCURRENT_REQUESTS_PER_DOMAIN', settings.getint('CONCURRENT_REQUESTS'), priority='cmdline')
+        settings.set('CONCURRENT_REQUESTS_PER_IP', 0, priority='cmdline')
+        settings.set('DOWNLOAD_DELAY', 0, priority='cmdline')
+        settings.set('RANDOMIZE_DOWNLOAD_DELAY', False, priority='cmdline')
+        settings.set('AUTOTHROTTLE_ENABLED', False, priority='cmdline')
+        settings.set('ROBOTSTXT_OBEY', False, priority='cmdline')
+        settings.set('HTTPCACHE_ENABLED', False, priority='cmdline')
+
+
+def get_fingerprinter(crawler):
+    """request fingerprint function of crawler's scrapy version"""
+    fingerprinter = getattr(crawler, 'request_fingerprinter', None)
+    if fingerprinter is not None:
+        return lambda request: fingerprinter.fingerprint(request).hex()
+    from scrapy.utils.request import request_fingerprint
+    return request_fingerprint
+
+
+class FixtureStore:
+    """
+    Fixture archive of a single spider.
+    Responses are stored by request fingerprint, writes are committed every `commit_every` responses.
+    """
+
+    def __init__(self, path: str, commit_every=100):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.commit_every = commit_every
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS fixtures (fingerprint TEXT PRIMARY KEY, method TEXT, url TEXT, '
+                        'status INTEGER, headers TEXT, body BLOB, recorded REAL)')
+        self.db.commit()
+        self._pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM fixtures').fetchone()[0]
+
+    def save(self, fingerprint: str, request: Request, response: Response):
+        headers = {k.decode('latin1'): [v.decode('latin1') for v in values]
+                   for k, values in response.headers.items()}
+        self.db.execute(
+            'INSERT OR REPLACE INTO fixtures VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (fingerprint, request.method, response.url, response.status, json.dumps(headers),
+             zlib.compress(response.body), time()),
+        )
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def load(self, fingerprint: str, request: Request) -> Optional[Response]:
+        row = self.db.execute('SELECT url, status, headers, body FROM fixtures WHERE fingerprint = ?',
+                              (fingerprint,)).fetchone()
+        if row is None:
+            return None
+        url, status, headers, body = row
+        headers = Headers({k: v for k, v in json.loads(headers).items()})
+        body = zlib.decompress(body)
+        response_cls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return response_cls(url=url, status=status, headers=headers, body=body, request=request,
+                            flags=['fixture'])
+
+    def commit(self):
+        self.db.commit()
+        self._pending = 0
+
+    def close(self):
+        if self.db is None:
+            return
+        self.commit()
+        self.db.close()
+        self.db = None
+
+
+class FixtureRecorderMiddleware:
+    """Downloader middleware that records every downloaded response to spider's fixture archive"""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.fingerprint = get_fingerprinter(crawler)
+        self.store = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_opened(self, spider):
+        self.store = FixtureStore(fixture_path(self.crawler.settings, spider.name))
+
+    def spider_closed(self, spider):
+        self.store.close()
+
+    def process_response(self, request, response, spider):
+        if 'fixture' not in response.flags and 'cached' not in response.flags:
+            self.store.save(self.fingerprint(request), request, response)
+            self.crawler.stats.inc_value('fixtures/recorded')
+        return response
+
+
+class FixtureDownloadHandler:
+    """
+    Download handler that serves responses from spider's fixture archive, never touches the network.
+    Request without recorded fixture fails with MissingFixtureError and closes the spider
+    with `missing_fixture` reason.
+    """
+    lazy = False
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.fingerprint = get_fingerprinter(crawler)
+        self.stores = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def _get_store(self, spider) -> FixtureStore:
+        try:
+            return self.stores[spider.name]
+        except KeyError:
+            path = fixture_path(self.crawler.settings, spider.name)
+            if not os.path.exists(path):
+                raise MissingFixtureError(f'no fixtures recorded for spider {spider.name}: {path}')
+            store = self.stores[spider.name] = FixtureStore(path)
+            return store
+
+    def download_request(self, request, spider):
+        try:
+            response = self._get_store(spider).load(self.fingerprint(request), request)
+            if response is None:
+                raise MissingFixtureError(f'no fixture recorded for {request} of spider {spider.name}')
+        except MissingFixtureError as e:
+            self.crawler.stats.inc_value('fixtures/missing')
+            close_spider(self.crawler, 'missing_fixture')
+            return defer.fail(e)
+        self.crawler.stats.inc_value('fixtures/replayed')
+        return defer.succeed(response)
+
+    def close(self):
+        for store in self.stores.values():
+            store.close()
@@ -0,0 +1,131 @@
+import math
+from typing import Dict, Optional
+
+"""
+Bounded memory histogram of positive values, e.g. durations.
+Values are counted in logarithmic buckets that grow by `precision` fraction,
+so percentiles are accurate within that relative error no matter how many
+values are recorded, and histograms of different processes can be merged.
+"""
+
+
+class Histogram:
+    """
+    Log bucketed histogram:
+
+    >>> hist = Histogram()
+    >>> for ms in range(1, 101):
+    ...     hist.add(ms / 1000)
+    >>> round(hist.percentile(99), 3)
+    0.099
+
+    :param precision: relative error of percentiles
+    :param min_value: smaller values are counted in the lowest bucket
+    """
+
+    def __init__(self, precision=0.01, min_value=1e-9):
+        self.precision = precision
+        self.min_value = min_value
+        self._log_base = math.log1p(precision)
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def __len__(self):
+        return self.count
+
+    def _bucket(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return int(math.log(value / self.min_value) / self._log_base) + 1
+
+    def _bucket_value(self, bucket: int) -> float:
+        """middle value of bucket"""
+        if bucket == 0:
+            return self.min_value
+        return self.min_value * math.exp((bucket - 0.5) * self._log_base)
+
+    def add(self, value: float, count=1):
+        """record value count times"""
+        bucket = self._bucket(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: 'Histogram') -> 'Histogram':
+        """add values of other histogram with the same precision to this one in place"""
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+        return self
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """value below which `percentile` percent of values fall, None for empty histogram"""
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * percentile / 100) or 1
+        if rank >= self.count:
+            return self.max
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                # bucket values are approximate, exact extremes are known
+                return min(max(self._bucket_value(bucket), self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+    def to_state(self) -> Dict:
+        """complete JSON serializable state, e.g. for crawl stats, see from_state"""
+        return {
+            'precision': self.precision,
+            'min_value': self.min_value,
+            'buckets': {str(bucket): count for bucket, count in sorted(self.buckets.items())},
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'Histogram':
+        hist = cls(precision=state['precision'], min_value=state['min_value'])
+        hist.buckets = {int(bucket): count for bucket, count in state['buckets'].items()}
+        hist.count = state['count']
+        hist.total = state['total']
+        hist.min = state['min']
+        hist.max = state['max']
+        return hist
+
+    @classmethod
+    def from_values(cls, values, **kwargs) -> 'Histogram':
+        hist = cls(**kwargs)
+        for value in values:
+            hist.add(value)
+        return hist
@@ -0,0 +1,165 @@
+import json
+import os
+import sqlite3
+import sys
+from statistics import median
+from time import time
+from typing import Dict, List, Optional, Tuple
+
+from scrapytest.profile import profiled
+from scrapytest.spec import PerformanceSpec
+
+"""
+Run history of test crawls and crawl performance regression detection.
+Metrics of every crawled spider are recorded in SQLite database (HISTORY_PATH setting),
+PerformanceSpecs then compare metrics of new runs to the median of previous runs
+of the same spider in the same mode (live crawl, --replay or --cache), see PerformanceSpec.
+Metrics:
+    elapsed - crawl duration in seconds
+    items, items_per_second - scraped items and their throughput
+    requests, requests_per_second - downloader requests and their throughput
+    response_bytes - downloaded bytes
+    peak_memory - `memusage/max` stat when MemoryUsage extension is enabled,
+                  peak memory of the crawling process otherwise
+    item_failures, stat_failures, coverage_failures - failed tests of the run
+and numeric stats of HISTORY_STATS setting under their own names.
+"""
+
+
+def _elapsed(stats: dict) -> Optional[float]:
+    if stats.get('elapsed_time_seconds') is not None:
+        return float(stats['elapsed_time_seconds'])
+    start, finish = stats.get('start_time'), stats.get('finish_time')
+    if start is None or finish is None:
+        return None
+    return (finish - start).total_seconds()
+
+
+def peak_memory() -> Optional[int]:
+    """peak memory of this process in bytes, None where it's unknown"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def crawl_metrics(stats: dict, failed: Optional[dict] = None, extra_stats=(), memory=None) -> dict:
+    """
+    Metrics of crawled spider, see module docs
+    :param failed: failure counts of spider's report
+    :param extra_stats: names of numeric stats that are recorded as metrics as well
+    :param memory: peak memory to use when stats have none
+    """
+    elapsed = _elapsed(stats)
+    items = stats.get('item_scraped_count', 0)
+    requests = stats.get('downloader/request_count', 0)
+    metrics = {
+        'elapsed': elapsed,
+        'items': items,
+        'items_per_second': items / elapsed if elapsed else None,
+        'requests': requests,
+        'requests_per_second': requests / elapsed if elapsed else None,
+        'response_bytes': stats.get('downloader/response_bytes', 0),
+        'peak_memory': stats.get('memusage/max', memory),
+    }
+    for kind, count in (failed or {}).items():
+        metrics[f'{kind}_failures'] = count
+    for name in extra_stats:
+        value = stats.get(name)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+class RunHistory:
+    """
+    SQLite store of runs and metrics of their spiders:
+    `runs` table has a row for every run and `spider_runs` a row for every spider of it
+    """
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        # parallel test runs can share the same database
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS runs '
+                        '(id INTEGER PRIMARY KEY, started REAL, elapsed REAL, mode TEXT)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS spider_runs '
+                        '(run_id INTEGER, spider TEXT, mode TEXT, finish_reason TEXT, metrics TEXT)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS spider_runs_spider ON spider_runs (spider, mode, run_id)')
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_run(self, started: float, mode='live', elapsed=None) -> int:
+        with self.db:
+            cursor = self.db.execute('INSERT INTO runs (started, elapsed, mode) VALUES (?, ?, ?)',
+                                     (started, elapsed if elapsed is not None else time() - started, mode))
+        return cursor.lastrowid
+
+    def add_spider_run(self, run_id: int, spider: str, metrics: dict, mode='live', finish_reason='finished'):
+        with self.db:
+            self.db.execute('INSERT INTO spider_runs (run_id, spider, mode, finish_reason, metrics) '
+                            'VALUES (?, ?, ?, ?, ?)', (run_id, spider, mode, finish_reason, json.dumps(metrics)))
+
+    def spider_runs(self, spider: str, mode='live', limit=10, finished_only=True) -> List[dict]:
+        """metrics of spider's most recent runs first, only runs that finished normally by default"""
+        query = 'SELECT metrics FROM spider_runs WHERE spider = ? AND mode = ?'
+        args = [spider, mode]
+        if finished_only:
+            query += " AND finish_reason = 'finished'"
+        query += ' ORDER BY run_id DESC LIMIT ?'
+        args.append(limit)
+        return [json.loads(row[0]) for row in self.db.execute(query, args)]
+
+    def baselines(self, spider: str, metrics, mode='live', window=10) -> Dict[str, Tuple[Optional[float], int]]:
+        """(median, amount of runs) of every metric in spider's last `window` finished runs"""
+        runs = self.spider_runs(spider, mode=mode, limit=window)
+        baselines = {}
+        for metric in metrics:
+            values = [run[metric] for run in runs if run.get(metric) is not None]
+            baselines[metric] = (median(values) if values else None, len(values))
+        return baselines
+
+    def recent(self, spider=None, limit=20) -> List[dict]:
+        """most recent spider runs with their run's start time, of every spider by default"""
+        query = ('SELECT r.id, r.started, r.mode, s.spider, s.finish_reason, s.metrics '
+                 'FROM spider_runs s JOIN runs r ON r.id = s.run_id')
+        args = []
+        if spider:
+            query += ' WHERE s.spider = ?'
+            args.append(spider)
+        query += ' ORDER BY r.id DESC LIMIT ?'
+        args.append(limit)
+        return [
+            {'run_id': run_id, 'started': started, 'mode': mode, 'spider': name, 'finish_reason': reason,
+             **json.loads(metrics)}
+            for run_id, started, mode, name, reason, metrics in self.db.execute(query, args)
+        ]
+
+    def close(self):
+        if self.db is None:
+            return
+        self.db.close()
+        self.db = None
+
+
+@profiled('validate_performance')
+def validate_performance(history: RunHistory, spider_name: str, metrics: dict, specs: List[PerformanceSpec],
+                         mode='live', window=10) -> List[str]:
+    """messages of metrics that regressed against spider's baseline in history"""
+    messages = []
+    for spec in specs:
+        baselines = history.baselines(spider_name, spec.metrics, mode=mode, window=spec.window or window)
+        for msg in spec.validate_metrics(metrics, baselines):
+            messages.append(f'{type(spec).__name__}: {msg}')
+    return messages
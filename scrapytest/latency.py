@@ -0,0 +1,140 @@
+from time import perf_counter
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import Settings
+
+from scrapytest.histogram import Histogram
+
+"""
+Latency histograms of crawls, enabled with LATENCY_STATS_ENABLED setting.
+LatencyStatsExtension records download latency of every response and
+CallbackTimingMiddleware processing time of every spider callback in log bucketed
+histograms (see scrapytest.histogram), so memory stays bounded on crawls of any size.
+When spider closes every histogram is exported to stats under it's prefix:
+
+    latency/download                 histogram state for PercentileBelow and MeanBelow testers
+    latency/download/count, /mean, /max and /p50, /p95 etc. of LATENCY_STATS_PERCENTILES
+    latency/callback/<callback name> the same for every callback
+
+e.g. StatsSpec.validate = {'latency/download$': PercentileBelow(95, 0.5)}
+"""
+
+
+def configure_latency_stats(settings: Settings):
+    """enable latency extension and middleware for test crawls when LATENCY_STATS_ENABLED is set"""
+    if settings.getbool('LATENCY_STATS_ENABLED'):
+        extensions = {**settings.getdict('EXTENSIONS'), 'scrapytest.latency.LatencyStatsExtension': 500}
+        settings.set('EXTENSIONS', extensions, priority='cmdline')
+        middlewares = {**settings.getdict('SPIDER_MIDDLEWARES'), 'scrapytest.latency.CallbackTimingMiddleware': 990}
+        settings.set('SPIDER_MIDDLEWARES', middlewares, priority='cmdline')
+
+
+def export_histogram(stats, prefix: str, hist: Histogram, percentiles=(50, 90, 95, 99)):
+    """set histogram state and it's summary stats under prefix"""
+    stats.set_value(prefix, hist.to_state())
+    stats.set_value(f'{prefix}/count', hist.count)
+    if not hist.count:
+        return
+    stats.set_value(f'{prefix}/mean', hist.mean)
+    stats.set_value(f'{prefix}/max', hist.max)
+    for percentile in percentiles:
+        stats.set_value(f'{prefix}/p{percentile:g}', hist.percentile(percentile))
+
+
+class _LatencyStats:
+    def __init__(self, stats, precision=0.02, percentiles=(50, 90, 95, 99)):
+        self.stats = stats
+        self.precision = precision
+        self.percentiles = percentiles
+        self.histograms = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('LATENCY_STATS_ENABLED'):
+            raise NotConfigured('LATENCY_STATS_ENABLED is not set')
+        percentiles = settings.getlist('LATENCY_STATS_PERCENTILES', [50, 90, 95, 99])
+        component = cls(crawler.stats, precision=settings.getfloat('LATENCY_STATS_PRECISION', 0.02),
+                        percentiles=[float(p) for p in percentiles])
+        crawler.signals.connect(component.spider_closed, signal=signals.spider_closed)
+        return component
+
+    def record(self, name: str, seconds: float):
+        try:
+            hist = self.histograms[name]
+        except KeyError:
+            hist = self.histograms[name] = Histogram(precision=self.precision)
+        hist.add(seconds)
+
+    def spider_closed(self, spider=None):
+        for name, hist in self.histograms.items():
+            export_histogram(self.stats, name, hist, self.percentiles)
+
+
+class LatencyStatsExtension(_LatencyStats):
+    """Extension that records download latency of every response in `latency/download` histogram"""
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        extension = super().from_crawler(crawler)
+        crawler.signals.connect(extension.response_received, signal=signals.response_received)
+        return extension
+
+    def response_received(self, response, request, spider=None):
+        latency = request.meta.get('download_latency')
+        if latency is not None:
+            self.record('latency/download', latency)
+
+
+class CallbackTimingMiddleware(_LatencyStats):
+    """
+    Spider middleware that records processing time of every callback in `latency/callback/<name>` histogram.
+    It has to be the closest middleware to the spider, so only time spent in the callback is counted:
+    from calling the callback to it's last output, without time spent by consumers of it's output.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._started = {}
+
+    def process_spider_input(self, response, spider=None):
+        self._started[id(response)] = perf_counter()
+
+    def process_spider_exception(self, response, exception, spider=None):
+        self._started.pop(id(response), None)
+
+    def _callback_name(self, response) -> str:
+        request = getattr(response, 'request', None)
+        callback = getattr(request, 'callback', None)
+        return f"latency/callback/{getattr(callback, '__name__', 'parse')}"
+
+    def process_spider_output(self, response, result, spider=None):
+        started = self._started.pop(id(response), None)
+        elapsed = perf_counter() - started if started is not None else 0.0
+        result = iter(result)
+        while True:
+            start = perf_counter()
+            try:
+                output = next(result)
+            except StopIteration:
+                break
+            finally:
+                elapsed += perf_counter() - start
+            yield output
+        self.record(self._callback_name(response), elapsed)
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        started = self._started.pop(id(response), None)
+        elapsed = perf_counter() - started if started is not None else 0.0
+        result = result.__aiter__()
+        while True:
+            start = perf_counter()
+            try:
+                output = await result.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                elapsed += perf_counter() - start
+            yield output
+        self.record(self._callback_name(response), elapsed)
@@ -0,0 +1,165 @@
+import logging
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import Settings
+from twisted.internet import task, threads
+
+from scrapytest.exceptions import ConfigError
+from scrapytest.spec import StatsSpec
+from scrapytest.utils import close_spider, get_test_config
+
+"""
+Live stats validation during crawls.
+LiveStatsExtension snapshots crawler stats every LIVE_STATS_INTERVAL seconds and
+checks stats that changed since the previous snapshot with `live` patterns of
+spider's StatsSpecs, e.g. `log_count/ERROR` climbing or 5xx responses spiking are
+caught while the spider is still running. Every stat is reported once, when it
+starts failing.
+"""
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def configure_live_stats(settings: Settings):
+    """enable LiveStatsExtension for test crawls when LIVE_STATS_INTERVAL is set"""
+    if settings.getfloat('LIVE_STATS_INTERVAL'):
+        extension = 'scrapytest.live.LiveStatsExtension'
+        extensions = {**settings.getdict('EXTENSIONS'), extension: 500}
+        settings.set('EXTENSIONS', extensions, priority='cmdline')
+
+
+def get_stats_specs(settings: Settings, spider_cls, spec_cls=StatsSpec) -> list:
+    """
+    StatsSpecs of test settings that apply to spider_cls, specs of other classes
+    with `spider_cls` attribute (e.g. PerformanceSpec) with spec_cls.
+    Spiders are matched exactly like Validator does, specs of subclasses don't apply to their bases.
+    """
+    specs = []
+    for value in settings.values():
+        if isinstance(value, type) and issubclass(value, spec_cls) and value is not spec_cls:
+            if spider_cls in _spider_classes(value):
+                specs.append(value())
+    return specs
+
+
+def _spider_classes(spec_cls) -> list:
+    spider_cls = spec_cls.spider_cls
+    if spider_cls is NotImplemented:
+        return []
+    if not isinstance(spider_cls, (list, tuple)):
+        return [spider_cls]
+    return list(spider_cls)
+
+
+class LiveStatsExtension:
+    """
+    Extension that validates crawler stats periodically while spider runs, see module docs.
+    Failures are logged as warnings and counted in `scrapytest/live/failures` stat, with
+    LIVE_STATS_ACTION = 'notify' they are sent to LIVE_STATS_NOTIFIERS as well and with
+    'close' the spider is closed with `live_stats_failure` reason.
+    """
+    ACTIONS = ('warn', 'notify', 'close')
+    CLOSE_REASON = 'live_stats_failure'
+
+    def __init__(self, crawler, settings: Settings, interval: float, action='warn', notifiers=(), config=None):
+        if action not in self.ACTIONS:
+            raise NotConfigured(f'LIVE_STATS_ACTION has to be one of {self.ACTIONS}, got {action!r}')
+        self.crawler = crawler
+        self.settings = settings
+        self.interval = interval
+        self.action = action
+        self.notifiers = notifiers
+        self.config = config or {}
+        self.specs = []
+        self.failing = set()
+        self.closing = False
+        self._last = {}
+        self._task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        interval = settings.getfloat('LIVE_STATS_INTERVAL')
+        if not interval:
+            raise NotConfigured('LIVE_STATS_INTERVAL is not set')
+        if not any(isinstance(v, type) and issubclass(v, StatsSpec) for v in settings.values()):
+            # production crawl, specs come from the test module
+            from scrapytest.pipeline import get_pipeline_settings
+            try:
+                settings = get_pipeline_settings(settings)
+            except ConfigError as e:
+                raise NotConfigured(str(e))
+        notifiers = settings.getlist('LIVE_STATS_NOTIFIERS')
+        config = {}
+        if notifiers:
+            from scrapytest.cli import NOTIFIERS
+            unknown = [name for name in notifiers if name not in NOTIFIERS]
+            if unknown:
+                raise NotConfigured(f'unknown LIVE_STATS_NOTIFIERS {unknown}, choice from: {list(NOTIFIERS)}')
+            try:
+                config = dict(get_test_config())
+            except ConfigError as e:
+                raise NotConfigured(f'notifiers need [test] config: {e}')
+        extension = cls(crawler, settings, interval, action=settings.get('LIVE_STATS_ACTION'),
+                        notifiers=notifiers, config=config)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.specs = get_stats_specs(self.settings, type(spider))
+        if not self.specs:
+            return
+        self._task = task.LoopingCall(self.check, spider)
+        self._task.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self._task is not None and self._task.running:
+            self._task.stop()
+
+    def changed_keys(self, stats: dict) -> list:
+        """keys of stats that changed since the previous call"""
+        last = self._last
+        changed = [key for key, value in stats.items() if last.get(key, _MISSING) != value]
+        for key in changed:
+            last[key] = stats[key]
+        return changed
+
+    def check(self, spider):
+        stats = self.crawler.stats.get_stats()
+        changed = set(self.changed_keys(stats))
+        if not changed:
+            return
+        failed = {}
+        for spec in self.specs:
+            for stat, messages in spec.validate_live(stats, changed).items():
+                failed.setdefault(stat, []).extend(messages)
+        # stats that pass again can be reported again
+        self.failing = {key for key in self.failing if key not in changed or key in failed}
+        new = {stat: messages for stat, messages in failed.items() if stat not in self.failing}
+        if not new:
+            return
+        self.failing.update(new)
+        messages = [msg for stat_messages in new.values() for msg in stat_messages]
+        for msg in messages:
+            logger.warning(f'live stats: {msg}', extra={'spider': spider})
+        self.crawler.stats.inc_value('scrapytest/live/failures', len(messages))
+        if self.action == 'notify':
+            self.notify(spider, messages)
+        elif self.action == 'close' and not self.closing:
+            self.closing = True
+            close_spider(self.crawler, self.CLOSE_REASON)
+
+    def notify(self, spider, messages):
+        # cli imports this module so import here to avoid circular imports
+        from scrapytest.cli import NOTIFIERS
+        from scrapytest.notifiers import Dispatcher
+        dispatcher = Dispatcher.from_config(self.config)
+        msg = '\n'.join(messages)
+        for name in self.notifiers:
+            kwargs = dict(code=1, msg=msg, config=self.config, context=f'{spider.name} (live)')
+            d = threads.deferToThread(dispatcher.send, NOTIFIERS[name], kwargs)
+            d.addErrback(lambda failure, name=name: logger.error(f'live stats notifier {name} failed: {failure}'))
@@ -1,13 +1,205 @@
+import http.client
 import json
-from urllib.request import Request, urlopen
+import threading
+from collections import defaultdict
+from time import monotonic, sleep
+from typing import Callable, List, Tuple
+from urllib.parse import urlsplit
 
+from scrapytest.exceptions import NotificationError
 
-def post_json(url, json_data):
+"""
+Notifiers and their delivery.
+Notifiers post over a pool of keep-alive HTTP connections (see ConnectionPool) and
+Dispatcher sends every notification of a run concurrently: each attempt has a bounded
+timeout, transient failures (connection errors, timeouts, 429 and 5xx responses) are
+retried with exponential backoff and nothing is sent after the overall deadline, so
+a slow or hung webhook can't stall the run.
+"""
+
+
+class HttpResponse:
+    def __init__(self, code: int, body: bytes):
+        self.code = code
+        self.body = body
+
+    def read(self) -> bytes:
+        return self.body
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of keep-alive HTTP(S) connections per (scheme, host, port),
+    at most `max_idle` idle connections are kept for every host
+    """
+
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _acquire(self, key, timeout):
+        with self._lock:
+            if self._idle[key]:
+                return self._idle[key].pop(), True
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(host, port, timeout=timeout), False
+
+    def _release(self, key, conn):
+        with self._lock:
+            if len(self._idle[key]) < self.max_idle:
+                self._idle[key].append(conn)
+                return
+        conn.close()
+
+    def request(self, method, url, body=None, headers=None, timeout=10.0) -> HttpResponse:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise NotificationError(f'unsupported url: {url}')
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        conn, reused = self._acquire(key, timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            resp = conn.getresponse()
+            data = resp.read()
+        except (http.client.HTTPException, OSError) as e:
+            conn.close()
+            if reused and self.is_stale(e):
+                # server closed idle keep-alive connection before reading the request, try once with a fresh one
+                with self._lock:
+                    stale = self._idle.pop(key, [])
+                for idle in stale:
+                    idle.close()
+                return self.request(method, url, body, headers, timeout)
+            # timeouts and other errors may happen after the request was delivered, see call_with_retries
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+        return HttpResponse(resp.status, data)
+
+    @staticmethod
+    def is_stale(error: Exception) -> bool:
+        """whether error means that reused connection was already closed by the server"""
+        return isinstance(error, (http.client.RemoteDisconnected, BrokenPipeError))
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, defaultdict(list)
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+_pool = ConnectionPool()
+
+
+def post_json(url, json_data, timeout=10.0, pool=None) -> HttpResponse:
     json_data = json_data.encode('utf-8')
-    req = Request(url)
-    req.add_header('Content-Type', 'application/json; charset=utf-8')
-    req.add_header('Content-Length', len(json_data))
-    return urlopen(req, json_data)
+    headers = {'Content-Type': 'application/json; charset=utf-8', 'Content-Length': str(len(json_data))}
+    return (pool or _pool).request('POST', url, body=json_data, headers=headers, timeout=timeout)
+
+
+def is_retryable(error: Exception) -> bool:
+    """whether error is transient: connection errors, timeouts and retryable notification errors"""
+    if isinstance(error, NotificationError):
+        return error.retryable
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+
+def call_with_retries(func: Callable, *args, retries=2, backoff=0.5, deadline=None, **kwargs):
+    """
+    Call func until it succeeds, retryable errors are retried up to `retries` times
+    with exponential backoff as long as the next attempt starts before deadline (time.monotonic)
+    """
+    attempt = 0
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            delay = backoff * 2 ** attempt
+            if not is_retryable(e) or attempt >= retries:
+                raise
+            if deadline is not None and monotonic() + delay >= deadline:
+                raise
+            sleep(delay)
+            attempt += 1
+
+
+class Dispatcher:
+    """
+    Sends notifications concurrently with retries, see module docs.
+    Notifier functions are called with `timeout` keyword argument of every attempt.
+    :param timeout: seconds of a single attempt
+    :param retries: attempts after the first one for transient failures
+    :param backoff: seconds before the first retry, doubled for every next one
+    :param deadline: seconds after which notifications that are still pending are abandoned
+    """
+
+    def __init__(self, timeout=10.0, retries=2, backoff=0.5, deadline=30.0):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.deadline = deadline
+
+    @classmethod
+    def from_config(cls, config) -> 'Dispatcher':
+        """dispatcher with notify_timeout, notify_retries, notify_backoff and notify_deadline of [test] config"""
+        return cls(
+            timeout=float(config.get('notify_timeout', 10.0)),
+            retries=int(config.get('notify_retries', 2)),
+            backoff=float(config.get('notify_backoff', 0.5)),
+            deadline=float(config.get('notify_deadline', 30.0)),
+        )
+
+    def send(self, func: Callable, kwargs: dict, deadline=None):
+        """send single notification in this thread, deadline defaults to `deadline` seconds from now"""
+        if deadline is None:
+            deadline = monotonic() + self.deadline
+
+        def attempt():
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                raise NotificationError('notification deadline exceeded')
+            return func(**kwargs, timeout=min(self.timeout, remaining))
+
+        return call_with_retries(attempt, retries=self.retries, backoff=self.backoff, deadline=deadline)
+
+    def dispatch(self, notifications: List[Tuple[str, Callable, dict]]) -> List[Tuple[str, Exception]]:
+        """
+        Send (name, notifier function, kwargs) notifications concurrently and wait for them until the deadline
+        :returns: (name, error) of every notification that failed or didn't finish in time
+        """
+        deadline = monotonic() + self.deadline
+        errors = {}
+
+        def send(i, func, kwargs):
+            try:
+                self.send(func, kwargs, deadline)
+            except Exception as e:
+                errors[i] = e
+            else:
+                errors[i] = None
+
+        # daemon threads so notifications that are still hanging never block the exit
+        threads = [threading.Thread(target=send, args=(i, func, kwargs), daemon=True)
+                   for i, (_, func, kwargs) in enumerate(notifications)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(max(deadline - monotonic(), 0))
+        failures = []
+        for i, (name, _, _) in enumerate(notifications):
+            error = errors.get(i, NotificationError(f'not sent in {self.deadline} seconds'))
+            if error is not None:
+                failures.append((name, error))
+        return failures
 
 
 class SlackNotifier:
@@ -15,19 +207,21 @@ class SlackNotifier:
     Notifier for slack messaging service that uses "incoming webhooks" app:
     https://slack.com/apps/A0F7XDUAZ-incoming-webhooks
     """
-    def __init__(self, url, channel, username='', icon_emoji='', maintainer=''):
+    def __init__(self, url, channel, username='', icon_emoji='', maintainer='', pool=None):
         """
         :param url: incoming webhooks url
         :param channel: #channel or @user where message will be sent to
         :param username: bot's displayed name
         :param icon_emoji: bot's displayed avatar e.g. :cat:
         :param maintainer: maintainer's username who will be mentioned on exit code 1 e.g. @here or @bernard
+        :param pool: ConnectionPool to post with, shared module pool by default
         """
         self.url = url
         self.channel = channel
         self.username = username
         self.icon_emoji = icon_emoji
         self.maintainer = maintainer
+        self.pool = pool
 
     @classmethod
     def from_config(cls, config):
@@ -39,7 +233,7 @@ class SlackNotifier:
             maintainer=config.get('slack_maintainer', ''),
         )
 
-    def notify(self, code, msg, context=None):
+    def notify(self, code, msg, context=None, timeout=10.0):
         """Send notification based on code, context will be included in message header"""
         msg = f"Finished tests for \"{context or ''}\" {self.maintainer if code == 1 else ''}\n```{msg}```"
         data = {
@@ -49,8 +243,8 @@ class SlackNotifier:
             'text': msg,
             'link_names': '1',
         }
-        # click.echo(f'sending msg to slack: {data["channel"]}')
-        resp = post_json(self.url, json.dumps(data))
-        assert resp.code == 200
-        assert resp.read() == b'ok'
+        resp = post_json(self.url, json.dumps(data), timeout=timeout, pool=self.pool)
+        if resp.code != 200 or resp.body != b'ok':
+            raise NotificationError(f'slack responded with {resp.code}: {resp.body[:200]!r}',
+                                    retryable=resp.code == 429 or resp.code >= 500)
         return resp
@@ -0,0 +1,132 @@
+from collections import deque
+from itertools import islice
+from multiprocessing import get_context
+from multiprocessing.util import Finalize
+from typing import Callable, List
+
+from scrapy import Item
+from scrapy.settings import Settings
+
+from scrapytest.validate import Validator, ItemStream
+
+"""
+Validating items in a pool of worker processes.
+Items are pickled and sent to workers in batches. Every worker builds it's
+Validator from the test module only once and sends back messages and field
+coverage of every batch. Batch results are consumed in submission order so
+messages come out in exactly the same order as when validating serially.
+"""
+
+_validator = None  # type: Validator
+
+
+def _init_worker(settings_factory: Callable[[], Settings]):
+    global _validator
+    _validator = Validator.from_settings(settings_factory())
+    # commit validation cache when worker exits
+    Finalize(_validator, _validator.close, exitpriority=10)
+
+
+def _validate_batch(items: List[Item]):
+    messages = []
+    coverage = _validator.coverage_counter()
+    for item_messages in _validator.validate_batch(items):
+        messages.extend(item_messages)
+    for item in items:
+        coverage.add(item)
+    return messages, coverage
+
+
+def batches(items, size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ParallelValidator:
+    """
+    Validates items in a pool of processes.
+    :param settings_factory: picklable callable that returns test settings, called once in every worker
+    :param workers: amount of worker processes
+    :param batch_size: amount of items sent to worker at once
+    :param max_pending: maximum amount of batches waiting for validation, defaults to 2 per worker
+    """
+
+    def __init__(self, settings_factory: Callable[[], Settings], workers: int, batch_size=500, max_pending=None):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_pending = max_pending or workers * 2
+        context = get_context('spawn')
+        self.pool = context.Pool(workers, initializer=_init_worker, initargs=(settings_factory,))
+        self.validator = Validator.from_settings(settings_factory())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.validator.close()
+
+    def submit(self, batch: List[Item]):
+        """submit batch for validation, returns AsyncResult of (messages, coverage counter)"""
+        return self.pool.apply_async(_validate_batch, (batch,))
+
+    def validate_items(self, items):
+        """same as Validator.validate_items but validated in worker processes"""
+        sampler = self.validator.sampler()
+        if sampler is not None:
+            items = sampler.sample(items)
+        for messages, _ in self.pool.imap(_validate_batch, batches(items, self.batch_size)):
+            yield from messages
+
+    def stream(self, keep_items=False, spider=None, batch_size=None) -> 'ParallelItemStream':
+        return ParallelItemStream(self, keep_items=keep_items, spider=spider, batch_size=batch_size)
+
+
+class ParallelItemStream(ItemStream):
+    """
+    ItemStream that validates items in batches using ParallelValidator.
+    Results are available only after `close()`.
+    :param batch_size: amount of items sent to worker at once, defaults to ParallelValidator's batch size
+    """
+
+    def __init__(self, parallel: ParallelValidator, keep_items=False, spider=None, batch_size=None):
+        super().__init__(parallel.validator, keep_items=keep_items, spider=spider,
+                         batch_size=batch_size or parallel.batch_size)
+        self.parallel = parallel
+        self.batch = []
+        self.pending = deque()
+
+    def _validate(self, item: Item):
+        self.batch.append(item)
+        if len(self.batch) >= self.batch_size:
+            self._submit()
+
+    def _submit(self):
+        if self.batch:
+            self.pending.append((self.parallel.submit(self.batch), len(self.batch)))
+            self.batch = []
+        # collect finished batches in order, wait for the oldest one if too many are in flight
+        while self.pending and (self.pending[0][0].ready() or len(self.pending) > self.parallel.max_pending):
+            self._collect(self.pending.popleft())
+
+    def _collect(self, pending):
+        result, size = pending
+        messages, coverage = result.get()
+        for msg in messages:
+            self.failures.add(msg, self.spider)
+        self.failed += len(messages)
+        self.coverage.merge(coverage)
+        self.validated += size
+
+    def _flush(self):
+        self._submit()
+        while self.pending:
+            self._collect(self.pending.popleft())
@@ -0,0 +1,123 @@
+import logging
+from time import perf_counter
+
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import Settings
+
+from scrapytest import default_settings
+from scrapytest.exceptions import ConfigError
+from scrapytest.utils import get_test_config, get_test_settings
+from scrapytest.validate import Validator, ItemStream
+
+"""
+Validating items of production crawls with specs of scrapy-test module.
+Enable the pipeline in project settings:
+
+    ITEM_PIPELINES = {'scrapytest.pipeline.ValidationPipeline': 900}
+
+Items are validated inline and failures are counted in crawler stats as they are found:
+`scrapytest/failures`, `scrapytest/failures/<item class>/<field>` and `scrapytest/items/failed`.
+Field coverage is written to stats when spider closes: `scrapytest/coverage/<item class>` item count,
+`scrapytest/coverage/<item class>/<field>` field counts and `scrapytest/coverage_failures`.
+Items are never dropped or modified.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def get_pipeline_settings(crawler_settings: Settings) -> Settings:
+    """
+    Test settings for production crawls: test module is found in [test] section of scrapy.cfg or
+    in SCRAPYTEST_ROOT setting and scrapy-test settings of the crawler override it's settings
+    """
+    root = crawler_settings.get('SCRAPYTEST_ROOT')
+    config = {'root': root} if root else get_test_config()
+    settings = get_test_settings(config)
+    overrides = {key: crawler_settings[key] for key in dir(default_settings)
+                 if key.isupper() and key in crawler_settings}
+    settings.update(overrides, priority='cmdline')
+    return settings
+
+
+class StatsItemStream(ItemStream):
+    """ItemStream that counts item failures in crawler stats as they are found"""
+
+    def __init__(self, validator: Validator, stats, prefix='scrapytest', **kwargs):
+        super().__init__(validator, **kwargs)
+        self.stats = stats
+        self.prefix = prefix
+
+    def _add_messages(self, messages):
+        super()._add_messages(messages)
+        if not messages:
+            return
+        stats, prefix = self.stats, self.prefix
+        stats.inc_value(f'{prefix}/items/failed')
+        stats.inc_value(f'{prefix}/failures', len(messages))
+        for msg in messages:
+            item_cls = getattr(msg, 'item_cls', None)
+            if item_cls is not None:
+                stats.inc_value(f'{prefix}/failures/{item_cls.__name__}/{msg.field}')
+
+
+class ValidationPipeline:
+    """
+    Item pipeline that validates items with ItemSpecs of scrapy-test module, see module docs.
+    Specs are loaded once per crawler and validated with the same Validator as test crawls,
+    sampling settings (see scrapytest.sampling) apply as well.
+    With VALIDATION_TIME_BUDGET validation takes at most this many seconds per scraped item
+    on average: items are skipped (`scrapytest/items/skipped` stat) while validation is over budget.
+    """
+
+    def __init__(self, validator: Validator, stats, time_budget=0.0):
+        self.validator = validator
+        self.stats = stats
+        self.time_budget = time_budget
+        # unused time budget of fast items can be spent on up to 1000 slow ones
+        self.max_credit = time_budget * 1000
+        self.credit = 0.0
+        self.stream = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        try:
+            settings = get_pipeline_settings(crawler.settings)
+        except ConfigError as e:
+            raise NotConfigured(str(e))
+        validator = Validator.from_settings(settings)
+        return cls(validator, crawler.stats, time_budget=settings.getfloat('VALIDATION_TIME_BUDGET'))
+
+    # spider arguments are optional as newer scrapy versions no longer pass them
+    def open_spider(self, spider=None):
+        self.stream = StatsItemStream(self.validator, self.stats, spider=getattr(spider, 'name', None))
+
+    def process_item(self, item, spider=None):
+        if not self.time_budget:
+            self.stream.feed(item)
+        else:
+            self.credit = min(self.credit + self.time_budget, self.max_credit)
+            if self.credit <= 0:
+                self.stats.inc_value('scrapytest/items/skipped')
+                return item
+            start = perf_counter()
+            self.stream.feed(item)
+            self.credit -= perf_counter() - start
+        self.stats.set_value('scrapytest/items/validated', self.stream.validated)
+        return item
+
+    def close_spider(self, spider=None):
+        stream = self.stream
+        stream.close()
+        self.stats.set_value('scrapytest/items/validated', stream.validated)
+        coverage = stream.coverage
+        for item_cls in coverage:
+            self.stats.set_value(f'scrapytest/coverage/{item_cls.__name__}', coverage.total(item_cls))
+            for field, count in coverage.most_common(item_cls):
+                self.stats.set_value(f'scrapytest/coverage/{item_cls.__name__}/{field}', count)
+        coverage_messages = stream.validate_coverage()
+        self.stats.set_value('scrapytest/coverage_failures', len(coverage_messages))
+        for msg, count in stream.report():
+            logger.warning(f'{msg} [x{count}]' if count > 1 else msg)
+        for msg in coverage_messages:
+            logger.warning(msg)
+        self.validator.close()
@@ -0,0 +1,80 @@
+import os
+from multiprocessing import get_context
+from typing import Iterable, Iterator, List
+
+from scrapytest.feed import FeedWriter, append_feed, get_compression
+
+"""
+Running test spiders in separate worker processes.
+Twisted reactor cannot be restarted so every spider is crawled and validated
+in a fresh process on it's own reactor. Spider reports are sent back to the
+parent process as soon as the spider finishes.
+"""
+
+
+def crawl_spider(task) -> List[dict]:  # pragma: no cover
+    """crawl and validate single spider by name, this is executed in worker process"""
+    # cli imports this module so import here to avoid circular imports
+    from scrapytest.cli import build_settings, crawl_spiders
+    from scrapytest.utils import get_spiders_from_settings
+
+    from scrapytest.profile import get_profiler
+
+    spider_name, config, added_settings, cache, save = task
+    settings = build_settings(config, added_settings, cache)
+    spiders = [s for s in get_spiders_from_settings(settings) if s.name == spider_name]
+    if not save:
+        reports = crawl_spiders(spiders[:1], settings)
+    else:
+        # items are streamed to spider's own feed part which parent appends to the feed
+        part = feed_part_path(save, spider_name)
+        with FeedWriter(part, compression=get_compression(save)) as feed:
+            reports = crawl_spiders(spiders[:1], settings, feed=feed)
+        for report in reports:
+            report['feed'] = part
+    for report in reports:
+        report['profile'] = get_profiler()
+    return reports
+
+
+def run_spiders_in_pool(spider_names, workers, config, added_settings=None, cache=False,
+                        save=None) -> Iterator[dict]:  # pragma: no cover
+    """
+    Crawl spiders in a pool of worker processes
+    :param save: path of feed to append scraped items and stats trailer to, see scrapytest.feed
+    :returns: generator of spider reports (see cli.crawl_spiders) in order of completion
+    """
+    tasks = [(name, dict(config), added_settings or {}, cache, save) for name in spider_names]
+    # spawn fresh interpreters so workers don't inherit parent's reactor
+    context = get_context('spawn')
+    with context.Pool(min(workers, len(tasks)), maxtasksperchild=1) as pool:
+        yield from merge_reports(pool.imap_unordered(crawl_spider, tasks), spider_names, save)
+
+
+def feed_part_path(save: str, spider_name: str) -> str:
+    return f'{save}.{spider_name}.part'
+
+
+def merge_reports(results: Iterable[List[dict]], spider_names, save=None) -> Iterator[dict]:
+    """
+    Merge reports of workers as they complete: feed parts are appended to the `save` feed
+    and once every worker is done stats of all spiders are written as the trailer record.
+    Parts left by failed workers are removed.
+    """
+    stats = {}
+    try:
+        for reports in results:
+            for report in reports:
+                if report.get('feed'):
+                    append_feed(save, report.pop('feed'))
+                stats[report['spider']] = report.get('stats')
+                yield report
+    finally:
+        if save:
+            for name in spider_names:
+                part = feed_part_path(save, name)
+                if os.path.exists(part):
+                    os.remove(part)
+    if save:
+        with FeedWriter(save, append=True) as feed:
+            feed.write_stats({name: stats[name] for name in spider_names if name in stats})
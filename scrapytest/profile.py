@@ -0,0 +1,170 @@
+import json
+from functools import wraps
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+from scrapytest.histogram import Histogram
+
+"""
+Profiling of validation, see VALIDATION_PROFILE setting and --profile option.
+Every (item class, field, tester) of compiled item plans and every StatsSpec pattern
+is wrapped with ProfiledTester that records call count, wall time histogram and
+failures of every call. Report and coverage functions decorated with `profiled`
+are timed as well. Nothing is wrapped unless profiler is enabled, decorated
+functions only check whether it is.
+"""
+
+_profiler = None  # type: Optional[Profiler]
+
+
+def get_profiler() -> Optional['Profiler']:
+    """active profiler, None when profiling is off"""
+    return _profiler
+
+
+def enable_profiler() -> 'Profiler':
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+    return _profiler
+
+
+def disable_profiler():
+    global _profiler
+    _profiler = None
+
+
+def profiled(name: str):
+    """decorator that times function calls under ('function', name) key when profiler is enabled"""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _profiler
+            if profiler is None:
+                return func(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(('function', name, '', ''), perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+class ProfileEntry:
+    """calls, failures and wall time histogram of a single profiled key"""
+    __slots__ = ('calls', 'failures', 'times')
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.times = Histogram()
+
+    def to_dict(self) -> dict:
+        times = self.times.to_dict()
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'failure_rate': self.failures / self.calls if self.calls else 0.0,
+            'total': times['total'],
+            'mean': times['mean'],
+            'p50': times['p50'],
+            'p99': times['p99'],
+            'max': times['max'],
+        }
+
+
+class Profiler:
+    """
+    Profile entries by (kind, owner, field, tester) key, e.g.:
+    ('tester', 'PostItem', 'title', 'Match'), ('stats', 'TestStats', 'log_count/ERROR$', 'LessThan')
+    or ('function', 'count_fields', '', '')
+    """
+
+    def __init__(self):
+        self.entries = {}  # type: Dict[Tuple[str, str, str, str], ProfileEntry]
+
+    def _get_entry(self, key) -> ProfileEntry:
+        try:
+            return self.entries[key]
+        except KeyError:
+            entry = self.entries[key] = ProfileEntry()
+            return entry
+
+    def record(self, key, elapsed: float, calls=1, failures=0):
+        """record `calls` calls that took `elapsed` seconds each"""
+        entry = self._get_entry(key)
+        entry.calls += calls
+        entry.failures += failures
+        entry.times.add(elapsed, calls)
+
+    def merge(self, other: 'Profiler') -> 'Profiler':
+        for key, other_entry in other.entries.items():
+            entry = self._get_entry(key)
+            entry.calls += other_entry.calls
+            entry.failures += other_entry.failures
+            entry.times.merge(other_entry.times)
+        return self
+
+    def top(self, n=10) -> List[Tuple[tuple, ProfileEntry]]:
+        """n entries that took the most time"""
+        return sorted(self.entries.items(), key=lambda pair: pair[1].times.total, reverse=True)[:n]
+
+    def format(self, n=10) -> List[str]:
+        """table of n entries that took the most time"""
+        lines = [f"{f' profile: top {n} of {len(self.entries)} ':=^80}",
+                 f'{"calls":>9} {"total ms":>10} {"p99 us":>9} {"fail %":>7}  name']
+        for (kind, owner, field, tester), entry in self.top(n):
+            data = entry.to_dict()
+            name = '.'.join(part for part in (owner, field) if part)
+            if tester:
+                name += f' {tester}'
+            lines.append(f'{data["calls"]:>9} {data["total"] * 1000:>10.2f} {data["p99"] * 1e6:>9.1f} '
+                         f'{data["failure_rate"] * 100:>7.2f}  {kind}: {name}')
+        return lines
+
+    def to_dict(self) -> List[dict]:
+        return [
+            {'kind': kind, 'owner': owner, 'field': field, 'tester': tester, **entry.to_dict()}
+            for (kind, owner, field, tester), entry in self.top(len(self.entries))
+        ]
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+class ProfiledTester:
+    """Tester wrapper that records every call of tester under key in profiler"""
+
+    def __init__(self, tester, key, profiler: Profiler):
+        self.tester = tester
+        self.key = key
+        self.profiler = profiler
+
+    def __str__(self):
+        return self.key[3]
+
+    def __call__(self, value):
+        start = perf_counter()
+        try:
+            messages = self.tester(value)
+        except Exception:
+            self.profiler.record(self.key, perf_counter() - start, failures=1)
+            raise
+        failed = any(messages) if isinstance(messages, list) else bool(messages)
+        self.profiler.record(self.key, perf_counter() - start, failures=int(failed))
+        return messages
+
+    def batch(self, values):
+        # every value is timed on it's own, so percentiles are of single calls rather than per-batch averages
+        results = []
+        for i, value in enumerate(values):
+            messages = self(value)
+            for msg in messages if isinstance(messages, list) else [messages]:
+                if msg:
+                    results.append((i, msg))
+        return results
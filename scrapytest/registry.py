@@ -0,0 +1,186 @@
+import json
+import os
+import sys
+from configparser import ConfigParser
+from importlib import import_module
+from typing import Dict, List, Optional
+
+from scrapytest.utils import get_test_config
+
+"""
+Registry of test module contents and on-disk discovery index.
+Test module is imported and scanned once per process (see get_registry), every
+settings object, spider lookup and validator of the run is built from the same scan.
+DiscoveryIndex saves spider names of the scan with modification times of the source
+files they come from, so `--list` and spider name lookups are answered without
+importing scrapy or the test module until any of those files changes.
+"""
+
+_registries = {}  # type: Dict[str, Registry]
+
+
+class Registry:
+    """
+    Test classes and settings of test module:
+    `spiders`, `items` and `specs` classes and `values` of every test setting
+    """
+
+    def __init__(self, root: str, values: dict):
+        from scrapy import Item, Spider
+        from scrapytest.spec import ItemSpec, StatsSpec, PerformanceSpec
+
+        self.root = root
+        self.values = values
+        classes = [value for value in values.values() if isinstance(value, type)]
+        self.spiders = [cls for cls in classes if issubclass(cls, Spider)]
+        self.items = [cls for cls in classes if issubclass(cls, Item) and cls is not Item]
+        base_specs = (ItemSpec, StatsSpec, PerformanceSpec)
+        self.specs = [cls for cls in classes if issubclass(cls, base_specs) and cls not in base_specs]
+
+    @classmethod
+    def from_module(cls, root: str) -> 'Registry':
+        """import and scan test module, capitalized settings and classes starting with "test" are kept"""
+        module = import_module(root)
+        values = {}
+        for key in dir(module):
+            value = getattr(module, key)
+            if (isinstance(value, type) and key.lower().startswith('test')) or key.isupper():
+                values[key] = value
+        return cls(root, values)
+
+    def settings(self):
+        """new Settings object of default scrapy-test settings and test module values"""
+        from scrapy.settings import Settings
+        from scrapytest import default_settings
+
+        settings = Settings()
+        settings.setmodule(default_settings, priority='default')
+        for key, value in self.values.items():
+            settings.set(key, value, priority='project')
+        return settings
+
+    def get_spider(self, name: str):
+        for spider in self.spiders:
+            if spider.name == name:
+                return spider
+
+    def source_files(self) -> List[str]:
+        """source files of test module and of every module test classes and their bases are defined in"""
+        modules = {self.root}
+        for value in self.values.values():
+            if isinstance(value, type):
+                modules.update(base.__module__ for base in value.__mro__)
+        files = set()
+        for name in modules:
+            path = getattr(sys.modules.get(name), '__file__', None)
+            if path and os.path.exists(path):
+                files.add(os.path.abspath(path))
+        return sorted(files)
+
+
+def get_registry(config=None) -> Registry:
+    """registry of test module from [test] config section, built once per process"""
+    if not config:
+        config = get_test_config()
+    root = config['root']
+    try:
+        return _registries[root]
+    except KeyError:
+        pass
+    from scrapy.utils.conf import init_env
+    from scrapy.utils.project import ENVVAR
+    if ENVVAR not in os.environ:
+        project = os.environ.get('SCRAPY_PROJECT', 'default')
+        init_env(project)
+    registry = _registries[root] = Registry.from_module(root)
+    return registry
+
+
+def clear_registries():
+    _registries.clear()
+
+
+def closest_config(path='.') -> Optional[str]:
+    """closest scrapy.cfg in path or it's parents, like scrapy finds project config"""
+    path = os.path.abspath(path)
+    while True:
+        config = os.path.join(path, 'scrapy.cfg')
+        if os.path.exists(config):
+            return config
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def _file_stamp(path: str) -> Optional[list]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class DiscoveryIndex:
+    """
+    Spider names and classes of test module saved with stamps (modification time and size)
+    of scrapy.cfg and every source file of the scan, stale once any of them changes.
+    Index is kept in project's .scrapy data directory next to scrapy.cfg.
+    """
+    FILENAME = 'scrapytest_index.json'
+
+    def __init__(self, config: str, root: str, files: Dict[str, list], spiders: List[List[str]]):
+        self.config = config
+        self.root = root
+        self.files = files
+        self.spiders = spiders
+
+    @staticmethod
+    def index_path(config: str) -> str:
+        return os.path.join(os.path.dirname(config), '.scrapy', DiscoveryIndex.FILENAME)
+
+    @staticmethod
+    def read_root(config: str) -> Optional[str]:
+        """test module of [test] section of scrapy.cfg, read without scrapy"""
+        parser = ConfigParser()
+        parser.read(config)
+        return parser.get('test', 'root', fallback=None)
+
+    @classmethod
+    def from_registry(cls, registry: Registry, config: str) -> 'DiscoveryIndex':
+        files = {path: _file_stamp(path) for path in [os.path.abspath(config), *registry.source_files()]}
+        spiders = [[spider.name, str(spider)] for spider in registry.spiders]
+        return cls(os.path.abspath(config), registry.root, files, spiders)
+
+    @classmethod
+    def load(cls, config: Optional[str] = None) -> Optional['DiscoveryIndex']:
+        """fresh index of closest project config, None when there's none or it's stale"""
+        config = config or closest_config()
+        if not config:
+            return None
+        try:
+            with open(cls.index_path(config)) as f:
+                data = json.load(f)
+            index = cls(data['config'], data['root'], data['files'], data['spiders'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if index.config != os.path.abspath(config) or not index.is_fresh():
+            return None
+        return index
+
+    def is_fresh(self) -> bool:
+        if not self.files or self.read_root(self.config) != self.root:
+            return False
+        return all(_file_stamp(path) == stamp for path, stamp in self.files.items())
+
+    def save(self):
+        path = self.index_path(self.config)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written atomically so concurrent runs never read a partial index
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'config': self.config, 'root': self.root, 'files': self.files, 'spiders': self.spiders}, f)
+        os.replace(tmp, path)
+
+    def spider_names(self) -> List[str]:
+        return [name for name, _ in self.spiders]
@@ -17,22 +17,28 @@ see https://doc.scrapy.org/en/latest/topics/practices.html#run-scrapy-from-a-scr
 
 
 # TODO spider_kwargs should probably be per spider?
-def run_spiders(spiders, settings=None, **spider_kwargs) -> Tuple[dict, dict]:
+def run_spiders(spiders, settings=None, item_callback=None, keep_results=True, **spider_kwargs) -> Tuple[dict, dict]:
     """
     Crawl multiple spiders and return their results and stats:
     e.g.
     {'spider1': [], 'spider2': []}, {'spider1': {}, 'spider2': {}}
+
+    :param item_callback: optional callable(item, spider) called for every item as soon as it is scraped
+    :param keep_results: whether scraped items should be kept in returned results
     """
     results = defaultdict(list)
     stats = defaultdict(dict)
 
     def crawler_results(signal, sender, item, response, spider):
-        results[spider.name].append(item)
+        if item_callback:
+            item_callback(item, spider)
+        if keep_results:
+            results[spider.name].append(item)
 
     def crawler_close(signal, sender, spider, reason):
         stats[spider.name].update(spider.crawler.stats.get_stats())
 
-    dispatcher.connect(crawler_results, signal=signals.item_passed)
+    dispatcher.connect(crawler_results, signal=signals.item_scraped)
     dispatcher.connect(crawler_close, signal=signals.spider_closed)
 
     all_settings = get_project_settings()
@@ -0,0 +1,97 @@
+import math
+import random
+from collections import Counter, defaultdict
+from typing import Iterable, Iterator, List, Tuple
+
+from scrapy import Item
+
+"""
+Statistical sampling of items for validation of huge crawls.
+Instead of testing every item only a sample of every item class is validated,
+either a random `rate` fraction of items or a fixed size reservoir (uniform
+random sample of all items of the class) that is validated when the stream is
+closed. Field coverage of samples is an estimate, it's reported with Wilson
+score confidence intervals.
+"""
+
+
+class Sampler:
+    """
+    Picks items of a single stream for validation, nested items are validated with their parents.
+    :param rate: probability of every item to be validated
+    :param size: reservoir size per item class, takes precedence over rate, 0 disables reservoirs
+    :param seed: random seed for reproducible samples
+    """
+
+    def __init__(self, rate=1.0, size=0, seed=None):
+        self.rate = rate
+        self.size = size
+        self.random = random.Random(seed)
+        self.seen = Counter()
+        self.reservoirs = defaultdict(list)
+
+    @property
+    def total(self) -> int:
+        """amount of items fed in"""
+        return sum(self.seen.values())
+
+    def feed(self, item: Item) -> List[Item]:
+        """feed item in, returns items sampled for validation right away"""
+        item_cls = type(item)
+        self.seen[item_cls] += 1
+        if self.size:
+            reservoir = self.reservoirs[item_cls]
+            if len(reservoir) < self.size:
+                reservoir.append(item)
+            else:
+                # every item seen so far stays in the reservoir with the same probability
+                i = self.random.randrange(self.seen[item_cls])
+                if i < self.size:
+                    reservoir[i] = item
+            return []
+        if self.random.random() < self.rate:
+            return [item]
+        return []
+
+    def drain(self) -> List[Item]:
+        """items sampled into reservoirs, reservoirs are emptied"""
+        items = [item for reservoir in self.reservoirs.values() for item in reservoir]
+        self.reservoirs.clear()
+        return items
+
+    def sample(self, items: Iterable[Item]) -> Iterator[Item]:
+        """sampled items of items"""
+        for item in items:
+            yield from self.feed(item)
+        yield from self.drain()
+
+
+def z_score(confidence: float) -> float:
+    """two sided standard normal quantile of confidence level, e.g. 1.96 for 0.95"""
+    low, high = 0.0, 10.0
+    for _ in range(100):
+        mid = (low + high) / 2
+        if math.erf(mid / math.sqrt(2)) < confidence:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def wilson_interval(count: int, total: int, confidence=0.95) -> Tuple[float, float]:
+    """
+    Wilson score confidence interval of proportion count/total:
+
+    >>> wilson_interval(95, 100)
+    (0.8882..., 0.9784...)
+    """
+    if not total:
+        return 0.0, 1.0
+    z = z_score(confidence)
+    p = count / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    half = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    low = 0.0 if count == 0 else max(center - half, 0.0)
+    high = 1.0 if count == total else min(center + half, 1.0)
+    return low, high
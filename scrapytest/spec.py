@@ -1,7 +1,10 @@
-import re
-from typing import List
+from typing import List, Dict, Optional, Tuple
 
-from scrapytest.tests import LessThan, MoreThan, Match, Compose, Pass
+from scrapy import Item
+
+from scrapytest.profile import profiled
+from scrapytest.tests import LessThan, MoreThan, Match, Compose, Pass, Type
+from scrapytest.utils import PatternIndex
 
 
 class ItemSpec:
@@ -35,6 +38,58 @@ class ItemSpec:
             if k.endswith('_cov') and k != 'default_cov':
                 self.coverage[k.split('_cov')[0]] = getattr(self, k)
 
+    def compile(self) -> 'ItemPlan':
+        """compile spec into flat validation plan of every field of item_cls"""
+        fields = {}
+        for name in getattr(self.item_cls, 'fields', {}):
+            fields[name] = FieldPlan(name, self.tests.get(name, self.default_test))
+        return ItemPlan(self.item_cls, fields, FieldPlan(None, self.default_test))
+
+
+class FieldPlan:
+    """
+    Precomputed validation steps of a single item field:
+    `testers` - flat tuple of testers with Compose layers and Pass testers removed
+    `nested` - whether field's Type testers allow nested items or lists of them, see feed.ItemBuilder;
+               nested items are validated wherever they are found regardless
+    `skip` - whether field is Pass()-only, i.e. only nested items of it need validation
+    """
+    __slots__ = ('name', 'testers', 'nested', 'skip')
+
+    def __init__(self, name, test):
+        self.name = name
+        self.testers = tuple(t for t in _flatten_testers(test) if not isinstance(t, Pass))
+        self.nested = _can_hold_items(self.testers)
+        self.skip = not self.testers
+
+
+class ItemPlan:
+    """Validation plan of item class: FieldPlan for every field of item_cls"""
+    __slots__ = ('item_cls', 'name', 'fields', 'default')
+
+    def __init__(self, item_cls, fields: Dict[str, FieldPlan], default: FieldPlan):
+        self.item_cls = item_cls
+        self.name = getattr(item_cls, '__name__', str(item_cls))
+        self.fields = fields
+        self.default = default
+
+    def get(self, field) -> FieldPlan:
+        return self.fields.get(field, self.default)
+
+
+def _flatten_testers(test) -> List:
+    if isinstance(test, Compose):
+        return [t for func in test.functions for t in _flatten_testers(func)]
+    return [test]
+
+
+def _can_hold_items(testers) -> bool:
+    """fields that pass Type test only for non-container classes can't hold nested items"""
+    for tester in testers:
+        if isinstance(tester, Type) and isinstance(tester.type, type) and tester.type is not object:
+            return issubclass(tester.type, (list, Item))
+    return True
+
 
 class StatsSpec:
     """
@@ -47,8 +102,14 @@ class StatsSpec:
     }
     `required` attribute contains a list of <stat name re patterns> that
     are required in stat output.
+    `failure_budget` attribute is the amount of item failures spiders can have
+    before they are closed during the crawl, see FAILURE_BUDGET setting.
+    `live` attribute contains a list of `validate` patterns that are checked
+    on stats snapshots during the crawl as well, see scrapytest.live.
     """
     spider_cls: List = NotImplemented
+    failure_budget = None
+    live = ['log_count/ERROR$']
     validate = {
         'log_count/ERROR$': LessThan(1),
         'item_scraped_count': MoreThan(0),
@@ -57,33 +118,107 @@ class StatsSpec:
     required = []
 
     def __init__(self):
-        self._required_re = {k: re.compile(k) for k in self.required}
-        self._validate_re = {k: re.compile(k) for k in self.validate}
-        for key, funcs in self.validate.items():
-            if not isinstance(funcs, (list, tuple)):
-                funcs = [funcs]
-            self.validate[key] = Compose(*funcs)
+        # indexes are kept on spec instance so they are shared by all spiders of this spec
+        self._required_index = PatternIndex(self.required)
+        self._validate_index = PatternIndex(self.validate)
+        self._live = {i for i, pattern in enumerate(self.validate) if pattern in self.live}
+        # composed testers are kept on the instance, class `validate` dict is shared by every instance
+        self.validate = {key: Compose(*(funcs if isinstance(funcs, (list, tuple)) else [funcs]))
+                         for key, funcs in self.validate.items()}
+        self._live_tests = {i: test for i, test in enumerate(self.validate.values()) if i in self._live}
         if not isinstance(self.spider_cls, (list, tuple)):
             self.spider_cls = [self.spider_cls]
         if not isinstance(self.spider_cls, list):
             self.spider_cls = list(self.spider_cls)
 
+    @profiled('StatsSpec.validate_stats')
     def validate_stats(self, stats: dict) -> List[str]:
+        # resolve every stat to it's matching patterns in a single pass
+        matched_stats = [[] for _ in self._validate_index.patterns]
+        found_required = set()
+        for stat in stats:
+            for i in self._validate_index.match(stat):
+                matched_stats[i].append(stat)
+            found_required.update(self._required_index.match(stat))
+
         all_messages = []
-        for pattern, validation_func in self.validate.items():
-            pattern = self._validate_re[pattern]
-            for stat, value in stats.items():
-                if not pattern.match(stat):
-                    continue
-                msgs = validation_func(value)
+        for stat_names, validation_func in zip(matched_stats, self.validate.values()):
+            for stat in stat_names:
+                msgs = validation_func(stats[stat])
                 if msgs:
                     all_messages.extend([f'{stat}: {msg}' for msg in msgs])
-        for pattern in self.required:
-            compiled = self._required_re[pattern]
-            for stat in stats.keys():
-                if compiled.match(stat):
-                    break
-            else:
+        for i, pattern in enumerate(self.required):
+            if i not in found_required:
                 all_messages.append(f'{pattern}: missing')
 
         return all_messages
+
+    def validate_live(self, stats: dict, keys) -> Dict[str, List[str]]:
+        """
+        Validate only given keys of stats with `live` patterns
+        :returns: messages of every failed stat
+        """
+        failed = {}
+        if not self._live_tests:
+            return failed
+        for stat in keys:
+            for i in self._validate_index.match(stat):
+                test = self._live_tests.get(i)
+                if test is None:
+                    continue
+                msgs = test(stats[stat])
+                if msgs:
+                    failed.setdefault(stat, []).extend(f'{stat}: {msg}' for msg in msgs)
+        return failed
+
+
+class PerformanceSpec:
+    """
+    Crawl performance specification, metrics of every run are compared to the rolling
+    baseline of the spider: median of the metric in the last `window` recorded runs
+    (HISTORY_WINDOW setting by default), see scrapytest.history for available metrics.
+    `max_drop` attribute contains <metric>: percent the metric can drop below baseline
+    `max_rise` attribute contains <metric>: percent the metric can rise above baseline
+    e.g.
+    max_drop = {'items_per_second': 20}
+    max_rise = {'elapsed': 50, 'peak_memory': 30}
+    Metrics are not checked until there are at least `min_runs` runs in the baseline.
+    """
+    spider_cls: List = NotImplemented
+    max_drop = {
+        'items_per_second': 25,
+        'requests_per_second': 25,
+    }
+    max_rise = {}
+    window = None
+    min_runs = 3
+
+    def __init__(self):
+        if not isinstance(self.spider_cls, (list, tuple)):
+            self.spider_cls = [self.spider_cls]
+        if not isinstance(self.spider_cls, list):
+            self.spider_cls = list(self.spider_cls)
+
+    @property
+    def metrics(self) -> List[str]:
+        return list(dict.fromkeys([*self.max_drop, *self.max_rise]))
+
+    def validate_metrics(self, metrics: dict, baselines: Dict[str, Tuple[Optional[float], int]]) -> List[str]:
+        """
+        :param metrics: metrics of the run
+        :param baselines: (median, amount of runs) of every metric's baseline
+        """
+        messages = []
+        checks = [(metric, limit, -1) for metric, limit in self.max_drop.items()]
+        checks += [(metric, limit, 1) for metric, limit in self.max_rise.items()]
+        for metric, limit, direction in checks:
+            value = metrics.get(metric)
+            baseline, runs = baselines.get(metric, (None, 0))
+            if value is None or baseline is None or runs < self.min_runs or not baseline:
+                continue
+            change = (value - baseline) * 100 / baseline
+            if change * direction > limit:
+                where = 'above' if direction > 0 else 'below'
+                messages.append(f'{metric}: {value:.2f} is {abs(change):.1f}% {where} baseline {baseline:.2f} '
+                                f'(max {limit}%, median of {runs} runs)')
+        return messages
@@ -1,14 +1,14 @@
 import re
+from functools import lru_cache
+from importlib.util import find_spec
 from urllib.parse import urlparse
 
-from scrapytest.utils import is_empty
+from scrapytest.histogram import Histogram
+from scrapytest.typecheck import compile_checker, HAS_TYPEGUARD
+from scrapytest.utils import is_empty, obj_name
 
-try:
-    from typeguard import check_type
-
-    HAS_TYPEGUARD = True
-except ImportError:
-    HAS_TYPEGUARD = False
+# numpy is slow to import so it's only imported once a column is worth converting
+HAS_NUMPY = find_spec('numpy') is not None
 
 """
 These are base testers for scrapy-test framework
@@ -21,8 +21,232 @@ e.g.
         if value == 'cake':
             return 'no cake :('
         return ''
+
+instead of message strings testers can return Failure records which
+are formatted only when they are reported:
+
+    def some_test(value):
+        if value == 'cake':
+            return Failure(some_test, value, 'no cake: {value} :(')
+        return ''
+
+testers can also implement optional batch protocol: `batch(values)` method
+that tests a column of values of a single field across many items and
+returns (index, message) pairs of failed values, see run_batch
+
+testers whose result depends only on the value can declare themselves pure
+with `pure = True` attribute, Validator then caches their results, see Memoize
 """
 
+# columns shorter than this are not worth converting to numpy arrays
+NUMPY_MIN_SIZE = 64
+
+
+def truncate(value, max_length: int) -> str:
+    text = str(value)
+    if len(text) > max_length:
+        return f'{text[:max_length]}...'
+    return text
+
+
+def get_tester_name(tester) -> str:
+    """readable name of tester, e.g. LessThan(5) or url_test"""
+    if isinstance(tester, str):
+        return tester
+    if type(tester).__str__ is not object.__str__:
+        return str(tester)
+    return obj_name(tester)
+
+
+class Failure:
+    """
+    Lightweight tester failure record.
+    Keeps reference to the tester, failed value and message template which
+    is formatted only when failure is reported, see `format`.
+    Failures are equal when they would produce the same message and
+    they compare and hash the same as their message strings.
+    """
+    __slots__ = ('tester', 'value', 'template', 'args', 'item_cls', 'field', '_hash')
+
+    def __init__(self, tester, value, template, **args):
+        self.tester = tester
+        self.value = value
+        self.template = template
+        self.args = args
+        self.item_cls = None
+        self.field = None
+        self._hash = None
+
+    @classmethod
+    def from_message(cls, tester, message) -> 'Failure':
+        """wrap message string returned by tester, messages are never truncated as a whole"""
+        return cls(tester, message, '{message}', message=message)
+
+    def bind(self, item_cls, field) -> 'Failure':
+        """copy of this failure for field of item class"""
+        failure = Failure(self.tester, self.value, self.template, **self.args)
+        failure.item_cls = item_cls
+        failure.field = field
+        return failure
+
+    def format(self, max_length=0) -> str:
+        """format message, values longer than max_length are truncated"""
+        value = truncate(self.value, max_length) if max_length else self.value
+        msg = self.template.format(value=value, **self.args)
+        if self.field is not None:
+            msg = f'{self.item_cls.__name__}.{self.field}: {msg}'
+        return msg
+
+    def __str__(self):
+        return self.format()
+
+    def __repr__(self):
+        return f'<Failure {self}>'
+
+    def _key(self):
+        return self.item_cls, self.field, self.template, type(self.value), self.value, self.args
+
+    def __eq__(self, other):
+        if isinstance(other, str):
+            return self.format() == other
+        if not isinstance(other, Failure):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        # formatted message is hashed as failures are equal to their message strings
+        if self._hash is None:
+            self._hash = hash(self.format())
+        return self._hash
+
+    def __getstate__(self):
+        # testers can be lambdas or methods so only tester's name is pickled,
+        # string hashes differ between processes so they are not pickled either
+        state = {k: getattr(self, k) for k in self.__slots__ if k != '_hash'}
+        state['tester'] = get_tester_name(state['tester'])
+        return state
+
+    def __setstate__(self, state):
+        self._hash = None
+        for key, value in state.items():
+            setattr(self, key, value)
+
+
+def run_tester(func, value) -> list:
+    """call tester and return list of it's messages, errors raised by tester are turned into messages"""
+    try:
+        messages = func(value)
+    except TypeError as e:
+        return [f'{type(e).__name__}:{e} got "{type(value)}": {value}']
+    except Exception as e:
+        return [f'{type(e).__name__}:{e}']
+    return messages if isinstance(messages, list) else [messages]
+
+
+def run_batch(func, values) -> list:
+    """
+    Test column of values with tester's batch protocol and return (index, message) pairs of failures.
+    Testers without `batch` method are called for every value, batches that raise errors are
+    tested value by value too so errors are reported exactly like for single values.
+    """
+    batch = getattr(func, 'batch', None)
+    if batch is not None:
+        try:
+            return list(batch(values))
+        except Exception:
+            pass
+    failures = []
+    for i, value in enumerate(values):
+        for msg in run_tester(func, value):
+            if msg:
+                failures.append((i, msg))
+    return failures
+
+
+def _numeric_column(values, expected):
+    """
+    numpy array of values when comparing it with expected gives exactly the same results as python does,
+    None if values aren't all ints or all floats or column is too short
+    """
+    if not HAS_NUMPY or len(values) < NUMPY_MIN_SIZE:
+        return None
+    if type(expected) not in (int, float):
+        return None
+    # mixed ints and floats would be converted to float64 which is not exact for big integers
+    types = set(map(type, values))
+    if types == {int}:
+        # int64 to float comparison is not exact for big integers
+        if type(expected) is float or not -2 ** 63 <= expected < 2 ** 63:
+            return None
+    elif types == {float}:
+        if type(expected) is int and abs(expected) > 2 ** 53:
+            return None
+    else:
+        return None
+    import numpy
+    column = numpy.asarray(values)
+    # integers beyond int64 stay python objects
+    if column.dtype.kind not in 'if':
+        return None
+    return column
+
+
+def _type_signature(value):
+    """type of value including types of tuple and frozenset members, so (1, 2) and (1.0, 2) differ"""
+    value_type = type(value)
+    if value_type is tuple:
+        return value_type, tuple(_type_signature(v) for v in value)
+    if value_type is frozenset:
+        # members are paired with their types, as signatures alone don't say which member has which type
+        return value_type, frozenset((v, _type_signature(v)) for v in value)
+    return value_type
+
+
+class Memoize:
+    """
+    Bounded LRU cache of pure tester's results by value, values of different types
+    (including types inside tuples and frozensets) are cached separately.
+    Unhashable values are tested directly.
+    """
+
+    def __init__(self, tester, maxsize=10_000):
+        self.tester = tester
+        self.cached = lru_cache(maxsize=maxsize)(self._test)
+        self.unhashable = 0
+
+    def _test(self, value, signature):
+        return self.tester(value)
+
+    def __str__(self):
+        return get_tester_name(self.tester)
+
+    def __call__(self, value):
+        try:
+            hash(value)
+        except TypeError:
+            self.unhashable += 1
+            return self.tester(value)
+        return self.cached(value, _type_signature(value))
+
+    def batch(self, values):
+        for i, value in enumerate(values):
+            messages = self(value)
+            for msg in messages if isinstance(messages, list) else [messages]:
+                if msg:
+                    yield i, msg
+
+    @property
+    def hits(self) -> int:
+        return self.cached.cache_info().hits
+
+    @property
+    def misses(self) -> int:
+        return self.cached.cache_info().misses
+
+
+def is_pure(tester) -> bool:
+    return getattr(tester, 'pure', False) is True
+
 
 class Map:
     """Map set of tests to every value"""
@@ -59,15 +283,14 @@ class Compose:
     def __call__(self, value):
         all_messages = []
         for func in self.functions:
-            try:
-                messages = func(value)
-                all_messages.extend(messages if isinstance(messages, list) else [messages])
-            except TypeError as e:
-                all_messages.append(f'{type(e).__name__}:{e} got "{type(value)}": {value}')
-            except Exception as e:
-                all_messages.append(f'{type(e).__name__}:{e}')
+            all_messages.extend(run_tester(func, value))
         return [msg for msg in all_messages if msg]
 
+    def batch(self, values):
+        # failures of every value stay in order of functions
+        failures = [pair for func in self.functions for pair in run_batch(func, values)]
+        return sorted(failures, key=lambda pair: pair[0])
+
     def __str__(self):
         full = []
         for fun in self.functions:
@@ -77,25 +300,39 @@ class Compose:
 
 class Match:
     """Regex pattern match tester"""
+    pure = True
 
     def __init__(self, pattern, flags=0):
         self.pattern = re.compile(pattern, flags=flags)
 
+    def __str__(self):
+        return f'{type(self).__name__}({self.pattern.pattern})'
+
     def __call__(self, value):
         if not self.pattern.match(value):
-            return f'"{value}" does not match pattern "{self.pattern.pattern}"'
+            return Failure(self, value, '"{value}" does not match pattern "{pattern}"', pattern=self.pattern.pattern)
         return ''
 
+    def batch(self, values):
+        match = self.pattern.match
+        for i, value in enumerate(values):
+            if not match(value):
+                yield i, self(value)
+
 
 class Search:
     """Regex pattern search tester"""
+    pure = True
 
     def __init__(self, pattern, flags=0):
         self.pattern = re.compile(pattern, flags=flags)
 
+    def __str__(self):
+        return f'{type(self).__name__}({self.pattern.pattern})'
+
     def __call__(self, value):
         if not self.pattern.search(value):
-            return f'"{value}" does contain pattern "{self.pattern.pattern}"'
+            return Failure(self, value, '"{value}" does contain pattern "{pattern}"', pattern=self.pattern.pattern)
         return ''
 
 
@@ -108,34 +345,60 @@ class _Compare:
 
 
 class Only:
+    pure = True
+
     def __init__(self, values):
         self.values = values
 
     def __call__(self, value):
         bad = [c for c in value if c not in self.values]
         if bad:
-            return f'value "{value}" contains disallowed values: {bad}'
+            return Failure(self, value, 'value "{value}" contains disallowed values: {bad}', bad=bad)
         return ''
 
+    def batch(self, values):
+        allowed = self.values
+        # strings test substrings, other containers are turned into sets for fast lookups
+        if not isinstance(allowed, str):
+            allowed = frozenset(allowed)
+        for i, value in enumerate(values):
+            if not all(c in allowed for c in value):
+                yield i, self(value)
+
 
 class Len:
     class less_than(_Compare):
         def __call__(self, value):
             if len(value) < self.value:
                 return ''
-            return f'length {len(value)} when expected <{self.value}'
+            return Failure(self, value, 'length {length} when expected <{expected}', length=len(value),
+                           expected=self.value)
+
+        def batch(self, values):
+            expected = self.value
+            return ((i, self(value)) for i, value in enumerate(values) if not len(value) < expected)
 
     class more_than(_Compare):
         def __call__(self, value):
             if len(value) > self.value:
                 return ''
-            return f'length {len(value)} when expected >{self.value}'
+            return Failure(self, value, 'length {length} when expected >{expected}', length=len(value),
+                           expected=self.value)
+
+        def batch(self, values):
+            expected = self.value
+            return ((i, self(value)) for i, value in enumerate(values) if not len(value) > expected)
 
     class equals(_Compare):
         def __call__(self, value):
             if len(value) == self.value:
                 return ''
-            return f'length {len(value)} when expected ={self.value}'
+            return Failure(self, value, 'length {length} when expected ={expected}', length=len(value),
+                           expected=self.value)
+
+        def batch(self, values):
+            expected = self.value
+            return ((i, self(value)) for i, value in enumerate(values) if not len(value) == expected)
 
 
 class LessThan(_Compare):
@@ -144,7 +407,16 @@ class LessThan(_Compare):
     def __call__(self, value):
         if value < self.value:
             return ''
-        return f'{value} !< {self.value}'
+        return Failure(self, value, '{value} !< {expected}', expected=self.value)
+
+    def batch(self, values):
+        expected = self.value
+        column = _numeric_column(values, expected)
+        if column is not None:
+            failed = (~(column < expected)).nonzero()[0].tolist()
+        else:
+            failed = [i for i, value in enumerate(values) if not value < expected]
+        return [(i, self(values[i])) for i in failed]
 
 
 class Equal(_Compare):
@@ -153,7 +425,17 @@ class Equal(_Compare):
     def __call__(self, value):
         if value == self.value:
             return ''
-        return f'{type(value).__name__}:{value} != {type(self.value).__name__}:{self.value}'
+        return Failure(self, value, '{value_type}:{value} != {expected_type}:{expected}',
+                       value_type=type(value).__name__, expected_type=type(self.value).__name__, expected=self.value)
+
+    def batch(self, values):
+        expected = self.value
+        column = _numeric_column(values, expected)
+        if column is not None:
+            failed = (column != expected).nonzero()[0].tolist()
+        else:
+            failed = [i for i, value in enumerate(values) if not value == expected]
+        return [(i, self(values[i])) for i in failed]
 
 
 class MoreThan(_Compare):
@@ -162,7 +444,16 @@ class MoreThan(_Compare):
     def __call__(self, value):
         if value > self.value:
             return ''
-        return f'{value} !> {self.value}'
+        return Failure(self, value, '{value} !> {expected}', expected=self.value)
+
+    def batch(self, values):
+        expected = self.value
+        column = _numeric_column(values, expected)
+        if column is not None:
+            failed = (~(column > expected)).nonzero()[0].tolist()
+        else:
+            failed = [i for i, value in enumerate(values) if not value > expected]
+        return [(i, self(values[i])) for i in failed]
 
 
 class Required:
@@ -170,19 +461,27 @@ class Required:
 
     def __call__(self, value):
         if is_empty(value):
-            return f'is empty value: "{value}" of type {type(value).__name__}'
+            return Failure(self, value, 'is empty value: "{value}" of type {value_type}',
+                           value_type=type(value).__name__)
         return ''
 
+    def batch(self, values):
+        return ((i, self(value)) for i, value in enumerate(values) if is_empty(value))
+
 
 class Pass:
     def __call__(self, *args, **kwargs):
         return ''
 
+    def batch(self, values):
+        return []
+
 
 class Url:
     """
     Test url parts with defined regex patterns
     """
+    pure = True
 
     def __init__(self, netloc='', path='', params='', query='', fragment='', is_absolute=True):
         self.path = re.compile(path) if path else None
@@ -195,12 +494,13 @@ class Url:
     def __call__(self, value):
         url = urlparse(value)
         if self.is_absolute and not url.netloc:
-            return f'not an absolute url: {value}'
+            return Failure(self, value, 'not an absolute url: {value}')
         for key in ['netloc', 'path', 'params', 'query', 'fragment']:
             pattern = getattr(self, key)
-            value = getattr(url, key)
-            if pattern and not pattern.search(value):
-                return f'mismatched url.{key}: "{value}" expected: "{pattern.pattern}"'
+            part = getattr(url, key)
+            if pattern and not pattern.search(part):
+                return Failure(self, value, 'mismatched url.{key}: "{part}" expected: "{pattern}"',
+                               key=key, part=part, pattern=pattern.pattern)
         return ''
 
 
@@ -221,19 +521,67 @@ class Any:
 
 
 class Type:
-    """Check whether value matches a type"""
+    """
+    Check whether value matches a type annotation, see scrapytest.typecheck
+    :param check_first: check only this many first elements of containers
+    """
+    pure = True
 
-    def __init__(self, type):
-        if not HAS_TYPEGUARD:
-            raise ImportError('typeguard is required for type matching: pip install typeguard')
+    def __init__(self, type, check_first=None):
         self.type = type
+        self.check_first = check_first
+        self.check = compile_checker(type, check_first)
 
     def __call__(self, value):
-        try:
-            check_type('', value, self.type)
-        except TypeError:
-            return f'{value} is unexpected type {type(value)}, expected {self.type}'
-        return ''
+        if self.check(value):
+            return ''
+        return Failure(self, value, '{value} is unexpected type {value_type}, expected {expected}',
+                       value_type=type(value), expected=self.type)
+
+    def batch(self, values):
+        check = self.check
+        return ((i, self(value)) for i, value in enumerate(values) if not check(value))
 
     def __eq__(self, other):
         return isinstance(other, Type) and self.type == other.type
+
+
+def as_histogram(value) -> Histogram:
+    """Histogram of histogram stat (see Histogram.to_state and scrapytest.latency) or of a list of numbers"""
+    if isinstance(value, Histogram):
+        return value
+    if isinstance(value, dict):
+        return Histogram.from_state(value)
+    return Histogram.from_values(value)
+
+
+class PercentileBelow:
+    """
+    Test whether percentile of histogram stat or list of numbers is below some value, e.g. p95 download latency:
+    'latency/download$': PercentileBelow(95, 0.5)
+    """
+
+    def __init__(self, percentile, value):
+        self.percentile = percentile
+        self.value = value
+
+    def __str__(self):
+        return f'{type(self).__name__}({self.percentile}, {self.value})'
+
+    def __call__(self, value):
+        actual = as_histogram(value).percentile(self.percentile)
+        # nothing was recorded
+        if actual is None or actual < self.value:
+            return ''
+        return Failure(self, round(actual, 6), 'p{percentile} {value} !< {expected}', percentile=self.percentile,
+                       expected=self.value)
+
+
+class MeanBelow(_Compare):
+    """Test whether mean of histogram stat or list of numbers is below some value"""
+
+    def __call__(self, value):
+        actual = as_histogram(value).mean
+        if actual is None or actual < self.value:
+            return ''
+        return Failure(self, round(actual, 6), 'mean {value} !< {expected}', expected=self.value)
@@ -0,0 +1,140 @@
+import typing
+from functools import lru_cache
+from importlib.util import find_spec
+from itertools import islice
+from typing import Any, Callable, Optional
+
+# typeguard is imported only when an annotation falls back to it
+HAS_TYPEGUARD = find_spec('typeguard') is not None
+
+"""
+Compiler of type annotations into fast predicate functions for the Type tester.
+Plain classes, Optional, Union, List, Dict, Tuple, Set and FrozenSet annotations
+(and any nesting of these) are turned into specialized closures once, every other
+annotation falls back to typeguard's check_type.
+
+    >>> check = compile_checker(List[Optional[int]])
+    >>> check([1, None])
+    True
+
+Containers are checked completely unless `check_first` limits checking to their
+first K elements.
+"""
+
+# PEP 484 numeric tower: int is acceptable for float and complex
+_NUMERIC_TOWER = {
+    float: (float, int),
+    complex: (complex, float, int),
+}
+
+_LISTS = {list, typing.List}
+_DICTS = {dict, typing.Dict}
+_TUPLES = {tuple, typing.Tuple}
+_SETS = {set: set, frozenset: frozenset, typing.Set: set, typing.FrozenSet: frozenset}
+
+
+class UnsupportedAnnotation(Exception):
+    pass
+
+
+def _get_origin(annotation):
+    return getattr(annotation, '__origin__', None)
+
+
+def _get_args(annotation) -> Optional[tuple]:
+    """generic arguments, None for bare generics like typing.List"""
+    return getattr(annotation, '__args__', None)
+
+
+def _fallback(annotation) -> Callable[[Any], bool]:
+    if not HAS_TYPEGUARD:
+        raise ImportError(f'typeguard is required for type matching of {annotation}: pip install typeguard')
+    from typeguard import check_type
+
+    def check(value):
+        try:
+            check_type('', value, annotation)
+        except TypeError:
+            return False
+        return True
+
+    return check
+
+
+def _compile(annotation, check_first: Optional[int]) -> Callable[[Any], bool]:
+    if annotation is Any or annotation is object:
+        return lambda value: True
+    if annotation is None or annotation is type(None):
+        return lambda value: value is None
+    origin = _get_origin(annotation)
+    args = _get_args(annotation)
+
+    if origin is typing.Union:
+        checks = [_compile(arg, check_first) for arg in args]
+        return lambda value: any(check(value) for check in checks)
+    if args and all(isinstance(arg, typing.TypeVar) and _is_any(arg) for arg in args):
+        # bare generics of older pythons are parametrized with type variables
+        args = None
+
+    # bare generics (typing.List) and parametrized ones (List[int]) share the container class as origin
+    container = origin if origin is not None else annotation
+    if container in _LISTS or container in _SETS:
+        cls = list if container in _LISTS else _SETS[container]
+        if args is None or _is_any(args[0]):
+            return lambda value: isinstance(value, cls)
+        item_check = _compile(args[0], check_first)
+        return lambda value: isinstance(value, cls) and all(item_check(v) for v in islice(value, check_first))
+    if container in _DICTS:
+        if args is None or all(_is_any(arg) for arg in args):
+            return lambda value: isinstance(value, dict)
+        key_check, value_check = _compile(args[0], check_first), _compile(args[1], check_first)
+        return lambda value: isinstance(value, dict) and all(
+            key_check(k) and value_check(v) for k, v in islice(value.items(), check_first))
+    if container in _TUPLES:
+        if args is None:
+            return lambda value: isinstance(value, tuple)
+        # Tuple[()] is an empty tuple
+        if args in ((), ((),)):
+            return lambda value: value == ()
+        if len(args) == 2 and args[1] is Ellipsis:
+            item_check = _compile(args[0], check_first)
+            return lambda value: isinstance(value, tuple) and all(item_check(v) for v in islice(value, check_first))
+        checks = [_compile(arg, check_first) for arg in args]
+        size = len(checks)
+        return lambda value: (isinstance(value, tuple) and len(value) == size
+                              and all(check(v) for check, v in zip(checks, value)))
+
+    if origin is None and isinstance(annotation, type):
+        classes = _NUMERIC_TOWER.get(annotation, annotation)
+        return lambda value: isinstance(value, classes)
+    raise UnsupportedAnnotation(annotation)
+
+
+def _is_any(annotation) -> bool:
+    if isinstance(annotation, typing.TypeVar):
+        return not annotation.__constraints__ and annotation.__bound__ is None
+    return annotation is Any or annotation is object
+
+
+@lru_cache(maxsize=None)
+def _compile_cached(annotation, check_first):
+    try:
+        return _compile(annotation, check_first)
+    except UnsupportedAnnotation:
+        return _fallback(annotation)
+
+
+def compile_checker(annotation, check_first: Optional[int] = None) -> Callable[[Any], bool]:
+    """
+    Compile type annotation into predicate that tells whether value matches it.
+    Checkers are cached, annotations that can't be compiled are checked by typeguard.
+    :param check_first: check only this many first elements of containers, None checks all
+    """
+    try:
+        return _compile_cached(annotation, check_first)
+    except TypeError:
+        # unhashable annotation
+        try:
+            return _compile(annotation, check_first)
+        except UnsupportedAnnotation:
+            return _fallback(annotation)
@@ -1,17 +1,15 @@
-import os
+import re
 from collections import defaultdict, Counter
-from importlib import import_module
-from typing import List, Type
-
-from scrapy import Spider
-from scrapy.settings import Settings
-from scrapy.utils.conf import get_config, init_env
-from scrapytest import default_settings
-from scrapy.utils.project import ENVVAR
+from typing import List, Tuple
 
 from scrapytest.exceptions import ConfigError
+from scrapytest.profile import profiled
+
+# scrapy is imported inside functions, everything imports this module and
+# commands like `--list` shouldn't pay for importing scrapy and twisted
 
 
+@profiled('collapse_buffer')
 def collapse_buffer(buffer, format='{msg} [x{count}]'):
     """
     collapse repeating messages and add count:
@@ -19,9 +17,17 @@ def collapse_buffer(buffer, format='{msg} [x{count}]'):
     >>> collapse_buffer(['foo', 'foo'])
     ['foo [2]']
     """
-    counter = Counter()
-    for msg in buffer:
-        counter[msg] += 1
+    return collapse_counter(Counter(buffer), format=format)
+
+
+@profiled('collapse_counter')
+def collapse_counter(counter, format='{msg} [x{count}]'):
+    """
+    same as collapse_buffer but for already counted messages, e.g.:
+
+    >>> collapse_counter(Counter({'foo': 2, 'bar': 1}))
+    ['foo [x2]', 'bar']
+    """
     collapsed = []
     for msg, count in counter.items():
         if count == 1:
@@ -65,10 +71,12 @@ def join_counter_dicts(*items) -> defaultdict:
     return merged
 
 
-def get_spiders_from_settings(settings=None) -> List[Type[Spider]]:  # pragma: no cover
-    """Get spider classes from settings"""
+def get_spiders_from_settings(settings=None) -> list:  # pragma: no cover
+    """Get spider classes from settings, test module registry when settings are not given"""
     if not settings:
-        settings = get_test_settings()
+        from scrapytest.registry import get_registry
+        return list(get_registry().spiders)
+    from scrapy import Spider
     spiders = []
     for key, value in settings.items():
         if isinstance(value, type) and issubclass(value, Spider):
@@ -76,9 +84,23 @@ def get_spiders_from_settings(settings=None) -> List[Type[Spider]]:  # pragma: n
     return spiders
 
 
+def get_items_from_settings(settings=None) -> list:  # pragma: no cover
+    """Get item classes from settings, test module registry when settings are not given"""
+    if not settings:
+        from scrapytest.registry import get_registry
+        return list(get_registry().items)
+    from scrapy import Item
+    items = []
+    for key, value in settings.items():
+        if isinstance(value, type) and issubclass(value, Item) and value is not Item:
+            items.append(value)
+    return items
+
+
 def get_test_config(config=None):
     """get [test] config section of scrapy.cfg"""
     if not config:
+        from scrapy.utils.conf import get_config
         config = get_config()
     try:
         return config['test']
@@ -86,23 +108,46 @@ def get_test_config(config=None):
         raise ConfigError('scrapytest configuration is missing in scrapy.cfg, required "[test]" section')
 
 
-def get_test_settings(config=None) -> Settings:  # pragma: no cover
-    """get test module contents as Settings object from scrapy-test config section"""
-    if not config:
-        config = get_test_config()
-    if ENVVAR not in os.environ:
-        project = os.environ.get('SCRAPY_PROJECT', 'default')
-        init_env(project)
-    settings = Settings()
-    settings.setmodule(default_settings, priority='default')
-    settings_module = import_module(config['root'])
-    for key in dir(settings_module):
-        value = getattr(settings_module, key)
-        if (isinstance(value, type) and key.lower().startswith('test')) or key.isupper():
-            settings.set(key, value, priority='project')
+def get_budget_settings(config) -> dict:
+    """
+    settings of failure budgets from [test] config section, e.g.:
+    failure_budget = 100
+    failure_budget.myspider = 10
+    coverage_fail_fast = true
+    """
+    settings = {}
+    budgets = {}
+    for key, value in config.items():
+        if key == 'failure_budget':
+            settings['FAILURE_BUDGET'] = int(value)
+        elif key.startswith('failure_budget.'):
+            budgets[key.split('.', 1)[1]] = int(value)
+        elif key == 'coverage_fail_fast':
+            settings['COVERAGE_FAIL_FAST'] = str(value).lower() in ('1', 'true', 'yes', 'on')
+    if budgets:
+        settings['FAILURE_BUDGETS'] = budgets
     return settings
 
 
+def close_spider(crawler, reason: str):  # pragma: no cover
+    """close crawler's spider with reason on any scrapy version"""
+    engine = crawler.engine
+    if hasattr(engine, 'close_spider_async'):
+        from scrapy.utils.defer import deferred_from_coro
+        deferred_from_coro(engine.close_spider_async(reason=reason))
+    else:
+        engine.close_spider(crawler.spider, reason)
+
+
+def get_test_settings(config=None):  # pragma: no cover
+    """
+    get test module contents as Settings object from scrapy-test config section,
+    test module is scanned once per process, see scrapytest.registry
+    """
+    from scrapytest.registry import get_registry
+    return get_registry(config).settings()
+
+
 def obj_name(obj) -> str:
     try:
         # function
@@ -110,3 +155,63 @@ def obj_name(obj) -> str:
     except:
         # object
         return type(obj).__name__
+
+
+_REGEX_META = set('.^$*+?{}[]\\|()')
+
+
+def literal_prefix(pattern: str) -> str:
+    """
+    Get literal text every string matched by regex pattern (with re.match) has to start with:
+
+    >>> literal_prefix('downloader/response_status_count/5\\d\\d')
+    'downloader/response_status_count/5'
+    """
+    if '|' in pattern:
+        # alternation can split the pattern anywhere
+        return ''
+    if pattern.startswith('^'):
+        pattern = pattern[1:]
+    prefix = ''
+    for char in pattern:
+        if char in _REGEX_META:
+            break
+        prefix += char
+    # optional quantifiers apply to the last literal character, e.g. "abc?"
+    if len(prefix) < len(pattern) and pattern[len(prefix)] in '*?{':
+        prefix = prefix[:-1]
+    return prefix
+
+
+class PatternIndex:
+    """
+    Index of regex patterns that resolves a key to all patterns matching it (with re.match).
+    Patterns are bucketed by their literal prefix so only patterns whose prefix the key starts with
+    are tried. Results are memoized per key so repeated keys are resolved with a single lookup.
+    """
+
+    def __init__(self, patterns, cache_size=100_000):
+        self.patterns = [re.compile(p) for p in patterns]
+        self.buckets = defaultdict(list)
+        for i, pattern in enumerate(self.patterns):
+            self.buckets[literal_prefix(pattern.pattern)].append(i)
+        self.lengths = sorted({len(prefix) for prefix in self.buckets})
+        self.cache_size = cache_size
+        self._cache = {}
+
+    def match(self, key: str) -> Tuple[int, ...]:
+        """indexes of patterns matching key in pattern order"""
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        candidates = []
+        for length in self.lengths:
+            if length > len(key):
+                break
+            candidates.extend(self.buckets.get(key[:length], ()))
+        matched = tuple(sorted(i for i in candidates if self.patterns[i].match(key)))
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[key] = matched
+        return matched
@@ -1,14 +1,103 @@
+import random
 from collections import Counter, defaultdict
-from typing import List, Union, Dict, Type
+from operator import itemgetter
+from typing import List, Union, Dict, Type, Iterator, Tuple, Optional
 
 from scrapy import Item
 from scrapy.settings import Settings
+from scrapy.utils.project import data_path
 
+from scrapytest.aggregate import FailureAggregator
+from scrapytest.cache import ValidationCache, content_hash, plan_fingerprint
+from scrapytest.profile import ProfiledTester, enable_profiler, profiled
+from scrapytest.sampling import Sampler, wilson_interval
 from scrapytest.spec import ItemSpec, StatsSpec
-from scrapytest.utils import get_test_settings, join_counter_dicts, is_empty
+from scrapytest.tests import run_tester, run_batch, Failure, Memoize, is_pure, get_tester_name
+from scrapytest.utils import get_test_settings, is_empty
 
 
-# TODO add limit to printing length
+class CoverageCounter:
+    """
+    Incremental field coverage counter.
+    Every item class gets a flat array of counts that is updated in place as items are added:
+    {PostItem: [<items seen>, <title count>, <url count>, ...]}
+    Counters of different workers can be combined with `merge`.
+    """
+
+    def __init__(self, empty_is_missing=True):
+        self.empty_is_missing = empty_is_missing
+        self.fields = {}
+        self.counts = {}
+
+    def __iter__(self):
+        return iter(self.counts)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _get_counts(self, item_cls) -> List[int]:
+        try:
+            return self.counts[item_cls]
+        except KeyError:
+            fields = self.fields[item_cls] = tuple(item_cls.fields)
+            counts = self.counts[item_cls] = [0] * (len(fields) + 1)
+            return counts
+
+    def add(self, item: Item):
+        """count item's present fields including fields of nested items"""
+        if not isinstance(item, Item):
+            return
+        values = item._values
+        # nested items are counted first to keep the order in which item classes are discovered
+        for value in values.values():
+            # deal with nested item
+            if isinstance(value, Item):
+                self.add(value)
+            # deal with list of nested items
+            elif isinstance(value, list):
+                for v in value:
+                    if isinstance(v, Item):
+                        self.add(v)
+        item_cls = type(item)
+        counts = self._get_counts(item_cls)
+        counts[0] += 1
+        for i, key in enumerate(self.fields[item_cls], 1):
+            if key not in values:
+                continue
+            if self.empty_is_missing and is_empty(values[key]):
+                continue
+            counts[i] += 1
+
+    def merge(self, other: 'CoverageCounter') -> 'CoverageCounter':
+        """add counts of other counter to this one in place"""
+        for item_cls, other_counts in other.counts.items():
+            counts = self._get_counts(item_cls)
+            for i, count in enumerate(other_counts):
+                counts[i] += count
+        return self
+
+    def total(self, item_cls) -> int:
+        """amount of counted items of item_cls"""
+        return self.counts[item_cls][0]
+
+    def most_common(self, item_cls) -> List[tuple]:
+        """(field, count) pairs of item_cls ordered by count"""
+        pairs = zip(self.fields[item_cls], self.counts[item_cls][1:])
+        return sorted(pairs, key=lambda pair: pair[1], reverse=True)
+
+    def as_counters(self, count_key='_self') -> Dict[Type, Counter]:
+        """
+        Counters for every item class with items total under count_key, e.g.:
+        {PostItem: Counter({'_self': 2, 'title': 2, 'url': 1})}
+        """
+        counters = defaultdict(Counter)
+        for item_cls, counts in self.counts.items():
+            counter = counters[item_cls]
+            counter[count_key] = counts[0]
+            for field, count in zip(self.fields[item_cls], counts[1:]):
+                counter[field] = count
+        return counters
+
 
 class Validator:
     """
@@ -26,10 +115,42 @@ class Validator:
                     self.stat_specs[spider_cls].append(spec)
             if isinstance(spec, ItemSpec):
                 self.item_specs[spec.item_cls] = spec
+        # item specs compiled to flat per item class validation plans
+        self.item_plans = {item_cls: spec.compile() for item_cls, spec in self.item_specs.items()}
         self.settings = settings
         self.skip_items_without_spec = settings.getbool('SKIP_ITEMS_WITHOUT_SPEC')
         self.skip_stats_without_spec = settings.getbool('SKIP_STATS_WITHOUT_SPEC')
         self.empty_is_missing = settings.getbool('EMPTY_IS_MISSING')
+        self.max_value_length = settings.getint('MAX_VALUE_LENGTH')
+        self.failure_top_size = settings.getint('FAILURE_TOP_SIZE')
+        self.failure_examples_size = settings.getint('FAILURE_EXAMPLES_SIZE')
+        self.batch_size = settings.getint('VALIDATION_BATCH_SIZE')
+        # sampling mode: only a sample of items is validated and coverage is estimated
+        self.sample_rate = settings.getfloat('VALIDATION_SAMPLE_RATE')
+        self.sample_size = settings.getint('VALIDATION_SAMPLE_SIZE')
+        # without a seed one is picked per validator, so validate_items and validate_coverage sample the same items
+        self.sample_seed = settings.get('VALIDATION_SAMPLE_SEED')
+        if self.sample_seed is None:
+            self.sample_seed = random.randrange(2 ** 32)
+        self.sampling = self.sample_size > 0 or self.sample_rate < 1
+        self.coverage_confidence = settings.getfloat('COVERAGE_CONFIDENCE')
+        # pure testers are wrapped with result caches, shared by every field that uses the same tester
+        self.tester_cache_size = settings.getint('TESTER_CACHE_SIZE')
+        self.memoized = {}
+        if self.tester_cache_size:
+            for plan in self.item_plans.values():
+                for field in [*plan.fields.values(), plan.default]:
+                    field.testers = tuple(self._memoize(tester) for tester in field.testers)
+        # testers are wrapped with profilers only when profiling, so it costs nothing otherwise
+        self.profiler = None
+        if settings.getbool('VALIDATION_PROFILE'):
+            self.profiler = enable_profiler()
+            self._profile_testers()
+        self.cache = None
+        if settings.getbool('VALIDATION_CACHE_ENABLED'):
+            self.cache = ValidationCache(data_path(settings['VALIDATION_CACHE_PATH']),
+                                         max_size=settings.getint('VALIDATION_CACHE_SIZE'))
+        self._fingerprints = {}
 
     @classmethod
     def from_settings(cls, settings=None):
@@ -44,6 +165,9 @@ class Validator:
         return cls(specs=specs, settings=settings)
 
     def validate_items(self, items):
+        sampler = self.sampler()
+        if sampler is not None:
+            items = sampler.sample(items)
         for item in items:
             for msg in self.validate_item(item):
                 yield msg
@@ -62,52 +186,57 @@ class Validator:
                 messages.append(f'{obj_name(stat_spec)}: {msg}')
         return messages
 
-    def _field_is_missing(self, value):
-        if not self.empty_is_missing:
-            return False
-        return is_empty(value)
+    def failure_aggregator(self) -> FailureAggregator:
+        """
+        Create empty failure aggregator that follows this validator's settings
+        """
+        return FailureAggregator(top_size=self.failure_top_size, examples_size=self.failure_examples_size)
 
-    def count_fields(self, items: List[Item]) -> Dict[Type, Counter]:
+    def coverage_counter(self) -> 'CoverageCounter':
         """
-        Counts all field in list of items
+        Create empty field coverage counter that follows this validator's settings
         """
-        all_counter = defaultdict(Counter)
+        return CoverageCounter(empty_is_missing=self.empty_is_missing)
 
-        def _count_item(item):
-            # check for nested items
-            counter = defaultdict(Counter)
-            for value in item.values():
-                # deal with nested item
-                if isinstance(value, Item):
-                    counter = join_counter_dicts(counter, _count_item(value))
-                    continue
-                # deal with list of nested items
-                if isinstance(value, list):
-                    for v in value:
-                        if isinstance(v, Item):
-                            counter = join_counter_dicts(counter, _count_item(v))
-            counter[type(item)][self._count_key] += 1
-            for key in type(item).fields.keys():
-                if key in item and not self._field_is_missing(item[key]):
-                    counter[type(item)][key] += 1
-                else:
-                    counter[type(item)][key] = 0
-            return counter
+    def sampler(self) -> Optional[Sampler]:
+        """
+        Create item sampler that follows this validator's settings, None when every item is validated
+        """
+        if not self.sampling:
+            return None
+        return Sampler(rate=self.sample_rate, size=self.sample_size, seed=self.sample_seed)
 
+    @profiled('count_fields')
+    def count_fields(self, items: List[Item]) -> Dict[Type, Counter]:
+        """
+        Counts all field in list of items
+        """
+        coverage = self.coverage_counter()
         for item in items:
-            for item_cls, count in _count_item(item).items():
-                all_counter[item_cls] += count
-                # also preserve 0 counts
-                for k, v in count.items():
-                    if v == 0 and k not in all_counter[item_cls]:
-                        all_counter[item_cls][k] = 0
-        return all_counter
+            coverage.add(item)
+        return coverage.as_counters(count_key=self._count_key)
 
+    @profiled('validate_coverage')
     def validate_coverage(self, items) -> List[str]:
+        sampler = self.sampler()
+        if sampler is not None:
+            items = sampler.sample(items)
+        coverage = self.coverage_counter()
+        for item in items:
+            coverage.add(item)
+        return self.validate_counts(coverage)
+
+    @profiled('validate_counts')
+    def validate_counts(self, coverage: 'CoverageCounter') -> List[str]:
+        """
+        Validate coverage of already counted fields, see CoverageCounter.
+        In sampling mode coverage counts are estimates and only fields whose coverage
+        confidence interval lies below expected coverage fail.
+        """
         messages = []
         if not self.item_specs:
             return messages
-        for item_cls, counter in self.count_fields(items).items():
+        for item_cls in coverage:
             try:
                 spec = self.item_specs[item_cls]
             except KeyError as e:
@@ -116,50 +245,377 @@ class Validator:
                 else:
                     messages.append(f'Missing specification for {item_cls}')
                     continue
-            total_items = counter[self._count_key]
-            counter.pop(self._count_key)
-            for field, count in counter.most_common():
+            total_items = coverage.total(item_cls)
+            for field, count in coverage.most_common(item_cls):
                 expected = spec.coverage.get(field, spec.default_cov)
                 perc = count * 100 / total_items
-                if perc < expected:
+                if self.sampling:
+                    low, high = wilson_interval(count, total_items, self.coverage_confidence)
+                    if high * 100 < expected:
+                        messages.append(f'insufficient coverage: {item_cls.__name__}.{field}: '
+                                        f'{perc:.2f}% ({low * 100:.2f}-{high * 100:.2f}%)/{expected}% '
+                                        f'[{count}/{total_items} sampled]')
+                elif perc < expected:
                     messages.append(f'insufficient coverage: {item_cls.__name__}.{field}: '
                                     f'{perc:.2f}%/{expected}% [{count}/{total_items}]')
         return messages
 
+    def format_message(self, msg) -> str:
+        """format message or Failure record for reporting"""
+        if isinstance(msg, Failure):
+            return msg.format(self.max_value_length)
+        return msg
+
+    def _memoize(self, tester):
+        if not is_pure(tester):
+            return tester
+        try:
+            return self.memoized[id(tester)]
+        except KeyError:
+            memoized = self.memoized[id(tester)] = Memoize(tester, self.tester_cache_size)
+            return memoized
+
+    def _profile_testers(self):
+        for plan in self.item_plans.values():
+            for name, field in [*plan.fields.items(), ('*', plan.default)]:
+                field.testers = tuple(
+                    ProfiledTester(tester, ('tester', plan.name, name, get_tester_name(tester)), self.profiler)
+                    for tester in field.testers
+                )
+        profiled_specs = set()
+        for specs in self.stat_specs.values():
+            for spec in specs:
+                if id(spec) in profiled_specs:
+                    continue
+                profiled_specs.add(id(spec))
+                spec_name = type(spec).__name__
+                spec.validate = {
+                    pattern: ProfiledTester(test, ('stats', spec_name, pattern, get_tester_name(test)), self.profiler)
+                    for pattern, test in spec.validate.items()
+                }
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+    def _fingerprint(self, item_cls) -> str:
+        """fingerprint of everything that affects validation of item_cls, see ValidationCache"""
+        try:
+            return self._fingerprints[item_cls]
+        except KeyError:
+            plan = self.item_plans.get(item_cls)
+            if plan is None:
+                fingerprint = f'{item_cls.__module__}.{item_cls.__qualname__}:{self.skip_items_without_spec}'
+            else:
+                fingerprint = plan_fingerprint(plan, self.empty_is_missing)
+            self._fingerprints[item_cls] = fingerprint
+            return fingerprint
+
     def validate_item(self, item: Item) -> List:
         """
-        Validate item.
+        Validate item, results are served from validation cache when it's enabled
         :param item: Srapy.Item object
-        :return: list of messages if any failures are encountered
+        :return: list of messages or Failure records if any failures are encountered
         """
-        messages = []
-        try:
-            spec = self.item_specs[type(item)]
-        except KeyError as e:
+        if self.cache is None:
+            return self._validate_item(item)
+        key = self._cache_key(item)
+        messages = self.cache.get(key) if key else None
+        if messages is None:
+            messages = self._validate_item(item)
+            if key:
+                self.cache.set(key, messages)
+        return messages
+
+    def _cache_key(self, item) -> Optional[str]:
+        """cache key of item, None when item can't be cached"""
+        if not isinstance(item, Item):
+            return None
+        digest, item_classes = content_hash(item)
+        if digest is None:
+            return None
+        fingerprints = sorted(self._fingerprint(item_cls) for item_cls in item_classes)
+        return ':'.join([digest, *fingerprints])
+
+    def validate_batch(self, items: List[Item]) -> List[List]:
+        """
+        Validate items column by column: values of every field are collected across all items
+        and every tester tests the whole column at once, see `run_batch`.
+        :return: list of messages for every item, the same as validate_item returns
+        """
+        if self.cache is None:
+            return self._validate_batch(items)
+        results = [None] * len(items)
+        keys = [self._cache_key(item) for item in items]
+        missed = []
+        for i, key in enumerate(keys):
+            if key:
+                results[i] = self.cache.get(key)
+            if results[i] is None:
+                missed.append(i)
+        for i, messages in zip(missed, self._validate_batch([items[i] for i in missed])):
+            results[i] = messages
+            if keys[i]:
+                self.cache.set(keys[i], messages)
+        return results
+
+    def _validate_batch(self, items: List[Item]) -> List[List]:
+        # messages are collected with (field position, nested or tester, tester position) sort keys
+        # so they come out in the same order as from validate_item
+        slots = defaultdict(list)
+        # plan: {field: [(item index, field position, value)]}
+        columns = {}
+        nested_owners, nested_items = [], []
+        item_plans, empty_is_missing = self.item_plans, self.empty_is_missing
+        for i, item in enumerate(items):
+            plan = item_plans.get(type(item))
+            if plan is None:
+                for msg in self._validate_item(item):
+                    slots[i].append(((0, 0, 0), msg))
+                continue
+            fields, default = plan.fields, plan.default
+            plan_columns = columns.get(plan)
+            if plan_columns is None:
+                plan_columns = columns[plan] = {}
+            for position, (key, value) in enumerate(item._values.items()):
+                field = fields.get(key, default)
+                if field.skip and not isinstance(value, (list, Item)):
+                    continue
+                if empty_is_missing and is_empty(value):
+                    continue
+                if isinstance(value, Item):
+                    nested_owners.append((i, position))
+                    nested_items.append(value)
+                    continue
+                if isinstance(value, list):
+                    for v in value:
+                        if isinstance(v, Item):
+                            nested_owners.append((i, position))
+                            nested_items.append(v)
+                if field.testers:
+                    column = plan_columns.get(key)
+                    if column is None:
+                        column = plan_columns[key] = []
+                    column.append((i, position, value))
+
+        if nested_items:
+            for (i, position), messages in zip(nested_owners, self._validate_batch(nested_items)):
+                for msg in messages:
+                    slots[i].append(((position, 0, 0), msg))
+        for plan, plan_columns in columns.items():
+            for key, column in plan_columns.items():
+                field = plan.fields.get(key, plan.default)
+                indexes, positions, values = zip(*column)
+                for t, func in enumerate(field.testers):
+                    for j, msg in run_batch(func, values):
+                        if not isinstance(msg, Failure):
+                            msg = Failure.from_message(func, msg)
+                        slots[indexes[j]].append(((positions[j], 1, t), msg.bind(plan.item_cls, key)))
+
+        results = [[] for _ in items]
+        for i, item_slots in slots.items():
+            item_slots.sort(key=itemgetter(0))
+            results[i] = [msg for _, msg in item_slots]
+        return results
+
+    def _validate_item(self, item: Item) -> List:
+        plan = self.item_plans.get(type(item))
+        if plan is None:
             if self.skip_items_without_spec or isinstance(item, dict):
-                return messages
+                return []
             else:
                 return [f'Missing specification for {type(item)}']
-        for key, value in item.items():
-            if self._field_is_missing(value):
+        messages = []
+        empty_is_missing = self.empty_is_missing
+        fields, default = plan.fields, plan.default
+        for key, value in item._values.items():
+            field = fields.get(key, default)
+            if field.skip and not isinstance(value, (list, Item)):
+                continue
+            if empty_is_missing and is_empty(value):
                 continue
             # deal with nested item
             if isinstance(value, Item):
-                messages.extend(self.validate_item(value))
+                messages.extend(self._validate_item(value))
                 continue
             # deal with list of nested items
             if isinstance(value, list):
                 for v in value:
                     if isinstance(v, Item):
-                        messages.extend(self.validate_item(v))
-            test_func = spec.tests.get(key, spec.default_test)
-            for msg in test_func(value):
-                if not msg:
-                    continue
-                messages.append(f'{obj_name(item)}.{key}: {msg}')
+                        messages.extend(self._validate_item(v))
+            for func in field.testers:
+                for msg in run_tester(func, value):
+                    if not msg:
+                        continue
+                    if not isinstance(msg, Failure):
+                        msg = Failure.from_message(func, msg)
+                    messages.append(msg.bind(plan.item_cls, key))
         return messages
 
 
+class ItemStream:
+    """
+    Validates items of a single spider as they are scraped.
+    Only grouped failures (see FailureAggregator) and field counts are kept in memory,
+    items themselves are kept only if `keep_items` is set.
+    With `batch_size` items are validated in batches (see Validator.validate_batch)
+    so results of the last batch are available only after `close()`.
+    In validator's sampling mode only sampled items are validated, see scrapytest.sampling.
+    """
+
+    def __init__(self, validator: Validator, keep_items=False, spider=None, batch_size=1):
+        self.validator = validator
+        self.spider = spider
+        self.failures = validator.failure_aggregator()
+        self.failed = 0
+        self.validated = 0
+        self.coverage = validator.coverage_counter()
+        self.items = [] if keep_items else None
+        self.batch_size = batch_size
+        self.batch = []
+        self.sampler = validator.sampler()
+
+    def feed(self, item: Item):
+        if self.items is not None:
+            self.items.append(item)
+        if self.sampler is None:
+            self._validate(item)
+            return
+        for sampled in self.sampler.feed(item):
+            self._validate(sampled)
+
+    def _validate(self, item: Item):
+        if self.batch_size > 1:
+            self.batch.append(item)
+            if len(self.batch) >= self.batch_size:
+                self._validate_batch()
+            return
+        self._add_messages(self.validator.validate_item(item))
+        self.coverage.add(item)
+        self.validated += 1
+
+    def _add_messages(self, messages):
+        for msg in messages:
+            self.failures.add(msg, self.spider)
+            self.failed += 1
+
+    def _validate_batch(self):
+        for messages in self.validator.validate_batch(self.batch):
+            self._add_messages(messages)
+        for item in self.batch:
+            self.coverage.add(item)
+        self.validated += len(self.batch)
+        self.batch = []
+
+    def close(self):
+        """finish validation of items that were fed in"""
+        if self.sampler is not None:
+            for item in self.sampler.drain():
+                self._validate(item)
+        self._flush()
+
+    def _flush(self):
+        if self.batch:
+            self._validate_batch()
+
+    def report(self) -> Iterator[Tuple[str, int]]:
+        """(message, count) pairs of formatted item failures"""
+        return self.failures.report(self.spider, format=self.validator.format_message)
+
+    def validate_coverage(self) -> List[str]:
+        return self.validator.validate_counts(self.coverage)
+
+
+class FailureBudget:
+    """
+    Fail-fast limits of a single spider that are checked while it's items are validated:
+    spider is over budget once it has more item failures than `max_failures` or,
+    with `check_coverage`, as soon as coverage floor of any field can't be reached anymore.
+    :param max_items: upper bound of spider's items (e.g. CLOSESPIDER_ITEMCOUNT), None if unbounded
+    """
+    FAILURES_REASON = 'failure_budget'
+    COVERAGE_REASON = 'coverage_unreachable'
+
+    def __init__(self, validator: Validator, max_failures=None, check_coverage=False, max_items=None):
+        self.validator = validator
+        self.max_failures = max_failures
+        self.check_coverage = check_coverage
+        self.max_items = max_items
+        self.items = Counter()
+        self._checked = -1
+        self._floors = {}
+
+    @classmethod
+    def from_settings(cls, validator: Validator, settings: Settings, spider_cls) -> Optional['FailureBudget']:
+        """budget of spider_cls, None if spider has no limits"""
+        max_failures = settings.getdict('FAILURE_BUDGETS').get(spider_cls.name)
+        if max_failures is None:
+            spec_budgets = [spec.failure_budget for spec in validator.stat_specs.get(spider_cls, [])
+                            if spec.failure_budget is not None]
+            max_failures = min(spec_budgets) if spec_budgets else settings.get('FAILURE_BUDGET')
+        check_coverage = settings.getbool('COVERAGE_FAIL_FAST')
+        if max_failures is None and not check_coverage:
+            return None
+        max_items = settings.getint('CLOSESPIDER_ITEMCOUNT') or None
+        return cls(validator, max_failures=None if max_failures is None else int(max_failures),
+                   check_coverage=check_coverage, max_items=max_items)
+
+    def add(self, item: Item):
+        """count scraped item, nested items are not counted"""
+        self.items[type(item)] += 1
+
+    def check(self, stream: ItemStream) -> Optional[Tuple[str, str]]:
+        """(close reason, message) if spider of stream is over budget, None otherwise"""
+        if stream.validated == self._checked:
+            return None
+        self._checked = stream.validated
+        if self.max_failures is not None and stream.failed > self.max_failures:
+            return self.FAILURES_REASON, (f'item failure budget exceeded: {stream.failed} failures, '
+                                          f'budget is {self.max_failures}')
+        if self.check_coverage:
+            msg = self._check_coverage(stream.coverage)
+            if msg:
+                return self.COVERAGE_REASON, msg
+        return None
+
+    def _get_floors(self, item_cls) -> List[Tuple[int, float]]:
+        """(field position, expected coverage) pairs of item_cls fields that have coverage floor"""
+        try:
+            return self._floors[item_cls]
+        except KeyError:
+            spec = self.validator.item_specs.get(item_cls)
+            floors = []
+            if spec is not None:
+                for i, field in enumerate(item_cls.fields, 1):
+                    expected = spec.coverage.get(field, spec.default_cov)
+                    if expected:
+                        floors.append((i, expected))
+            self._floors[item_cls] = floors
+            return floors
+
+    def _check_coverage(self, coverage: CoverageCounter) -> Optional[str]:
+        for item_cls, counts in coverage.counts.items():
+            floors = self._get_floors(item_cls)
+            if not floors:
+                continue
+            total = counts[0]
+            # only top level items are bounded, nested ones can keep coming in any amount
+            remaining = None
+            if self.max_items and self.items[item_cls] == total:
+                remaining = max(self.max_items - sum(self.items.values()), 0)
+            for i, expected in floors:
+                count = counts[i]
+                if remaining is None:
+                    reachable = expected < 100 or count == total
+                else:
+                    reachable = (count + remaining) * 100 / (total + remaining) >= expected
+                if not reachable:
+                    field = coverage.fields[item_cls][i - 1]
+                    return (f'coverage floor unreachable: {item_cls.__name__}.{field}: '
+                            f'{count * 100 / total:.2f}%/{expected}% [{count}/{total}]')
+        return None
+
+
 def obj_name(obj):
     try:
         # function
@@ -0,0 +1,72 @@
+import pickle
+
+from scrapy import Item, Field
+
+from scrapytest.aggregate import FailureAggregator
+from scrapytest.tests import Match, LessThan
+
+
+class PostItem(Item):
+    title = Field()
+    points = Field()
+
+
+def test_FailureAggregator():
+    title_test = Match('.{5,}')
+    points_test = LessThan(10)
+    aggregator = FailureAggregator(top_size=2, examples_size=2)
+    for title in ['a', 'b', 'a', 'a']:
+        aggregator.add(title_test(title).bind(PostItem, 'title'), spider='spider1')
+    aggregator.add(points_test(11).bind(PostItem, 'points'), spider='spider1')
+    aggregator.add(points_test(11).bind(PostItem, 'points'), spider='spider2')
+    aggregator.add('Missing specification for dict', spider='spider2')
+    assert len(aggregator) == 7
+    assert list(aggregator.report('spider1')) == [
+        ('PostItem.title: "a" does not match pattern ".{5,}"', 3),
+        ('PostItem.title: "b" does not match pattern ".{5,}"', 1),
+        ('PostItem.points: 11 !< 10', 1),
+    ]
+    assert list(aggregator.report('spider2')) == [
+        ('PostItem.points: 11 !< 10', 1),
+        ('Missing specification for dict', 1),
+    ]
+    # groups are bounded by top_size while frequent failures are still counted exactly
+    for i in range(1000):
+        aggregator.add(title_test(str(i)).bind(PostItem, 'title'), spider='spider1')
+        aggregator.add(title_test('a').bind(PostItem, 'title'), spider='spider1')
+    group = aggregator.groups['spider1', PostItem, 'title', 'Match(.{5,})']
+    assert group.count == 2004
+    assert len(group.top) == 2
+    assert len(group.examples) == 2
+    report = list(aggregator.report('spider1', format=lambda f: f.format(max_length=3)))
+    assert report[0] == ('PostItem.title: "a" does not match pattern ".{5,}"', 1003)
+    # counts that are mostly overestimation are summarized with evicted failures
+    assert report[1][0].startswith('PostItem.title: Match(.{5,}) failed 1001 more times\n    e.g. PostItem.title: ')
+    assert report[2] == ('PostItem.points: 11 !< 10', 1)
+    assert len(report) == 3
+
+
+def test_FailureAggregator_approximate_counts():
+    title_test = Match('.{5,}')
+    aggregator = FailureAggregator(top_size=2, examples_size=1)
+    for title in ['a', 'a', 'b', 'c', 'c', 'c', 'c']:
+        aggregator.add(title_test(title).bind(PostItem, 'title'), spider='spider')
+    # "c" replaced "b" and inherited it's count of 1 as overestimation
+    assert list(aggregator.report('spider'))[:2] == [
+        ('PostItem.title: "a" does not match pattern ".{5,}"', 2),
+        ('PostItem.title: "c" does not match pattern ".{5,}" [at least x4]', 1),
+    ]
+    assert list(aggregator.report('spider'))[2][0].startswith('PostItem.title: Match(.{5,}) failed 1 more times')
+
+
+def test_FailureAggregator_merge():
+    points_test = LessThan(10)
+    first, second = FailureAggregator(), FailureAggregator()
+    first.add(points_test(11).bind(PostItem, 'points'), spider='spider')
+    second.add(points_test(11).bind(PostItem, 'points'), spider='spider')
+    second.add(points_test(12).bind(PostItem, 'points'), spider='spider')
+    second = pickle.loads(pickle.dumps(second))
+    assert list(first.merge(second).report('spider')) == [
+        ('PostItem.points: 11 !< 10', 2),
+        ('PostItem.points: 12 !< 10', 1),
+    ]
@@ -0,0 +1,130 @@
+from scrapy import Item, Field
+from scrapy.settings import Settings
+
+from scrapytest import default_settings
+from scrapytest.cache import ValidationCache, plan_fingerprint, content_hash
+from scrapytest.spec import ItemSpec
+from scrapytest.tests import Match, LessThan, Type
+from scrapytest.validate import Validator
+
+
+class CommentItem(Item):
+    text = Field()
+
+
+class PostItem(Item):
+    title = Field()
+    points = Field()
+    comments = Field()
+
+
+class PostSpec(ItemSpec):
+    item_cls = PostItem
+    title_test = Match('.{5,}')
+    points_test = LessThan(10)
+
+
+class CommentSpec(ItemSpec):
+    item_cls = CommentItem
+    text_test = Match('.{3,}')
+
+
+def test_ValidationCache(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = ValidationCache(path, max_size=2, commit_every=2)
+    assert cache.get('a') is None
+    cache.set('a', ['foo'])
+    cache.set('b', [])
+    assert cache.get('a') == ['foo']
+    assert cache.get('b') == []
+    assert (cache.hits, cache.misses) == (2, 1)
+    # least recently used entry is evicted
+    cache.get('a')
+    cache.set('c', ['bar'])
+    cache.close()
+    cache = ValidationCache(path, max_size=2)
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == ['foo']
+    assert cache.get('c') == ['bar']
+    cache.close()
+
+
+def test_plan_fingerprint():
+    fingerprint = plan_fingerprint(PostSpec().compile())
+    assert fingerprint == plan_fingerprint(PostSpec().compile())
+
+    class ChangedSpec(PostSpec):
+        points_test = LessThan(20)
+
+    assert fingerprint != plan_fingerprint(ChangedSpec().compile())
+    assert fingerprint != plan_fingerprint(PostSpec().compile(), 'setting')
+
+
+def test_content_hash():
+    digest, item_classes = content_hash(PostItem(title='foo', comments=[CommentItem(text='bar')]))
+    assert item_classes == {PostItem, CommentItem}
+    assert digest == content_hash(PostItem(comments=[CommentItem(text='bar')], title='foo'))[0]
+    assert digest != content_hash(PostItem(title='foo', comments=[CommentItem(text='baz')]))[0]
+    # values of different types never hash the same
+    assert content_hash(PostItem(title=[1, 2]))[0] != content_hash(PostItem(title=(1, 2)))[0]
+    assert content_hash(PostItem(title={1: 'a'}))[0] != content_hash(PostItem(title={'1': 'a'}))[0]
+    assert content_hash(PostItem(title=1))[0] != content_hash(PostItem(title=True))[0]
+    assert content_hash(PostItem(title={2: 'b', 1: 'a'}))[0] == content_hash(PostItem(title={1: 'a', 2: 'b'}))[0]
+    # values without exact canonical form can't be cached
+    assert content_hash(PostItem(title=object())) == (None, {PostItem})
+
+
+def _validator(path, *specs):
+    settings = Settings()
+    settings.setmodule(default_settings)
+    settings['VALIDATION_CACHE_ENABLED'] = True
+    settings['VALIDATION_CACHE_PATH'] = path
+    return Validator([spec() for spec in specs], settings)
+
+
+def test_Validator_cache(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    items = [
+        PostItem(title='bad', points=11, comments=[CommentItem(text='no')]),
+        PostItem(title='long title', points=1),
+    ]
+    validator = _validator(path, PostSpec, CommentSpec)
+    expected = list(validator.validate_items(items))
+    assert [str(msg) for msg in expected] == [
+        'PostItem.title: "bad" does not match pattern ".{5,}"',
+        'PostItem.points: 11 !< 10',
+        'CommentItem.text: "no" does not match pattern ".{3,}"',
+    ]
+    validator.close()
+
+    validator = _validator(path, PostSpec, CommentSpec)
+    assert list(validator.validate_items(items)) == expected
+    assert (validator.cache.hits, validator.cache.misses) == (2, 0)
+    validator.close()
+
+    # only items that contain item class with changed spec are validated again
+    class ChangedCommentSpec(CommentSpec):
+        text_test = Match('.{2,}')
+
+    validator = _validator(path, PostSpec, ChangedCommentSpec)
+    assert [str(msg) for msg in validator.validate_items(items)] == expected[:2]
+    assert (validator.cache.hits, validator.cache.misses) == (1, 1)
+    validator.close()
+
+
+def test_Validator_cache_types(tmp_path):
+    path = str(tmp_path / 'cache.db')
+
+    class TypedSpec(PostSpec):
+        title_test = Type(list)
+
+    validator = _validator(path, TypedSpec, CommentSpec)
+    assert validator.validate_item(PostItem(title=[1, 2])) == []
+    # tuple doesn't get list's cached result
+    assert [str(msg) for msg in validator.validate_item(PostItem(title=(1, 2)))] == [
+        "PostItem.title: (1, 2) is unexpected type <class 'tuple'>, expected <class 'list'>"]
+    # items with values that have no canonical form are validated but not cached
+    assert validator.validate_batch([PostItem(title=object())])[0]
+    assert len(validator.cache) == 2
+    validator.close()
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import pytest
+from scrapy import Item, Field
+
+from scrapytest.feed import FeedWriter, read_feed, append_feed, get_compression, ItemBuilder
+from scrapytest.spec import ItemSpec
+from scrapytest.tests import Type
+
+
+class CommentItem(Item):
+    text = Field()
+
+
+class PostItem(Item):
+    title = Field()
+    comments = Field()
+    meta = Field()
+
+
+def _write_feed(path, **kwargs):
+    with FeedWriter(str(path), **kwargs) as feed:
+        feed.write_item('spider1', PostItem(title='foo', comments=[CommentItem(text='bar')]))
+        feed.write_item('spider1', PostItem(title='baz'))
+        feed.write_stats({'spider1': {'start_time': datetime(2020, 1, 1), 'item_scraped_count': 2}})
+
+
+EXPECTED = [
+    {'spider': 'spider1', 'item_cls': 'PostItem', 'item': {'title': 'foo', 'comments': [{'text': 'bar'}]}},
+    {'spider': 'spider1', 'item_cls': 'PostItem', 'item': {'title': 'baz'}},
+    {'stats': {'spider1': {'start_time': '2020-01-01T00:00:00', 'item_scraped_count': 2}}},
+]
+
+
+@pytest.mark.parametrize('name', ['items.jl', 'items.jl.gz'])
+def test_FeedWriter(tmp_path, name):
+    path = tmp_path / name
+    _write_feed(path)
+    assert list(read_feed(str(path))) == EXPECTED
+
+
+def test_FeedWriter_chunks(tmp_path):
+    path = tmp_path / 'items.jl'
+    feed = FeedWriter(str(path), chunk_size=100)
+    feed.write_item('spider1', PostItem(title='foo'))
+    # first record fits into a single chunk and is not flushed yet
+    assert path.read_bytes() == b''
+    feed.write_item('spider1', PostItem(title='a' * 100))
+    assert path.read_bytes().count(b'\n') == 2
+    feed.close()
+
+
+def test_FeedWriter_zstd(tmp_path):
+    pytest.importorskip('zstandard')
+    path = tmp_path / 'items.jl.zst'
+    _write_feed(path)
+    assert list(read_feed(str(path))) == EXPECTED
+
+
+@pytest.mark.parametrize('name', ['items.jl', 'items.jl.gz'])
+def test_append_feed(tmp_path, name):
+    path = str(tmp_path / name)
+    part = str(tmp_path / 'spider1.part')
+    with FeedWriter(path) as feed:
+        feed.write_item('spider2', PostItem(title='qux'))
+    _write_feed(part, compression=get_compression(path))
+    append_feed(path, part)
+    assert list(read_feed(path)) == [
+        {'spider': 'spider2', 'item_cls': 'PostItem', 'item': {'title': 'qux'}},
+        *EXPECTED,
+    ]
+
+
+def test_ItemBuilder():
+    builder = ItemBuilder([PostItem, CommentItem])
+    item = builder.build(EXPECTED[0])
+    assert type(item) is PostItem
+    assert type(item['comments'][0]) is CommentItem
+    assert item == PostItem(title='foo', comments=[CommentItem(text='bar')])
+    # records of plain feeds are matched by their keys
+    assert type(builder.build({'text': 'bar'})) is CommentItem
+    assert type(builder.build({'title': 'foo'})) is PostItem
+    # fields that item class doesn't have are skipped
+    assert builder.build({'spider': 'spider1', 'item_cls': 'PostItem', 'item': {'old': 1}}) == PostItem()
+    # unknown item classes are created on the fly
+    item = builder.build({'spider': 'spider1', 'item_cls': 'UserItem', 'item': {'name': 'bob'}})
+    assert type(item).__name__ == 'UserItem'
+    assert dict(item) == {'name': 'bob'}
+    assert type(builder.build({'spider': 'spider1', 'item_cls': 'UserItem', 'item': {}})) is type(item)
+
+
+def test_ItemBuilder_plain_dicts():
+    builder = ItemBuilder([PostItem, CommentItem])
+    # empty dictionaries don't match any item class
+    item = builder.build({'spider': 'spider1', 'item_cls': 'PostItem', 'item': {'title': 'foo', 'meta': {}}})
+    assert item['meta'] == {} and type(item['meta']) is dict
+
+    class PostSpec(ItemSpec):
+        item_cls = PostItem
+        meta_test = Type(dict)
+
+    # dictionaries are only rebuilt in fields that can hold items
+    builder = ItemBuilder([PostItem, CommentItem], {PostItem: PostSpec().compile()})
+    item = builder.build({'spider': 'spider1', 'item_cls': 'PostItem',
+                          'item': {'meta': {'text': 'bar'}, 'comments': [{'text': 'bar'}]}})
+    assert type(item['meta']) is dict
+    assert type(item['comments'][0]) is CommentItem
+    # nor in item classes without a plan
+    item = builder.build({'spider': 'spider1', 'item_cls': 'CommentItem', 'item': {'text': {'title': 'foo'}}})
+    assert type(item['text']) is dict
@@ -0,0 +1,107 @@
+from scrapy import Request, Spider
+from scrapy.http import HtmlResponse, TextResponse
+from scrapy.settings import Settings
+from scrapy.utils.test import get_crawler
+
+from scrapytest import default_settings
+from scrapytest.exceptions import MissingFixtureError
+from scrapytest.fixtures import FixtureDownloadHandler, FixtureStore, configure_fixtures, fixture_path, \
+    get_fingerprinter
+
+
+def test_FixtureStore(tmp_path):
+    path = str(tmp_path / 'fixtures' / 'spider.db')
+    request = Request('http://example.com/post/1')
+    response = HtmlResponse('http://example.com/post/1', status=200, body=b'<p>post</p>',
+                            headers={'Content-Type': 'text/html', 'Set-Cookie': ['a=1', 'b=2']})
+    with FixtureStore(path) as store:
+        store.save('1', request, response)
+    with FixtureStore(path) as store:
+        assert len(store) == 1
+        assert store.load('2', request) is None
+        replayed = store.load('1', request)
+    assert isinstance(replayed, TextResponse)
+    assert replayed.url == response.url
+    assert replayed.status == 200
+    assert replayed.body == b'<p>post</p>'
+    assert replayed.headers.getlist('Set-Cookie') == [b'a=1', b'b=2']
+    assert replayed.request is request
+    assert 'fixture' in replayed.flags
+
+
+def test_configure_fixtures():
+    settings = Settings()
+    settings.setmodule(default_settings)
+    settings['DOWNLOAD_DELAY'] = 5
+    settings['CONCURRENT_REQUESTS'] = 32
+    configure_fixtures(settings)
+    assert settings.getfloat('DOWNLOAD_DELAY') == 5
+    assert not settings.getdict('DOWNLOAD_HANDLERS')
+
+    settings['FIXTURES_REPLAY'] = True
+    configure_fixtures(settings)
+    assert settings.getfloat('DOWNLOAD_DELAY') == 0
+    assert settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN') == 32
+    assert settings.getdict('DOWNLOAD_HANDLERS')['https'] == 'scrapytest.fixtures.FixtureDownloadHandler'
+
+    settings['FIXTURES_RECORD'] = True
+    configure_fixtures(settings)
+    assert 'scrapytest.fixtures.FixtureRecorderMiddleware' in settings.getdict('DOWNLOADER_MIDDLEWARES')
+
+
+class FixtureSpider(Spider):
+    name = 'fixtures'
+
+
+class _Engine:
+    """stand-in for crawler's engine that remembers close reasons"""
+
+    def __init__(self):
+        self.closed = []
+
+    def close_spider(self, spider, reason):
+        self.closed.append(reason)
+
+
+def _handler(tmp_path, record=()):
+    crawler = get_crawler(FixtureSpider, {'FIXTURES_DIR': str(tmp_path / 'fixtures')})
+    crawler.engine = _Engine()
+    spider = FixtureSpider()
+    fingerprint = get_fingerprinter(crawler)
+    if record:
+        with FixtureStore(fixture_path(crawler.settings, spider.name)) as store:
+            for request, response in record:
+                store.save(fingerprint(request), request, response)
+    return FixtureDownloadHandler.from_crawler(crawler), crawler, spider
+
+
+def _result(deferred):
+    results = []
+    deferred.addBoth(results.append)
+    return results[0]
+
+
+def test_FixtureDownloadHandler(tmp_path):
+    request = Request('http://example.com/post/1')
+    response = HtmlResponse('http://example.com/post/1', body=b'<p>post</p>', headers={'Content-Type': 'text/html'})
+    handler, crawler, spider = _handler(tmp_path, [(request, response)])
+    replayed = _result(handler.download_request(Request('http://example.com/post/1'), spider))
+    assert replayed.body == b'<p>post</p>'
+    assert 'fixture' in replayed.flags
+    assert crawler.stats.get_value('fixtures/replayed') == 1
+    assert crawler.engine.closed == []
+
+    # requests without fixture fail and close the spider
+    failure = _result(handler.download_request(Request('http://example.com/post/2'), spider))
+    assert failure.check(MissingFixtureError)
+    assert crawler.stats.get_value('fixtures/missing') == 1
+    assert crawler.engine.closed == ['missing_fixture']
+    handler.close()
+
+
+def test_FixtureDownloadHandler_no_archive(tmp_path):
+    handler, crawler, spider = _handler(tmp_path)
+    failure = _result(handler.download_request(Request('http://example.com/post/1'), spider))
+    assert failure.check(MissingFixtureError)
+    assert 'no fixtures recorded for spider fixtures' in str(failure.value)
+    assert crawler.engine.closed == ['missing_fixture']
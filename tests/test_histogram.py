@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from scrapytest.histogram import Histogram
+
+
+def test_Histogram():
+    values = [v / 10_000 for v in range(1, 10_001)]
+    hist = Histogram.from_values(values)
+    assert len(hist) == len(values)
+    assert hist.mean == pytest.approx(sum(values) / len(values))
+    exact = sorted(values)
+    for percentile in (50, 90, 99):
+        assert hist.percentile(percentile) == pytest.approx(exact[int(len(exact) * percentile / 100) - 1], rel=0.01)
+    assert hist.percentile(100) == max(values)
+    assert Histogram().percentile(99) is None
+
+
+def test_Histogram_merge():
+    first = Histogram.from_values([0.001, 0.002])
+    second = Histogram.from_values([0.003])
+    second.add(0.004, count=2)
+    merged = first.merge(second)
+    assert merged.count == 5
+    assert merged.total == pytest.approx(0.014)
+    assert (merged.min, merged.max) == (0.001, 0.004)
+    assert merged.percentile(50) == pytest.approx(0.003, rel=0.01)
+
+
+def test_Histogram_state():
+    hist = Histogram.from_values([0.001, 0.02, 0.3], precision=0.05)
+    state = json.loads(json.dumps(hist.to_state()))
+    restored = Histogram.from_state(state)
+    assert restored.to_dict() == hist.to_dict()
+    assert restored.buckets == hist.buckets
+    assert restored.precision == 0.05
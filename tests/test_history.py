@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+from scrapy import Spider
+
+from scrapytest.history import RunHistory, crawl_metrics, validate_performance
+from scrapytest.spec import PerformanceSpec
+
+
+def test_crawl_metrics():
+    start = datetime(2020, 1, 1)
+    stats = {
+        'start_time': start,
+        'finish_time': start + timedelta(seconds=10),
+        'item_scraped_count': 50,
+        'downloader/request_count': 20,
+        'downloader/response_bytes': 1000,
+        'downloader/exception_count': 2,
+        'finish_reason': 'finished',
+    }
+    metrics = crawl_metrics(stats, {'item': 3, 'stat': 0}, extra_stats=['downloader/exception_count', 'finish_reason'],
+                            memory=100)
+    assert metrics == {
+        'elapsed': 10.0,
+        'items': 50,
+        'items_per_second': 5.0,
+        'requests': 20,
+        'requests_per_second': 2.0,
+        'response_bytes': 1000,
+        'peak_memory': 100,
+        'item_failures': 3,
+        'stat_failures': 0,
+        'downloader/exception_count': 2,
+    }
+    # memory usage extension stats take precedence, scrapy's own elapsed time too
+    metrics = crawl_metrics({**stats, 'memusage/max': 200, 'elapsed_time_seconds': 5}, memory=100)
+    assert (metrics['peak_memory'], metrics['elapsed'], metrics['items_per_second']) == (200, 5, 10.0)
+    assert crawl_metrics({})['items_per_second'] is None
+
+
+def test_RunHistory(tmp_path):
+    with RunHistory(str(tmp_path / 'history' / 'runs.db')) as history:
+        for i, reason in enumerate(['finished', 'finished', 'shutdown', 'finished']):
+            run_id = history.add_run(1000 + i)
+            history.add_spider_run(run_id, 'foo', {'items_per_second': 10 + i}, finish_reason=reason)
+            history.add_spider_run(run_id, 'bar', {'items_per_second': 100})
+        history.add_spider_run(history.add_run(2000, mode='replay'), 'foo', {'items_per_second': 1000},
+                               mode='replay')
+
+        assert [run['items_per_second'] for run in history.spider_runs('foo')] == [13, 11, 10]
+        assert [run['items_per_second'] for run in history.spider_runs('foo', limit=2)] == [13, 11]
+        assert history.baselines('foo', ['items_per_second', 'elapsed']) == {
+            'items_per_second': (11, 3),
+            'elapsed': (None, 0),
+        }
+        assert history.baselines('foo', ['items_per_second'], window=2) == {'items_per_second': (12, 2)}
+        assert history.baselines('foo', ['items_per_second'], mode='replay') == {'items_per_second': (1000, 1)}
+        recent = history.recent('foo', limit=2)
+        assert [(run['mode'], run['finish_reason']) for run in recent] == [('replay', 'finished'), ('live', 'finished')]
+
+
+def test_validate_performance(tmp_path):
+    class TestPerformance(PerformanceSpec):
+        spider_cls = Spider
+        max_drop = {'items_per_second': 20}
+        max_rise = {'elapsed': 50}
+        min_runs = 2
+
+    with RunHistory(str(tmp_path / 'runs.db')) as history:
+        specs = [TestPerformance()]
+        slow = {'items_per_second': 5, 'elapsed': 20}
+        # not enough runs for a baseline yet
+        assert validate_performance(history, 'foo', slow, specs) == []
+        for _ in range(2):
+            history.add_spider_run(history.add_run(1000), 'foo', {'items_per_second': 10, 'elapsed': 10})
+        assert validate_performance(history, 'foo', {'items_per_second': 9, 'elapsed': 14}, specs) == []
+        assert validate_performance(history, 'foo', slow, specs) == [
+            'TestPerformance: items_per_second: 5.00 is 50.0% below baseline 10.00 (max 20%, median of 2 runs)',
+            'TestPerformance: elapsed: 20.00 is 100.0% above baseline 10.00 (max 50%, median of 2 runs)',
+        ]
+        # other spiders and modes have their own baselines
+        assert validate_performance(history, 'bar', slow, specs) == []
+        assert validate_performance(history, 'foo', slow, specs, mode='replay') == []
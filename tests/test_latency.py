@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.exceptions import NotConfigured
+from scrapy.http import TextResponse
+from scrapy.settings import Settings
+from scrapy.utils.test import get_crawler
+
+from scrapytest import default_settings
+from scrapytest.latency import CallbackTimingMiddleware, LatencyStatsExtension, configure_latency_stats
+from scrapytest.tests import PercentileBelow
+
+
+class LatencySpider(Spider):
+    name = 'latency'
+
+    def parse_slow(self, response):
+        time.sleep(0.01)
+        yield {'url': response.url}
+
+
+def _crawler(**settings):
+    return get_crawler(LatencySpider, {'LATENCY_STATS_ENABLED': True, 'LATENCY_STATS_PRECISION': 0.02,
+                                       'LATENCY_STATS_PERCENTILES': [50, 99], **settings})
+
+
+def _response(callback=None, latency=None):
+    request = Request('http://example.com', callback=callback, meta={'download_latency': latency})
+    return TextResponse('http://example.com', body=b'', request=request)
+
+
+def test_configure_latency_stats():
+    settings = Settings()
+    settings.setmodule(default_settings)
+    configure_latency_stats(settings)
+    assert 'scrapytest.latency.LatencyStatsExtension' not in settings.getdict('EXTENSIONS')
+    settings.set('LATENCY_STATS_ENABLED', True)
+    configure_latency_stats(settings)
+    assert 'scrapytest.latency.LatencyStatsExtension' in settings.getdict('EXTENSIONS')
+    assert 'scrapytest.latency.CallbackTimingMiddleware' in settings.getdict('SPIDER_MIDDLEWARES')
+    with pytest.raises(NotConfigured):
+        LatencyStatsExtension.from_crawler(get_crawler(LatencySpider))
+
+
+def test_LatencyStatsExtension():
+    crawler = _crawler()
+    extension = LatencyStatsExtension.from_crawler(crawler)
+    for latency in (0.1, 0.2, 0.3, None):
+        response = _response(latency=latency)
+        extension.response_received(response, response.request)
+    extension.spider_closed()
+    stats = crawler.stats
+    assert stats.get_value('latency/download/count') == 3
+    assert stats.get_value('latency/download/mean') == pytest.approx(0.2)
+    assert stats.get_value('latency/download/max') == 0.3
+    assert stats.get_value('latency/download/p50') == pytest.approx(0.2, rel=0.02)
+    assert 'latency/download/p95' not in stats.get_stats()
+    assert not PercentileBelow(99, 0.5)(stats.get_value('latency/download'))
+    assert PercentileBelow(99, 0.25)(stats.get_value('latency/download'))
+
+
+def test_CallbackTimingMiddleware():
+    crawler = _crawler()
+    middleware = CallbackTimingMiddleware.from_crawler(crawler)
+    spider = LatencySpider()
+    for _ in range(2):
+        response = _response(callback=spider.parse_slow)
+        middleware.process_spider_input(response)
+        output = middleware.process_spider_output(response, spider.parse_slow(response))
+        assert list(output) == [{'url': 'http://example.com'}]
+
+    async def consume():
+        async def callback():
+            await asyncio.sleep(0.01)
+            yield 1
+        response = _response()
+        return [i async for i in middleware.process_spider_output_async(response, callback())]
+
+    assert asyncio.run(consume()) == [1]
+    middleware.spider_closed()
+    stats = crawler.stats
+    assert stats.get_value('latency/callback/parse_slow/count') == 2
+    assert stats.get_value('latency/callback/parse_slow/p50') >= 0.01
+    # requests without callback use spider's parse
+    assert stats.get_value('latency/callback/parse/count') == 1
+    assert stats.get_value('latency/callback/parse/max') >= 0.01
+
+
+def test_CallbackTimingMiddleware_excludes_consumer_time():
+    middleware = CallbackTimingMiddleware.from_crawler(_crawler())
+    response = _response(callback=LatencySpider().parse_slow)
+    for _ in middleware.process_spider_output(response, [1, 2]):
+        time.sleep(0.02)
+    assert middleware.histograms['latency/callback/parse_slow'].max < 0.01
@@ -0,0 +1,79 @@
+from scrapy import Spider
+from scrapy.settings import Settings
+from scrapy.utils.test import get_crawler
+
+from scrapytest import default_settings
+from scrapytest.live import LiveStatsExtension, get_stats_specs
+from scrapytest.spec import PerformanceSpec, StatsSpec
+from scrapytest.tests import LessThan, MoreThan
+
+
+class ProductionSpider(Spider):
+    name = 'production'
+
+
+class LiveSpider(ProductionSpider):
+    name = 'test'
+
+
+class LiveStats(StatsSpec):
+    spider_cls = LiveSpider
+    validate = {
+        'log_count/ERROR$': LessThan(1),
+        'downloader/response_status_count/5\\d\\d': LessThan(3),
+        'item_scraped_count': MoreThan(0),
+    }
+    live = ['log_count/ERROR$', 'downloader/response_status_count/5\\d\\d']
+
+
+def test_StatsSpec_validate_live():
+    spec = LiveStats()
+    stats = {'log_count/ERROR': 1, 'downloader/response_status_count/503': 2, 'item_scraped_count': 0}
+    # only given keys with live patterns are validated
+    assert spec.validate_live(stats, stats) == {'log_count/ERROR': ['log_count/ERROR: 1 !< 1']}
+    assert spec.validate_live(stats, ['item_scraped_count']) == {}
+
+
+def test_get_stats_specs():
+    settings = Settings({'LiveStats': LiveStats})
+    assert [type(spec) for spec in get_stats_specs(settings, LiveSpider)] == [LiveStats]
+    # specs of test spiders don't apply to production spiders they extend
+    assert get_stats_specs(settings, ProductionSpider) == []
+
+    class LivePerformance(PerformanceSpec):
+        spider_cls = LiveSpider
+
+    settings = Settings({'LiveStats': LiveStats, 'LivePerformance': LivePerformance})
+    assert [type(spec) for spec in get_stats_specs(settings, LiveSpider, spec_cls=PerformanceSpec)] == [LivePerformance]
+    assert get_stats_specs(settings, ProductionSpider, spec_cls=PerformanceSpec) == []
+
+
+def _extension(action='warn'):
+    settings = Settings()
+    settings.setmodule(default_settings)
+    settings['LiveStats'] = LiveStats
+    crawler = get_crawler(LiveSpider)
+    extension = LiveStatsExtension(crawler, settings, interval=1, action=action)
+    spider = LiveSpider()
+    extension.specs = get_stats_specs(settings, LiveSpider)
+    return extension, crawler.stats, spider
+
+
+def test_LiveStatsExtension():
+    extension, stats, spider = _extension()
+    stats.set_value('item_scraped_count', 0)
+    stats.set_value('downloader/response_status_count/503', 1)
+    assert extension.changed_keys(stats.get_stats()) == ['item_scraped_count', 'downloader/response_status_count/503']
+    assert extension.changed_keys(stats.get_stats()) == []
+
+    stats.set_value('downloader/response_status_count/503', 5)
+    extension.check(spider)
+    assert stats.get_value('scrapytest/live/failures') == 1
+    # failing stats are reported once
+    stats.set_value('downloader/response_status_count/503', 6)
+    extension.check(spider)
+    assert stats.get_value('scrapytest/live/failures') == 1
+    stats.inc_value('log_count/ERROR')
+    extension.check(spider)
+    assert stats.get_value('scrapytest/live/failures') == 2
+    assert extension.failing == {'log_count/ERROR', 'downloader/response_status_count/503'}
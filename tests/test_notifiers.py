@@ -0,0 +1,165 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scrapytest.exceptions import NotificationError
+from scrapytest.notifiers import ConnectionPool, Dispatcher, SlackNotifier, call_with_retries, post_json
+
+
+class Webhook:
+    """local stand-in for a webhook: answers with queued (status, body, delay) responses, then 200 ok"""
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+        self.connections = 0
+        # close connections after responding without telling the client, like idle keep-alive timeouts do
+        self.drop_connections = False
+        webhook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                webhook.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                webhook.requests.append(json.loads(body))
+                status, text, delay = webhook.responses.pop(0) if webhook.responses else (200, b'ok', 0)
+                time.sleep(delay)
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(text)))
+                self.end_headers()
+                self.wfile.write(text)
+                self.close_connection = webhook.drop_connections
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/hook'
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def webhook():
+    hook = Webhook()
+    yield hook
+    hook.close()
+
+
+def test_post_json_reuses_connections(webhook):
+    pool = ConnectionPool()
+    for i in range(3):
+        resp = post_json(webhook.url, json.dumps({'i': i}), pool=pool)
+        assert (resp.code, resp.read()) == (200, b'ok')
+    assert webhook.requests == [{'i': 0}, {'i': 1}, {'i': 2}]
+    assert webhook.connections == 1
+    pool.close()
+
+
+def test_post_json_stale_connection(webhook):
+    pool = ConnectionPool()
+    webhook.drop_connections = True
+    for i in range(3):
+        assert post_json(webhook.url, json.dumps({'i': i}), pool=pool).code == 200
+    # requests on closed connections are sent again on fresh ones
+    assert webhook.requests == [{'i': 0}, {'i': 1}, {'i': 2}]
+    assert webhook.connections == 3
+    pool.close()
+
+
+def test_post_json_timeout_not_resent(webhook):
+    pool = ConnectionPool()
+    post_json(webhook.url, json.dumps({'i': 0}), pool=pool)
+    webhook.responses = [(200, b'ok', 0.5)]
+    start = time.monotonic()
+    with pytest.raises(OSError):
+        post_json(webhook.url, json.dumps({'i': 1}), timeout=0.1, pool=pool)
+    # request that may have been delivered is not sent again
+    assert time.monotonic() - start < 0.3
+    time.sleep(0.6)
+    assert webhook.requests == [{'i': 0}, {'i': 1}]
+    pool.close()
+
+
+def test_SlackNotifier(webhook):
+    notifier = SlackNotifier(webhook.url, '#cats', maintainer='@bernard', pool=ConnectionPool())
+    notifier.notify(1, 'failed', context='spider')
+    request = webhook.requests[0]
+    assert request['channel'] == '#cats'
+    assert request['text'] == 'Finished tests for "spider" @bernard\n```failed```'
+
+    webhook.responses = [(500, b'oops', 0), (404, b'no_service', 0)]
+    with pytest.raises(NotificationError) as error:
+        notifier.notify(0, 'passed')
+    assert error.value.retryable
+    with pytest.raises(NotificationError) as error:
+        notifier.notify(0, 'passed')
+    assert not error.value.retryable
+
+
+def test_call_with_retries():
+    calls = []
+
+    def flaky(fail_times, retryable=True):
+        calls.append(1)
+        if len(calls) <= fail_times:
+            raise NotificationError('fail', retryable=retryable)
+        return 'sent'
+
+    assert call_with_retries(flaky, 2, retries=2, backoff=0) == 'sent'
+    assert len(calls) == 3
+    calls.clear()
+    with pytest.raises(NotificationError):
+        call_with_retries(flaky, 3, retries=2, backoff=0)
+    assert len(calls) == 3
+    calls.clear()
+    with pytest.raises(NotificationError):
+        call_with_retries(flaky, 1, retryable=False, retries=2, backoff=0)
+    assert len(calls) == 1
+    calls.clear()
+    # retry that would start after deadline is not attempted
+    with pytest.raises(NotificationError):
+        call_with_retries(flaky, 1, retries=2, backoff=10, deadline=time.monotonic() + 1)
+    assert len(calls) == 1
+
+
+def test_Dispatcher(webhook):
+    notifier = SlackNotifier(webhook.url, '#cats', pool=ConnectionPool())
+    webhook.responses = [(503, b'busy', 0)]
+    dispatcher = Dispatcher(timeout=2, retries=1, backoff=0.01, deadline=5)
+    failures = dispatcher.dispatch([('slack', notifier.notify, {'code': 0, 'msg': 'passed'})])
+    assert failures == []
+    assert len(webhook.requests) == 2
+
+
+def test_Dispatcher_concurrent(webhook):
+    webhook.responses = [(200, b'ok', 0.5)] * 3
+    notifiers = [SlackNotifier(webhook.url, f'#{i}', pool=ConnectionPool()) for i in range(3)]
+    dispatcher = Dispatcher(timeout=2, retries=0, deadline=5)
+    start = time.monotonic()
+    failures = dispatcher.dispatch([(str(i), n.notify, {'code': 0, 'msg': 'passed'}) for i, n in enumerate(notifiers)])
+    assert failures == []
+    assert time.monotonic() - start < 1.4
+    assert sorted(r['channel'] for r in webhook.requests) == ['#0', '#1', '#2']
+
+
+def test_Dispatcher_deadline(webhook):
+    webhook.responses = [(200, b'ok', 3)]
+    notifier = SlackNotifier(webhook.url, '#cats', pool=ConnectionPool())
+    dispatcher = Dispatcher(timeout=10, retries=5, backoff=0.01, deadline=0.5)
+    start = time.monotonic()
+    failures = dispatcher.dispatch([('slack', notifier.notify, {'code': 0, 'msg': 'passed'})])
+    assert time.monotonic() - start < 1.5
+    assert [name for name, _ in failures] == ['slack']
@@ -0,0 +1,66 @@
+from scrapy import Item, Field
+from scrapy.settings import Settings
+
+from scrapytest import default_settings
+from scrapytest.parallel import ParallelValidator
+from scrapytest.spec import ItemSpec
+from scrapytest.tests import Match, MoreThan
+from scrapytest.validate import ItemStream
+
+
+class CommentItem(Item):
+    text = Field()
+
+
+class PostItem(Item):
+    title = Field()
+    points = Field()
+    comments = Field()
+
+
+class PostSpec(ItemSpec):
+    item_cls = PostItem
+    title_test = Match('.{5,}')
+    points_test = MoreThan(0)
+    title_cov = 100
+
+
+class CommentSpec(ItemSpec):
+    item_cls = CommentItem
+    text_test = Match('.{3,}')
+
+
+def settings_factory():
+    settings = Settings()
+    settings.setmodule(default_settings)
+    settings.set('PostSpec', PostSpec)
+    settings.set('CommentSpec', CommentSpec)
+    return settings
+
+
+def generate_items(amount):
+    for i in range(amount):
+        yield PostItem(
+            title='title' if i % 3 else f'bad{i % 5}',
+            points=i % 7,
+            comments=[CommentItem(text='no' if j % 2 else f'text {i}') for j in range(i % 3)],
+        )
+
+
+def test_ParallelValidator():
+    items = list(generate_items(100))
+    with ParallelValidator(settings_factory, workers=2, batch_size=7, max_pending=2) as parallel:
+        serial = parallel.validator
+        assert list(parallel.validate_items(items)) == list(serial.validate_items(items))
+
+        stream = parallel.stream(keep_items=True)
+        for item in items:
+            stream.feed(item)
+        stream.close()
+    assert stream.items == items
+    assert stream.failed == len(list(serial.validate_items(items)))
+    serial_stream = ItemStream(serial)
+    for item in items:
+        serial_stream.feed(item)
+    assert list(stream.report()) == list(serial_stream.report())
+    assert stream.validate_coverage() == serial.validate_coverage(items)
@@ -0,0 +1,58 @@
+from scrapy import Spider, Item, Field
+from scrapy.settings import Settings
+from scrapy.utils.test import get_crawler
+
+from scrapytest import default_settings
+from scrapytest.pipeline import ValidationPipeline
+from scrapytest.spec import ItemSpec
+from scrapytest.tests import Match
+from scrapytest.validate import Validator
+
+
+class PostItem(Item):
+    title = Field()
+    url = Field()
+
+
+class PostSpec(ItemSpec):
+    item_cls = PostItem
+    title_test = Match('.{5,}')
+    url_cov = 100
+
+
+def _pipeline(**settings):
+    test_settings = Settings()
+    test_settings.setmodule(default_settings)
+    test_settings.update(settings)
+    crawler = get_crawler(Spider)
+    validator = Validator([PostSpec()], test_settings)
+    pipeline = ValidationPipeline(validator, crawler.stats,
+                                  time_budget=test_settings.getfloat('VALIDATION_TIME_BUDGET'))
+    spider = Spider('spider1')
+    pipeline.open_spider(spider)
+    return pipeline, spider
+
+
+def test_ValidationPipeline():
+    pipeline, spider = _pipeline()
+    items = [PostItem(title='long title', url='http://foo'), PostItem(title='bad'), PostItem(title='no')]
+    for item in items:
+        assert pipeline.process_item(item, spider) is item
+    stats = pipeline.stats
+    assert stats.get_value('scrapytest/failures') == 2
+    assert stats.get_value('scrapytest/failures/PostItem/title') == 2
+    assert stats.get_value('scrapytest/items/failed') == 2
+    assert stats.get_value('scrapytest/items/validated') == 3
+    pipeline.close_spider(spider)
+    assert stats.get_value('scrapytest/coverage/PostItem') == 3
+    assert stats.get_value('scrapytest/coverage/PostItem/url') == 1
+    assert stats.get_value('scrapytest/coverage_failures') == 1
+
+
+def test_ValidationPipeline_time_budget():
+    pipeline, spider = _pipeline(VALIDATION_TIME_BUDGET=1e-9)
+    for _ in range(10):
+        pipeline.process_item(PostItem(title='bad'), spider)
+    # first item goes over budget, the rest are skipped until the budget recovers
+    assert pipeline.stats.get_value('scrapytest/items/validated') == 1
+    assert pipeline.stats.get_value('scrapytest/items/skipped') == 9
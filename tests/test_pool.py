@@ -0,0 +1,58 @@
+import os
+
+import pytest
+from scrapy import Item, Field
+
+from scrapytest.feed import FeedWriter, read_feed
+from scrapytest.pool import feed_part_path, merge_reports
+
+
+class PostItem(Item):
+    title = Field()
+
+
+def _worker_report(save, name, titles):
+    """report of a worker that saved it's items to a feed part"""
+    part = feed_part_path(save, name)
+    with FeedWriter(part) as feed:
+        for title in titles:
+            feed.write_item(name, PostItem(title=title))
+    return [{'spider': name, 'stats': {'item_scraped_count': len(titles)}, 'feed': part}]
+
+
+def test_merge_reports(tmp_path):
+    save = str(tmp_path / 'feed.jl')
+    open(save, 'wb').close()
+    # spider2 finishes first
+    results = [_worker_report(save, 'spider2', ['c']), _worker_report(save, 'spider1', ['a', 'b'])]
+    reports = list(merge_reports(results, ['spider1', 'spider2'], save))
+    assert [r['spider'] for r in reports] == ['spider2', 'spider1']
+    assert not any('feed' in r for r in reports)
+    records = list(read_feed(save))
+    # items are appended in order of completion, trailer follows spider order
+    assert [r['item']['title'] for r in records[:-1]] == ['c', 'a', 'b']
+    assert records[-1] == {'stats': {'spider1': {'item_scraped_count': 2}, 'spider2': {'item_scraped_count': 1}}}
+    assert list(records[-1]['stats']) == ['spider1', 'spider2']
+    assert os.listdir(tmp_path) == ['feed.jl']
+
+
+def test_merge_reports_failed_worker(tmp_path):
+    save = str(tmp_path / 'feed.jl')
+    open(save, 'wb').close()
+
+    def results():
+        yield _worker_report(save, 'spider1', ['a'])
+        # spider2 fails after writing part of it's items
+        _worker_report(save, 'spider2', ['b'])
+        raise RuntimeError('worker failed')
+
+    with pytest.raises(RuntimeError):
+        list(merge_reports(results(), ['spider1', 'spider2'], save))
+    assert os.listdir(tmp_path) == ['feed.jl']
+    # no trailer is written for incomplete runs
+    assert [r.get('item') for r in read_feed(save)] == [{'title': 'a'}]
+
+
+def test_merge_reports_without_feed():
+    results = [[{'spider': 'spider1', 'stats': {}}], [{'spider': 'spider2', 'stats': {}}]]
+    assert [r['spider'] for r in merge_reports(results, ['spider1', 'spider2'])] == ['spider1', 'spider2']
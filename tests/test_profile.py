@@ -0,0 +1,96 @@
+import json
+from time import sleep
+
+import pytest
+from scrapy import Item, Field
+from scrapy.settings import Settings
+
+from scrapytest import default_settings
+from scrapytest.profile import Profiler, ProfiledTester, get_profiler, disable_profiler, profiled
+from scrapytest.spec import ItemSpec, StatsSpec
+from scrapytest.tests import Match, LessThan
+from scrapytest.validate import Validator
+
+
+class PostItem(Item):
+    title = Field()
+
+
+class PostSpec(ItemSpec):
+    item_cls = PostItem
+    title_test = Match('.{5,}')
+
+
+class PostStats(StatsSpec):
+    spider_cls = object
+    validate = {'log_count/ERROR$': LessThan(1)}
+
+
+@pytest.fixture(autouse=True)
+def no_profiler():
+    disable_profiler()
+    yield
+    disable_profiler()
+
+
+def test_profiled():
+    double = profiled('double')(lambda x: x * 2)
+    assert double(2) == 4
+    assert get_profiler() is None
+
+    settings = Settings()
+    settings.setmodule(default_settings)
+    settings['VALIDATION_PROFILE'] = True
+    Validator([], settings)
+    assert double(2) == 4
+    assert get_profiler().entries[('function', 'double', '', '')].calls == 1
+
+
+def test_ProfiledTester():
+    profiler = Profiler()
+    tester = ProfiledTester(Match('.{5,}'), ('tester', 'PostItem', 'title', 'Match(.{5,})'), profiler)
+    assert str(tester) == 'Match(.{5,})'
+    assert not tester('long title')
+    assert tester('bad')
+    assert [i for i, _ in tester.batch(['bad', 'long title', 'no'])] == [0, 2]
+    entry = profiler.entries[tester.key]
+    assert (entry.calls, entry.failures) == (5, 3)
+    assert entry.to_dict()['failure_rate'] == 0.6
+
+    def slow_on_one(value):
+        if value == 'slow':
+            sleep(0.01)
+        return ''
+
+    # batch values are timed one by one, so a single slow call isn't averaged out
+    tester = ProfiledTester(slow_on_one, ('tester', 'PostItem', 'title', 'slow_on_one'), profiler)
+    assert tester.batch(['fast'] * 99 + ['slow']) == []
+    assert profiler.entries[tester.key].times.max >= 0.01
+
+
+def test_Validator_profile(tmp_path):
+    settings = Settings()
+    settings.setmodule(default_settings)
+    settings['VALIDATION_PROFILE'] = True
+    validator = Validator([PostSpec(), PostStats()], settings)
+    items = [PostItem(title='long title'), PostItem(title='bad')]
+    messages = [str(msg) for msg in validator.validate_items(items)]
+    assert messages == ['PostItem.title: "bad" does not match pattern ".{5,}"']
+    validator.validate_batch(items)
+    validator.validate_stats(object, {'log_count/ERROR': 2})
+    validator.count_fields(items)
+
+    profiler = validator.profiler
+    assert profiler is get_profiler()
+    title = profiler.entries[('tester', 'PostItem', 'title', 'Match(.{5,})')]
+    assert (title.calls, title.failures) == (4, 2)
+    stats = profiler.entries[('stats', 'PostStats', 'log_count/ERROR$', 'LessThan(1)')]
+    assert (stats.calls, stats.failures) == (1, 1)
+    assert profiler.entries[('function', 'count_fields', '', '')].calls == 1
+
+    path = str(tmp_path / 'profile.json')
+    profiler.save(path)
+    with open(path) as f:
+        data = json.load(f)
+    assert {entry['tester'] for entry in data} >= {'Match(.{5,})', 'LessThan(1)'}
+    assert len(profiler.format(n=2)) == 4
@@ -0,0 +1,98 @@
+import os
+import sys
+
+import pytest
+
+from scrapytest.registry import Registry, DiscoveryIndex, closest_config, get_registry, clear_registries
+
+TEST_MODULE = '''
+from scrapy import Spider, Item, Field
+from scrapytest.spec import ItemSpec, StatsSpec
+
+
+class TestItem(Item):
+    title = Field()
+
+
+class TestSpider(Spider):
+    name = 'registry_spider'
+
+
+class TestItemSpec(ItemSpec):
+    item_cls = TestItem
+
+
+class TestStatsSpec(StatsSpec):
+    spider_cls = TestSpider
+
+
+SKIP_ITEMS_WITHOUT_SPEC = True
+ignored = 1
+'''
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    (tmp_path / 'registry_tests.py').write_text(TEST_MODULE)
+    (tmp_path / 'scrapy.cfg').write_text('[test]\nroot = registry_tests\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('SCRAPY_SETTINGS_MODULE', 'registry_settings')
+    yield tmp_path
+    sys.modules.pop('registry_tests', None)
+    clear_registries()
+
+
+def test_Registry(project):
+    registry = Registry.from_module('registry_tests')
+    assert [s.name for s in registry.spiders] == ['registry_spider']
+    assert [i.__name__ for i in registry.items] == ['TestItem']
+    assert sorted(s.__name__ for s in registry.specs) == ['TestItemSpec', 'TestStatsSpec']
+    assert 'ignored' not in registry.values
+    assert registry.get_spider('registry_spider').__name__ == 'TestSpider'
+    assert registry.get_spider('missing') is None
+    assert str(project / 'registry_tests.py') in registry.source_files()
+
+    settings = registry.settings()
+    assert settings.getbool('SKIP_ITEMS_WITHOUT_SPEC')
+    # every call builds new settings
+    settings['SKIP_ITEMS_WITHOUT_SPEC'] = False
+    assert registry.settings().getbool('SKIP_ITEMS_WITHOUT_SPEC')
+
+
+def test_get_registry(project):
+    registry = get_registry({'root': 'registry_tests'})
+    assert get_registry({'root': 'registry_tests'}) is registry
+    clear_registries()
+    assert get_registry({'root': 'registry_tests'}) is not registry
+
+
+def test_DiscoveryIndex(project):
+    config = closest_config()
+    assert config == str(project / 'scrapy.cfg')
+    assert DiscoveryIndex.load() is None
+
+    registry = Registry.from_module('registry_tests')
+    DiscoveryIndex.from_registry(registry, config).save()
+    index = DiscoveryIndex.load()
+    assert index.spider_names() == ['registry_spider']
+    assert index.spiders[0][1] == "<class 'registry_tests.TestSpider'>"
+
+    # index is stale once test module changes
+    module = project / 'registry_tests.py'
+    module.write_text(TEST_MODULE + '\n# changed\n')
+    assert DiscoveryIndex.load() is None
+
+    # or test root changes
+    DiscoveryIndex.from_registry(registry, config).save()
+    assert DiscoveryIndex.load() is not None
+    (project / 'scrapy.cfg').write_text('[test]\nroot = other_tests\n')
+    assert DiscoveryIndex.load() is None
+
+
+def test_DiscoveryIndex_corrupt(project):
+    path = DiscoveryIndex.index_path(closest_config())
+    os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write('{broken')
+    assert DiscoveryIndex.load() is None
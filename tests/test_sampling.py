@@ -0,0 +1,50 @@
+from collections import Counter
+
+import pytest
+from scrapy import Item, Field
+
+from scrapytest.sampling import Sampler, wilson_interval, z_score
+
+
+class PostItem(Item):
+    title = Field()
+
+
+class CommentItem(Item):
+    text = Field()
+
+
+def test_Sampler_rate():
+    items = [PostItem(title=str(i)) for i in range(1000)]
+    sampled = list(Sampler(rate=0.1, seed=1).sample(items))
+    assert 50 < len(sampled) < 150
+    # samples are reproducible with seed
+    assert sampled == list(Sampler(rate=0.1, seed=1).sample(items))
+
+
+def test_Sampler_reservoir():
+    sampler = Sampler(size=10, seed=1)
+    items = [PostItem(title=str(i)) for i in range(100)] + [CommentItem(text=str(i)) for i in range(5)]
+    for item in items:
+        assert sampler.feed(item) == []
+    sampled = sampler.drain()
+    assert Counter(type(item) for item in sampled) == {PostItem: 10, CommentItem: 5}
+    assert sampler.total == 105
+    assert sampler.drain() == []
+
+    # every item has the same chance to end up in the reservoir
+    picked = Counter()
+    for seed in range(200):
+        picked.update(int(item['title']) for item in Sampler(size=10, seed=seed).sample(items[:100]))
+    assert picked[0] / 200 == pytest.approx(0.1, abs=0.07)
+    assert picked[99] / 200 == pytest.approx(0.1, abs=0.07)
+
+
+def test_wilson_interval():
+    assert z_score(0.95) == pytest.approx(1.96, abs=0.001)
+    low, high = wilson_interval(95, 100)
+    assert low == pytest.approx(0.8882, abs=0.0001)
+    assert high == pytest.approx(0.9785, abs=0.0001)
+    assert wilson_interval(10, 10)[1] == 1.0
+    assert wilson_interval(0, 10)[0] == 0.0
+    assert wilson_interval(0, 0) == (0.0, 1.0)
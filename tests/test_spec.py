@@ -1,7 +1,7 @@
-from scrapy import Spider
+from scrapy import Spider, Item, Field
 
 from scrapytest.spec import ItemSpec, StatsSpec
-from scrapytest.tests import LessThan
+from scrapytest.tests import LessThan, Match, Type, MoreThan, Compose, Pass, Required
 
 lambda_test = lambda v: v
 
@@ -32,7 +32,7 @@ def test_ItemSpec():
 
 def test_StatsSpec():
     stats_spec = StatsSpec()
-    assert stats_spec._validate_re
+    assert stats_spec._validate_index.patterns
     assert isinstance(stats_spec.spider_cls, list)
 
     # test ensuring spider_cls is list
@@ -71,3 +71,80 @@ def test_StatsSpec():
         'error/code/409': 5,
     }
     assert MySpec().validate_stats(stats) == ['error/code/402: 5 !< 1']
+
+    # stats are resolved in pattern order and then in stat order
+    class MySpec(StatsSpec):
+        spider_cls = Spider
+        validate = {
+            'downloader/response_status_count/5\\d\\d': LessThan(1),
+            'downloader/response_status_count/': LessThan(10),
+            'log_count/ERROR$': LessThan(1),
+        }
+        required = ['log_count/', 'missing_stat']
+
+    stats = {
+        'downloader/response_status_count/200': 50,
+        'downloader/response_status_count/503': 2,
+        'downloader/response_status_count/500': 1,
+        'log_count/ERROR': 1,
+        'log_count/INFO': 10,
+    }
+    assert MySpec().validate_stats(stats) == [
+        'downloader/response_status_count/503: 2 !< 1',
+        'downloader/response_status_count/500: 1 !< 1',
+        'downloader/response_status_count/200: 50 !< 10',
+        'log_count/ERROR: 1 !< 1',
+        'missing_stat: missing',
+    ]
+
+
+def test_StatsSpec_instances_share_class_validate():
+    class MySpec(StatsSpec):
+        spider_cls = Spider
+        validate = {'log_count/ERROR$': LessThan(1)}
+
+    first, second = MySpec(), MySpec()
+    # class dict keeps plain testers, every instance composes them once
+    assert isinstance(MySpec.validate['log_count/ERROR$'], LessThan)
+    assert isinstance(second.validate['log_count/ERROR$'], Compose)
+    assert isinstance(second.validate['log_count/ERROR$'].functions[0], LessThan)
+    assert first.validate is not second.validate
+
+
+def test_ItemSpec_compile():
+    class PostItem(Item):
+        title = Field()
+        points = Field()
+        url = Field()
+        comments = Field()
+
+    class PostSpec(ItemSpec):
+        item_cls = PostItem
+        title_test = Match('.{5,}')
+        points_test = Type(int), MoreThan(0)
+        comments_test = Compose(Type(list), Pass()), Required()
+
+    plan = PostSpec().compile()
+    assert plan.item_cls is PostItem
+    assert plan.name == 'PostItem'
+    assert list(plan.fields) == ['title', 'points', 'url', 'comments']
+    # Compose layers are flattened and Pass testers are dropped
+    assert [type(t) for t in plan.get('comments').testers] == [Type, Required]
+    assert plan.get('url').testers == ()
+    assert plan.get('url').skip
+    assert not plan.get('title').skip
+    # fields that can only pass Type tests of non-container classes don't allow nested items
+    assert plan.get('url').nested
+    assert plan.get('title').nested
+    assert not plan.get('points').nested
+    assert plan.get('comments').nested
+
+    class PostSpec(ItemSpec):
+        item_cls = PostItem
+        url_test = Type(str)
+
+    plan = PostSpec().compile()
+    assert not plan.get('url').skip
+    assert not plan.get('url').nested
+    assert plan.get('missing') is plan.default
+
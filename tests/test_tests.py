@@ -1,3 +1,8 @@
+import pickle
+from typing import FrozenSet, Tuple
+
+import pytest
+
 from scrapytest.tests import *
 
 
@@ -110,3 +115,126 @@ def test_Compose():
 
     assert str(Compose(LessThan(10))) == str(LessThan(10))
     assert str(Compose(LessThan(10), MoreThan(10))) == str(LessThan(10)) + ',' + str(MoreThan(10))
+
+
+def test_Failure():
+    failure = LessThan(100)(101)
+    assert isinstance(failure, Failure)
+    assert failure.value == 101
+    assert failure.format() == '101 !< 100'
+    assert failure == '101 !< 100'
+    assert failure == LessThan(100)(101)
+    assert failure != LessThan(100)(102)
+    assert failure != LessThan(100)(101.0)
+    assert len({failure, LessThan(100)(101), LessThan(100)(102)}) == 2
+
+    # binding to item field
+    bound = failure.bind(dict, 'price')
+    assert bound.format() == 'dict.price: 101 !< 100'
+    assert failure.field is None
+    assert bound != failure
+
+    # truncation
+    failure = Match('foo')('a' * 1000)
+    assert failure.format(max_length=5) == '"aaaaa..." does not match pattern "foo"'
+    assert len(failure.format()) > 1000
+
+    # message strings
+    assert Failure.from_message(lambda_tester, 'bad value') == 'bad value'
+    # are not truncated as a whole
+    assert Failure.from_message(lambda_tester, 'bad value').format(max_length=3) == 'bad value'
+    # failures hash the same as strings they are equal to
+    assert hash(LessThan(100)(101)) == hash('101 !< 100')
+    bound = failure.bind(dict, 'name')
+    assert hash(bound) == hash(str(bound))
+    assert '101 !< 100' in {LessThan(100)(101)}
+
+    # tester reference is not pickled
+    failure = pickle.loads(pickle.dumps(Failure.from_message(lambda_tester, 'bad').bind(dict, 'name')))
+    assert failure == 'dict.name: bad'
+    assert failure.tester == '<lambda>'
+
+
+lambda_tester = lambda v: 'bad'
+
+
+def test_run_batch():
+    values = list(range(-50, 50)) + [0.5]
+    for tester in [MoreThan(0), LessThan(10), Equal(0), Compose(MoreThan(-1), LessThan(1))]:
+        expected = [(i, msg) for i, value in enumerate(values) for msg in run_tester(tester, value) if msg]
+        assert run_batch(tester, values) == expected
+    assert [i for i, _ in run_batch(MoreThan(0), values)] == list(range(51))
+    # errors of single values are reported the same as without batch
+    assert run_batch(MoreThan(0), [1, None, -1]) == [
+        (1, "TypeError:'>' not supported between instances of 'NoneType' and 'int' got \"<class 'NoneType'>\": None"),
+        (2, '-1 !> 0'),
+    ]
+    assert run_batch(Only('abc'), ['ab', 'ad']) == [(1, 'value "ad" contains disallowed values: [\'d\']')]
+    assert run_batch(Len.equals(2), ['ab', 'abc']) == [(1, 'length 3 when expected =2')]
+    assert run_batch(Required(), ['a', '', 0]) == [(1, 'is empty value: "" of type str')]
+    assert run_batch(Match('a'), ['a', 'b']) == [(1, '"b" does not match pattern "a"')]
+    # testers without batch protocol
+    assert run_batch(lambda v: 'odd' if v % 2 else '', [1, 2, 3]) == [(0, 'odd'), (2, 'odd')]
+
+
+def test_run_batch_exact_numbers():
+    # big ints next to floats compare exactly, the same as single values do
+    big = 2 ** 53 + 1
+    values = [0.5] * 100 + [big]
+    for tester in [MoreThan(2 ** 53), LessThan(big), Equal(2 ** 53), Equal(big)]:
+        expected = [(i, msg) for i, value in enumerate(values) for msg in run_tester(tester, value) if msg]
+        assert run_batch(tester, values) == expected
+    assert [i for i, _ in run_batch(Equal(2 ** 53), values)] == list(range(101))
+    floats = [float(2 ** 53)] * 100
+    assert run_batch(LessThan(big), floats) == []
+    assert run_batch(Equal(big), floats) == [(i, Equal(big)(v)) for i, v in enumerate(floats)]
+
+
+def test_Memoize():
+    calls = []
+
+    def tester(value):
+        calls.append(value)
+        return 'bad' if value == 'b' else ''
+
+    memoized = Memoize(tester, maxsize=2)
+    assert [memoized(v) for v in ['a', 'b', 'a', 'b']] == ['', 'bad', '', 'bad']
+    assert calls == ['a', 'b']
+    assert (memoized.hits, memoized.misses) == (2, 2)
+    # values of different types are cached separately
+    assert memoized(1) == '' and memoized(True) == ''
+    assert calls == ['a', 'b', 1, True]
+    # unhashable values skip the cache
+    memoized(['a'])
+    memoized(['a'])
+    assert memoized.unhashable == 2
+    assert calls[-2:] == [['a'], ['a']]
+    assert list(memoized.batch(['a', 'b', 'b'])) == [(1, 'bad'), (2, 'bad')]
+    assert str(Memoize(Match('a'))) == 'Match(a)'
+    # equal containers with members of different types are cached separately
+    memoized = Memoize(Type(Tuple[int, int]))
+    results = [memoized(v) for v in [(1, 2), (1.5, 2), (1.0, 2)]]
+    assert len([r for r in results if r]) == 2
+    memoized = Memoize(Type(FrozenSet[int]))
+    assert not memoized(frozenset([1, 2])) and memoized(frozenset([1.0, 2]))
+    assert is_pure(Match('a')) and is_pure(Type(str)) and not is_pure(LessThan(1)) and not is_pure(tester)
+
+
+def test_PercentileBelow():
+    values = [v / 100 for v in range(1, 101)]
+    assert not PercentileBelow(95, 1)(values)
+    failure = PercentileBelow(50, 0.3)(values)
+    # histogram percentiles are approximate
+    assert failure.value == pytest.approx(0.5, rel=0.01)
+    assert failure.format().startswith('p50 0.50') and failure.format().endswith(' !< 0.3')
+    # histogram stats, see scrapytest.latency
+    state = Histogram.from_values(values).to_state()
+    assert not PercentileBelow(95, 1)(state)
+    assert PercentileBelow(99, 0.5)(state)
+    assert not PercentileBelow(95, 1)([])
+
+
+def test_MeanBelow():
+    assert not MeanBelow(3)([1, 2, 4])
+    assert MeanBelow(2)(Histogram.from_values([1, 2, 4]).to_state())
+    assert not MeanBelow(1)([])
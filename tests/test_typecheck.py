@@ -0,0 +1,51 @@
+from typing import Any, Dict, List, Optional, Set, Tuple, Union, FrozenSet
+
+import pytest
+
+from scrapytest.typecheck import compile_checker
+
+typeguard = pytest.importorskip('typeguard')
+
+ANNOTATIONS = [
+    int, float, str, bool, complex, type(None), Any, object, list, dict, tuple,
+    Optional[int], Union[int, str], List, List[int], List[Optional[str]], Dict, Dict[str, int],
+    Dict[str, List[int]], Set[int], FrozenSet[str], Tuple, Tuple[int, ...], Tuple[int, str],
+    List[Dict[str, Tuple[int, Optional[float]]]],
+]
+
+VALUES = [
+    0, 1.5, True, 'foo', None, 1j, [], [1, 2], [1, None], ['foo', None], {}, {'a': 1}, {'a': [1]}, {1: 'a'},
+    {1, 2}, frozenset({'a'}), (), (1,), (1, 'a'), (1, 2, 3), [{'a': (1, None)}], [{'a': (1, 'b')}],
+]
+
+
+def _typeguard(annotation, value):
+    try:
+        typeguard.check_type('', value, annotation)
+    except TypeError:
+        return False
+    return True
+
+
+@pytest.mark.parametrize('annotation', ANNOTATIONS, ids=str)
+def test_compile_checker(annotation):
+    check = compile_checker(annotation)
+    for value in VALUES:
+        assert check(value) == _typeguard(annotation, value), value
+
+
+def test_compile_checker_empty_tuple():
+    check = compile_checker(Tuple[()])
+    assert check(())
+    assert not check((1,))
+    assert not check([])
+
+
+def test_compile_checker_check_first():
+    value = [1, 2, 'foo']
+    assert not compile_checker(List[int])(value)
+    assert compile_checker(List[int], check_first=2)(value)
+    assert not compile_checker(List[int], check_first=3)(value)
+    assert compile_checker(Dict[str, int], check_first=1)({'a': 1, 'b': 'c'})
+    # checkers are cached
+    assert compile_checker(List[int], check_first=2) is compile_checker(List[int], check_first=2)
@@ -1,6 +1,8 @@
+import re
 from collections import Counter
 
-from scrapytest.utils import join_counter_dicts, is_empty, obj_name, collapse_buffer
+from scrapytest.utils import join_counter_dicts, is_empty, obj_name, collapse_buffer, collapse_counter, \
+    literal_prefix, PatternIndex, get_budget_settings
 
 
 def test_collapse_buffer():
@@ -86,3 +88,42 @@ def test_join_counter_dicts():
         'key2': Counter({'field1': 5, 'field2': 5}),
     }
     assert dict(join_counter_dicts(*inp)) == expected
+
+
+def test_collapse_counter():
+    counter = Counter(['one', 'two', 'two', 'three', 'two'])
+    assert collapse_counter(counter) == ['one', 'two [x3]', 'three']
+
+
+def test_literal_prefix():
+    assert literal_prefix('downloader/response_status_count/5\\d\\d') == 'downloader/response_status_count/5'
+    assert literal_prefix('log_count/ERROR$') == 'log_count/ERROR'
+    assert literal_prefix('^item_scraped') == 'item_scraped'
+    assert literal_prefix('abc?') == 'ab'
+    assert literal_prefix('abc*') == 'ab'
+    assert literal_prefix('abc+') == 'abc'
+    assert literal_prefix('foo|bar') == ''
+    assert literal_prefix('(?i)foo') == ''
+
+
+def test_PatternIndex():
+    patterns = ['log_count/ERROR$', 'log_count/', 'error/code/40[1-5]$', '.+count', 'foo|bar']
+    index = PatternIndex(patterns)
+    keys = ['log_count/ERROR', 'log_count/INFO', 'error/code/402', 'error/code/409', 'item_scraped_count', 'bar']
+    for key in keys:
+        expected = tuple(i for i, p in enumerate(patterns) if re.match(p, key))
+        assert index.match(key) == expected
+        # memoized
+        assert index.match(key) == expected
+    assert index.match('log_count/ERROR') == (0, 1, 3)
+    assert index.match('nothing') == ()
+
+
+def test_get_budget_settings():
+    assert get_budget_settings({'root': 'example.test'}) == {}
+    config = {'failure_budget': '100', 'failure_budget.spider1': '10', 'coverage_fail_fast': 'true'}
+    assert get_budget_settings(config) == {
+        'FAILURE_BUDGET': 100,
+        'FAILURE_BUDGETS': {'spider1': 10},
+        'COVERAGE_FAIL_FAST': True,
+    }
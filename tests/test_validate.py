@@ -1,6 +1,10 @@
+from collections import Counter
+
+from scrapy import Item, Field
 from scrapy.settings import Settings
-from scrapytest.validate import Validator
+from scrapytest.validate import Validator, ItemStream, CoverageCounter, FailureBudget
 from scrapytest.spec import ItemSpec, StatsSpec
+from scrapytest.tests import Match, MoreThan, LessThan, Len, Only, Type
 from scrapytest import default_settings
 
 
@@ -13,3 +17,257 @@ def test_Validator():
     assert validator.skip_items_without_spec == settings.getbool('SKIP_ITEMS_WITHOUT_SPEC')
     assert validator.skip_stats_without_spec == settings.getbool('SKIP_STATS_WITHOUT_SPEC')
     assert validator.empty_is_missing == settings.getbool('EMPTY_IS_MISSING')
+
+
+class _CommentItem(Item):
+    text = Field()
+
+
+class _PostItem(Item):
+    title = Field()
+    comments = Field()
+
+
+class _PostSpec(ItemSpec):
+    item_cls = _PostItem
+    title_test = Match('.{5,}')
+    title_cov = 100
+
+
+class _CommentSpec(ItemSpec):
+    item_cls = _CommentItem
+    text_test = Match('.{3,}')
+
+
+def _validator():
+    settings = Settings()
+    settings.setmodule(default_settings)
+    return Validator([_PostSpec(), _CommentSpec()], settings)
+
+
+def test_ItemStream():
+    items = [
+        _PostItem(title='long title', comments=[_CommentItem(text='foo'), _CommentItem(text='no')]),
+        _PostItem(title='bad', comments=[_CommentItem(text='no')]),
+        _PostItem(comments=[]),
+    ]
+    validator = _validator()
+    stream = ItemStream(validator)
+    for item in items:
+        stream.feed(item)
+    assert stream.items is None
+    assert stream.failed == 3
+    assert list(stream.report()) == [
+        ('_CommentItem.text: "no" does not match pattern ".{3,}"', 2),
+        ('_PostItem.title: "bad" does not match pattern ".{5,}"', 1),
+    ]
+    assert stream.validate_coverage() == validator.validate_coverage(items)
+    assert stream.validate_coverage() == ['insufficient coverage: _PostItem.title: 66.67%/100% [2/3]']
+
+    stream = ItemStream(validator, keep_items=True)
+    stream.feed(items[0])
+    assert stream.items == [items[0]]
+
+
+def test_CoverageCounter():
+    items = [
+        _PostItem(title='long title', comments=[_CommentItem(text='foo'), _CommentItem(text='')]),
+        _PostItem(title='', comments=[_CommentItem(text='no')]),
+        _PostItem(),
+    ]
+    coverage = CoverageCounter()
+    for item in items:
+        coverage.add(item)
+    assert list(coverage) == [_CommentItem, _PostItem]
+    assert coverage.total(_PostItem) == 3
+    assert coverage.total(_CommentItem) == 3
+    assert coverage.most_common(_PostItem) == [('comments', 2), ('title', 1)]
+    assert coverage.most_common(_CommentItem) == [('text', 2)]
+    assert dict(coverage.as_counters()) == {
+        _CommentItem: Counter({'_self': 3, 'text': 2}),
+        _PostItem: Counter({'_self': 3, 'title': 1, 'comments': 2}),
+    }
+    # empty values are counted when they are not considered missing
+    coverage = CoverageCounter(empty_is_missing=False)
+    coverage.add(items[1])
+    assert coverage.most_common(_PostItem) == [('title', 1), ('comments', 1)]
+
+    # merging
+    first, second = CoverageCounter(), CoverageCounter()
+    first.add(items[0])
+    second.add(items[1])
+    second.add(items[2])
+    assert first.merge(second).as_counters() == dict(
+        _validator().count_fields(items)
+    )
+    assert first.counts[_PostItem] == [3, 1, 2]
+
+
+class _Spider:
+    name = 'spider1'
+
+
+class _StatsSpec(StatsSpec):
+    spider_cls = _Spider
+    failure_budget = 1
+
+
+def test_FailureBudget():
+    settings = Settings()
+    settings.setmodule(default_settings)
+    validator = _validator()
+    assert FailureBudget.from_settings(validator, settings, _Spider) is None
+    settings['FAILURE_BUDGET'] = 5
+    assert FailureBudget.from_settings(validator, settings, _Spider).max_failures == 5
+    settings['FAILURE_BUDGETS'] = {'spider1': 2}
+    assert FailureBudget.from_settings(validator, settings, _Spider).max_failures == 2
+    # spec budget is used when spider has no budget of it's own
+    spec_validator = Validator([_PostSpec(), _CommentSpec(), _StatsSpec()], settings)
+    settings['FAILURE_BUDGETS'] = {}
+    assert FailureBudget.from_settings(spec_validator, settings, _Spider).max_failures == 1
+
+    stream = ItemStream(validator)
+    budget = FailureBudget(validator, max_failures=1)
+    for item in [_PostItem(title='bad'), _PostItem(comments=[_CommentItem(text='no')])]:
+        stream.feed(item)
+        budget.add(item)
+    assert budget.check(stream) == ('failure_budget', 'item failure budget exceeded: 2 failures, budget is 1')
+
+
+def test_FailureBudget_coverage():
+    validator = _validator()
+    # 100% coverage floor is unreachable as soon as a single item misses the field
+    stream = ItemStream(validator)
+    budget = FailureBudget(validator, check_coverage=True)
+    stream.feed(_PostItem(title='long title'))
+    assert budget.check(stream) is None
+    stream.feed(_PostItem())
+    assert budget.check(stream) == (
+        'coverage_unreachable', 'coverage floor unreachable: _PostItem.title: 50.00%/100% [1/2]')
+
+    # lower floors are unreachable only when the amount of items is bounded
+    class LowSpec(_PostSpec):
+        title_cov = 50
+
+    validator = Validator([LowSpec(), _CommentSpec()], validator.settings)
+    for max_items, expected in [(None, None), (4, None), (3, 'coverage_unreachable')]:
+        stream = ItemStream(validator)
+        budget = FailureBudget(validator, check_coverage=True, max_items=max_items)
+        for item in [_PostItem(title='long title'), _PostItem(), _PostItem()]:
+            stream.feed(item)
+            budget.add(item)
+        result = budget.check(stream)
+        assert (result and result[0]) == expected
+
+
+def test_Validator_sampling():
+    settings = Settings()
+    settings.setmodule(default_settings)
+    settings['VALIDATION_SAMPLE_SIZE'] = 50
+    settings['VALIDATION_SAMPLE_SEED'] = 1
+
+    class CoverageSpec(_PostSpec):
+        title_cov = 90
+
+    validator = Validator([CoverageSpec(), _CommentSpec()], settings)
+    stream = ItemStream(validator)
+    # 95% of items have title
+    for i in range(1000):
+        stream.feed(_PostItem(title='long title') if i % 20 else _PostItem())
+    stream.close()
+    assert stream.validated == 50
+    assert stream.sampler.total == 1000
+    # sampled coverage isn't exact but 90% coverage is within it's confidence interval
+    assert stream.validate_coverage() == []
+
+    validator = Validator([_PostSpec(), _CommentSpec()], settings)
+    messages = validator.validate_coverage(_PostItem(title='long title') if i % 20 else _PostItem()
+                                           for i in range(1000))
+    assert messages == ['insufficient coverage: _PostItem.title: 96.00% (86.54-98.90%)/100% [48/50 sampled]']
+
+
+def test_Validator_sampling_without_seed():
+    settings = Settings()
+    settings.setmodule(default_settings)
+    settings['VALIDATION_SAMPLE_RATE'] = 0.5
+    validator = Validator([_PostSpec(), _CommentSpec()], settings)
+    items = [_PostItem(title=str(i)) for i in range(100)]
+    # every validation of the same items tests the same sample
+    sampled = [item['title'] for item in validator.sampler().sample(items)]
+    assert [item['title'] for item in validator.sampler().sample(items)] == sampled
+    messages = validator.validate_items(items)
+    assert [msg.value for msg in messages] == sampled
+
+
+class _ScoreItem(Item):
+    title = Field()
+    points = Field()
+    tags = Field()
+    comment = Field()
+    comments = Field()
+
+
+class _ScoreSpec(ItemSpec):
+    item_cls = _ScoreItem
+    title_test = Match('.{5,}'), Len.less_than(12)
+    points_test = MoreThan(0), LessThan(100)
+    tags_test = Only(['a', 'b'])
+
+    def comments_test(self, value):
+        if len(value) > 1:
+            return f'too many comments: {len(value)}'
+        return ''
+
+
+def test_Validator_validate_batch():
+    settings = Settings()
+    settings.setmodule(default_settings)
+    validator = Validator([_ScoreSpec(), _CommentSpec()], settings)
+    items = [
+        _ScoreItem(title=f'title {i}' if i % 3 else 'bad', points=i * 7 - 50, tags=['a', 'c'] if i % 5 else ['a'])
+        for i in range(100)
+    ]
+    items += [
+        # comparing None fails with TypeError
+        _ScoreItem(title='long enough title', points=None, comments=[_CommentItem(text='no'), _CommentItem()]),
+        _ScoreItem(comment=_CommentItem(text='no'), comments=[]),
+        _PostItem(title='no spec'),
+        {'title': 'not an item'},
+    ]
+    expected = [validator.validate_item(item) for item in items]
+    assert validator.validate_batch(items) == expected
+    assert sum(len(messages) for messages in expected) > 100
+    stream = ItemStream(validator, batch_size=16)
+    for item in items:
+        stream.feed(item)
+    stream.close()
+    assert stream.failed == sum(len(messages) for messages in expected)
+
+
+class _TypedPostSpec(_PostSpec):
+    title_test = Type(str)
+
+
+def test_Validator_nested_in_typed_field():
+    settings = Settings()
+    settings.setmodule(default_settings)
+    validator = Validator([_TypedPostSpec(), _CommentSpec()], settings)
+    # nested items are validated even in fields whose Type tests don't allow them
+    item = _PostItem(title=_CommentItem(text='no'))
+    assert validator.validate_item(item) == ['_CommentItem.text: "no" does not match pattern ".{3,}"']
+    assert validator.validate_batch([item]) == [validator.validate_item(item)]
+
+
+def test_Validator_memoize():
+    settings = Settings()
+    settings.setmodule(default_settings)
+    validator = Validator([_ScoreSpec(), _CommentSpec()], settings)
+    settings['TESTER_CACHE_SIZE'] = 0
+    uncached = Validator([_ScoreSpec(), _CommentSpec()], settings)
+    assert not uncached.memoized
+    # Match and Only testers of _ScoreSpec and _CommentSpec
+    assert len(validator.memoized) == 3
+    items = [_ScoreItem(title='bad', tags=['a'], comments=[_CommentItem(text='no')]) for _ in range(10)]
+    assert validator.validate_batch(items) == uncached.validate_batch(items)
+    assert [validator.validate_item(item) for item in items] == [uncached.validate_item(item) for item in items]
+    assert sum(memoized.hits for memoized in validator.memoized.values()) == 38